@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Compare requests/sec of the sync DB path (session per request in the threadpool, as sync
+endpoints run) with the async engine path at high concurrency. Each simulated request does
+what GET /places/all does: authenticate the user, then list places.
+
+For example:
+    BENCH_REQUESTS=2000 BENCH_CONCURRENCY=200 python Database_insert/benchmark_async_db.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+from starlette.concurrency import run_in_threadpool
+from database import sessionLocal, asyncSessionLocal, engine, async_engine, pool_monitor, async_pool_monitor
+from repositories import user_repo, place_repo
+from models.user import User
+# Register every model so relationship() targets resolve outside the API process
+import main  # noqa: F401
+
+BENCH_REQUESTS = int(os.getenv("BENCH_REQUESTS", "1000"))
+BENCH_CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "200"))
+BENCH_PLACES_LIMIT = int(os.getenv("BENCH_PLACES_LIMIT", "20"))
+
+def sync_request(username: str):
+    db = sessionLocal()
+    try:
+        user_repo.get_user_by(db, "username", username)
+        return place_repo.get_places(db, 0, BENCH_PLACES_LIMIT)
+    finally:
+        db.close()
+
+async def async_request(username: str):
+    async with asyncSessionLocal() as db:
+        await user_repo.get_user_by_async(db, "username", username)
+        return await place_repo.get_places_async(db, 0, BENCH_PLACES_LIMIT)
+
+async def run(name: str, request, username: str) -> float:
+    semaphore = asyncio.Semaphore(BENCH_CONCURRENCY)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.monotonic()
+            await request(username)
+            latencies.append(time.monotonic() - started)
+
+    started = time.monotonic()
+    await asyncio.gather(*(one() for _ in range(BENCH_REQUESTS)))
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    percentile = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000
+    print(f"{name:>5}: {BENCH_REQUESTS / elapsed:8.1f} req/s | p50 {percentile(0.5):.1f} ms, p95 {percentile(0.95):.1f} ms, p99 {percentile(0.99):.1f} ms")
+    return BENCH_REQUESTS / elapsed
+
+async def benchmark_async_db():
+    """Print requests/sec and latency percentiles of both paths"""
+    if asyncSessionLocal is None:
+        print("❌ Async engine is not available (install asyncpg)")
+        return
+
+    db = sessionLocal()
+    user = db.query(User).first()
+    db.close()
+    if user is None:
+        print("❌ No user in the database")
+        return
+
+    print(f"⏱️  {BENCH_REQUESTS} requests, concurrency {BENCH_CONCURRENCY}, {BENCH_PLACES_LIMIT} places per request")
+    # Warm both pools so connection setup is not measured
+    await run_in_threadpool(sync_request, user.username)
+    await async_request(user.username)
+
+    sync_rps = await run("sync", lambda username: run_in_threadpool(sync_request, username), user.username)
+    async_rps = await run("async", async_request, user.username)
+    print(f"Async / sync: {async_rps / sync_rps:.2f}x")
+
+    for monitor, pool_engine in ((pool_monitor, engine), (async_pool_monitor, async_engine)):
+        snapshot = monitor.snapshot(pool_engine)
+        print(f"Pool {snapshot['name']}: max checked out {snapshot['max_checked_out']}, timeouts {snapshot['timeouts']}, wait p95 {snapshot['wait_time']['p95_ms']} ms")
+
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(benchmark_async_db())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Offline load test of the AI generation path against the Gemini stand-in backend:
+throughput, latency percentiles and how requests were served (gemini vs local fallback)
+under the configured latency distribution and error injection.
+
+Record fixtures first with the real API (GEMINI_BACKEND=record), then for example:
+    GEMINI_STANDIN_LATENCY=lognormal:2,0.6 GEMINI_STANDIN_ERROR_RATE=0.05 \
+    BENCH_REQUESTS=500 BENCH_CONCURRENCY=100 python Database_insert/benchmark_gemini_standin.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("GEMINI_BACKEND", "standin")
+# Measure the generation path, not the outbound quota or the DB cache; set these to include them
+os.environ.setdefault("GEMINI_RPM", "0")
+os.environ.setdefault("AI_REC_CACHE_DB_TTL_DAYS", "0")
+
+import asyncio
+import time
+from collections import Counter
+from services.gemini_service import gemini_service
+# Register every model so relationship() targets resolve outside the API process
+import main  # noqa: F401
+
+BENCH_REQUESTS = int(os.getenv("BENCH_REQUESTS", "200"))
+BENCH_CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "50"))
+BENCH_OUTPUT_FORMAT = os.getenv("BENCH_OUTPUT_FORMAT", "text")
+
+DESTINATIONS = ["Đà Lạt", "Hội An", "Nha Trang", "Phú Quốc", "Sa Pa", "Huế", "Hạ Long", "Đà Nẵng"]
+
+def trip_request(index: int) -> dict:
+    # Distinct trips so the recommendation cache and single-flight do not absorb the load
+    return {
+        "departure": f"Hồ Chí Minh {index}",
+        "destination": DESTINATIONS[index % len(DESTINATIONS)],
+        "people": 1 + index % 4,
+        "days": 1 + index % 5,
+        "time": "12/2025",
+        "money": "5-10 triệu VND",
+        "transportation": "máy bay",
+        "travelStyle": "thoải mái",
+        "interests": ["ẩm thực", "thiên nhiên"],
+        "accommodation": "khách sạn",
+        "outputFormat": BENCH_OUTPUT_FORMAT
+    }
+
+async def benchmark_gemini_standin():
+    """Print requests/sec, latency percentiles and result sources"""
+    if not gemini_service.model:
+        print("❌ No model backend available (set GEMINI_BACKEND=standin or GEMINI_API_KEY)")
+        return
+
+    semaphore = asyncio.Semaphore(BENCH_CONCURRENCY)
+    latencies = []
+    sources = Counter()
+
+    async def one(index: int):
+        async with semaphore:
+            started = time.monotonic()
+            result = await gemini_service.generate_async(trip_request(index))
+            latencies.append(time.monotonic() - started)
+            sources[result.source] += 1
+
+    started = time.monotonic()
+    await asyncio.gather(*(one(index) for index in range(BENCH_REQUESTS)))
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    percentile = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000
+    stats = gemini_service.stats()
+
+    print(f"⏱️  {BENCH_REQUESTS} requests, concurrency {BENCH_CONCURRENCY}, format {BENCH_OUTPUT_FORMAT}")
+    print(f"Throughput: {BENCH_REQUESTS / elapsed:.1f} req/s ({elapsed:.2f}s)")
+    print(f"Latency: p50 {percentile(0.5):.0f} ms, p95 {percentile(0.95):.0f} ms, p99 {percentile(0.99):.0f} ms")
+    print(f"Sources: {dict(sources)}")
+    print(f"Backend: {stats['backend']}")
+    print(f"Deadline exceeded: {stats['deadline_exceeded']}, router errors: {stats['router']['errors']}")
+
+if __name__ == "__main__":
+    asyncio.run(benchmark_gemini_standin())
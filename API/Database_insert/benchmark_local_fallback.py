@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the local fallback recommendation: 1-60 day trips, first render
+(templates joined, body not yet memoized) against repeated renders of the same trip
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+from services.local_fallback import render_local_recommendation, _trip_body
+
+ROUNDS = int(os.getenv("BENCH_ROUNDS", "2000"))
+
+def benchmark_local_fallback():
+    """Print microseconds per render for cold and memoized trips"""
+    trip_request = {
+        "departure": "Ho Chi Minh City",
+        "destination": "Da Lat",
+        "people": 2,
+        "money": "5-10 triệu VND",
+        "transportation": "xe khách",
+        "travelStyle": "thư giãn",
+        "interests": ["thiên nhiên", "ẩm thực", "văn hóa"],
+        "accommodation": "khách sạn"
+    }
+    
+    print(f"⏱️  LOCAL FALLBACK ({ROUNDS} rounds)")
+    print(f"{'days':>5} {'cold µs':>10} {'memoized µs':>12} {'chars':>8}")
+    for days in (1, 2, 3, 5, 7, 10, 14, 21, 30, 45, 60):
+        request = {**trip_request, "days": days}
+        
+        started = time.perf_counter()
+        for _ in range(ROUNDS):
+            _trip_body.cache_clear()
+            text = render_local_recommendation(request)
+        cold = (time.perf_counter() - started) / ROUNDS
+        
+        started = time.perf_counter()
+        for _ in range(ROUNDS):
+            render_local_recommendation(request)
+        warm = (time.perf_counter() - started) / ROUNDS
+        
+        print(f"{days:>5} {cold * 1e6:>10.1f} {warm * 1e6:>12.1f} {len(text):>8}")
+
+if __name__ == "__main__":
+    benchmark_local_fallback()
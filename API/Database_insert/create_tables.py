@@ -11,6 +11,7 @@ from models.friend import Friend
 from models.notification import Notification
 from models.trip_member import TripMember
 from models.ai_recommendation import AIRecommendation
+from models.ai_rec_job import AIRecJob
 
 # Tạo tất cả các bảng trong cơ sở dữ liệu
 def create_tables():
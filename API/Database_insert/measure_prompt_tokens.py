@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Measure input tokens per trip request: the old single prompt (instructions repeated in every
+request) against the system instruction + compact payload layout, with and without context caching
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.gemini_service import gemini_service, TRAVEL_SYSTEM_INSTRUCTION, GEMINI_MODEL
+from services.place_retrieval import place_retriever
+import google.generativeai as genai
+
+def count_tokens(model, text: str) -> int:
+    if model is None:
+        # Same rough estimate the rate limiter uses (~3 chars/token for Vietnamese text)
+        return len(text) // 3
+    return model.count_tokens(text).total_tokens
+
+def measure_prompt_tokens():
+    """Print input tokens per request for each prompt layout"""
+    trip_request = {
+        "departure": "Ho Chi Minh City",
+        "destination": "Da Lat",
+        "people": 2,
+        "days": 3,
+        "time": "December 2024",
+        "money": "5-10 triệu VND",
+        "transportation": "xe khách",
+        "travelStyle": "thư giãn",
+        "interests": ["thiên nhiên", "ẩm thực", "văn hóa"],
+        "accommodation": "khách sạn"
+    }
+    
+    # A model without system instruction counts exactly what it is given
+    model = genai.GenerativeModel(GEMINI_MODEL) if gemini_service.model else None
+    payload = gemini_service._create_travel_prompt(trip_request, place_retriever.retrieve(trip_request))
+    instruction_tokens = count_tokens(model, TRAVEL_SYSTEM_INSTRUCTION)
+    payload_tokens = count_tokens(model, payload)
+    
+    print("📏 INPUT TOKENS PER REQUEST" + (" (estimated, no GEMINI_API_KEY)" if model is None else ""))
+    print("=" * 50)
+    print(f"Before  (instructions inside every prompt):   {count_tokens(model, TRAVEL_SYSTEM_INSTRUCTION + payload)}")
+    print(f"After   (system instruction + payload):       {instruction_tokens + payload_tokens} ({payload_tokens} built per request)")
+    print(f"After   (context-cached instruction):         {payload_tokens} billed at full rate, {instruction_tokens} from cache")
+    print("-" * 50)
+    print(f"Live counters from usage metadata: {gemini_service.prompt_token_stats()}")
+
+if __name__ == "__main__":
+    measure_prompt_tokens()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the recommendation cache columns to AIRecommendations
+"""
+
+from database import engine
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_ai_recommendation_cache_columns():
+    """Add cacheKey/createdAt columns and their indexes used by the durable cache tier"""
+    
+    try:
+        connection = engine.raw_connection()
+        cursor = connection.cursor()
+        
+        logger.info("Adding cache columns to AIRecommendations table...")
+        cursor.execute('ALTER TABLE "AIRecommendations" ADD COLUMN IF NOT EXISTS "cacheKey" VARCHAR(64);')
+        cursor.execute('ALTER TABLE "AIRecommendations" ADD COLUMN IF NOT EXISTS "createdAt" TIMESTAMP DEFAULT now();')
+        
+        logger.info("Creating indexes...")
+        cursor.execute('CREATE INDEX IF NOT EXISTS "ix_AIRecommendations_cacheKey" ON "AIRecommendations" ("cacheKey");')
+        cursor.execute('CREATE INDEX IF NOT EXISTS "ix_AIRecommendations_createdAt" ON "AIRecommendations" ("createdAt");')
+        
+        connection.commit()
+        logger.info("Migration completed successfully!")
+        
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        if 'connection' in locals():
+            connection.rollback()
+        raise
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'connection' in locals():
+            connection.close()
+
+if __name__ == "__main__":
+    migrate_ai_recommendation_cache_columns()
+    print("Migration completed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Migration script to add compressed output storage and the list-view summary columns
+to AIRecommendations, then compress and summarize the existing rows in batches
+"""
+
+from database import engine
+from models.ai_recommendation import compress_output, summarize_output
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+def migrate_ai_recommendation_compressed_output():
+    """Add outputData/outputCodec/title/outputPreview and backfill them from output"""
+
+    try:
+        connection = engine.raw_connection()
+        cursor = connection.cursor()
+
+        logger.info("Adding compressed output columns to AIRecommendations table...")
+        cursor.execute('ALTER TABLE "AIRecommendations" ADD COLUMN IF NOT EXISTS "outputData" BYTEA;')
+        cursor.execute('ALTER TABLE "AIRecommendations" ADD COLUMN IF NOT EXISTS "outputCodec" SMALLINT;')
+        cursor.execute('ALTER TABLE "AIRecommendations" ADD COLUMN IF NOT EXISTS "title" VARCHAR(255);')
+        cursor.execute('ALTER TABLE "AIRecommendations" ADD COLUMN IF NOT EXISTS "outputPreview" VARCHAR(500);')
+        connection.commit()
+
+        # Rows not migrated yet have no codec; reserved rows ("") only get codec 0
+        logger.info("Compressing existing outputs...")
+        migrated = 0
+        while True:
+            cursor.execute('SELECT "idAIRec", "output" FROM "AIRecommendations" WHERE "outputCodec" IS NULL LIMIT %s;', (BATCH_SIZE,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            for idAIRec, text in rows:
+                codec, data = compress_output(text) if text else (0, None)
+                title, preview = summarize_output(text)
+                cursor.execute(
+                    'UPDATE "AIRecommendations" SET "outputCodec" = %s, "outputData" = %s, "output" = %s, "title" = %s, "outputPreview" = %s WHERE "idAIRec" = %s;',
+                    (codec, data, text if data is None else None, title, preview, idAIRec)
+                )
+            connection.commit()
+            migrated += len(rows)
+            logger.info(f"Migrated {migrated} rows")
+
+        logger.info("Migration completed successfully!")
+
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        if 'connection' in locals():
+            connection.rollback()
+        raise
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'connection' in locals():
+            connection.close()
+
+if __name__ == "__main__":
+    migrate_ai_recommendation_compressed_output()
+    print("Migration completed!")
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the structured itinerary column to AIRecommendations
+"""
+
+from database import engine
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_ai_recommendation_output_json():
+    """Add the outputJson column used by outputFormat="json" recommendations"""
+    
+    try:
+        connection = engine.raw_connection()
+        cursor = connection.cursor()
+        
+        logger.info("Adding outputJson column to AIRecommendations table...")
+        cursor.execute('ALTER TABLE "AIRecommendations" ADD COLUMN IF NOT EXISTS "outputJson" JSON;')
+        
+        connection.commit()
+        logger.info("Migration completed successfully!")
+        
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        if 'connection' in locals():
+            connection.rollback()
+        raise
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'connection' in locals():
+            connection.close()
+
+if __name__ == "__main__":
+    migrate_ai_recommendation_output_json()
+    print("Migration completed!")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the token/cost accounting columns to AIRecommendations
+"""
+
+from database import engine
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_ai_recommendation_usage_columns():
+    """Add source/token/latency columns and the index used by the usage report"""
+    
+    try:
+        connection = engine.raw_connection()
+        cursor = connection.cursor()
+        
+        logger.info("Adding usage columns to AIRecommendations table...")
+        cursor.execute('ALTER TABLE "AIRecommendations" ADD COLUMN IF NOT EXISTS "source" VARCHAR(16);')
+        cursor.execute('ALTER TABLE "AIRecommendations" ADD COLUMN IF NOT EXISTS "promptTokens" INTEGER;')
+        cursor.execute('ALTER TABLE "AIRecommendations" ADD COLUMN IF NOT EXISTS "responseTokens" INTEGER;')
+        cursor.execute('ALTER TABLE "AIRecommendations" ADD COLUMN IF NOT EXISTS "latencyMs" INTEGER;')
+        
+        logger.info("Creating indexes...")
+        cursor.execute('CREATE INDEX IF NOT EXISTS "ix_AIRecommendations_idUser_createdAt" ON "AIRecommendations" ("idUser", "createdAt");')
+        
+        connection.commit()
+        logger.info("Migration completed successfully!")
+        
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        if 'connection' in locals():
+            connection.rollback()
+        raise
+    finally:
+        if 'cursor' in locals():
+            cursor.close()
+        if 'connection' in locals():
+            connection.close()
+
+if __name__ == "__main__":
+    migrate_ai_recommendation_usage_columns()
+    print("Migration completed!")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for locating day sections in text outputs and splicing a regenerated day back in:
+    python -m pytest Database_insert/test_regenerate_day.py
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing the repository creates the engines; these tests never touch the database
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import asyncio
+from types import SimpleNamespace
+from repositories import ai_recommendation_repo
+from repositories.ai_recommendation_repo import _day_sections
+from services.gemini_service import render_itinerary_text
+from services.local_fallback import render_local_recommendation
+from schemas.ai_recommendation_schema import Itinerary, ItineraryDay, ItineraryActivity
+
+TRIP_REQUEST = {
+    "departure": "Hồ Chí Minh",
+    "destination": "Đà Lạt",
+    "people": 2,
+    "days": 3,
+    "time": "12/2025",
+    "money": "5-10 triệu VND",
+    "transportation": "xe khách",
+    "travelStyle": "thoải mái",
+    "interests": ["ẩm thực", "thiên nhiên"],
+    "accommodation": "khách sạn"
+}
+
+MARKDOWN_OUTPUT = """# 🌟 Đà Lạt 2 ngày
+
+## 📅 Ngày 1: Trung tâm
+### 🌅 Sáng
+- Hồ Xuân Hương
+
+### 🍽️ Trưa
+- Bánh căn
+
+## 📅 Ngày 2: Ngoại ô
+### 🌅 Sáng
+- Thác Datanla
+
+### 🌙 Tối
+- Chợ đêm
+
+## 💰 Chi phí
+- 3 triệu VND
+"""
+
+def regenerate(output: str, day: int, new_section: str) -> str:
+    """Run regenerate_day_async on a text recommendation with the model call and the database replaced"""
+    saved = {}
+    recommendation = SimpleNamespace(idUser="US0001", outputJson=None, output=output, input="")
+
+    async def fake_regenerate_day(trip_input, context, day, current, instruction, structured, usage):
+        return new_section
+
+    def fake_save(db, idAIRec, output, outputJson, usage):
+        saved["output"] = output
+        return output
+
+    originals = (ai_recommendation_repo.get_aiRec_by_id, ai_recommendation_repo._regenerate_day, ai_recommendation_repo._save_regenerated_day)
+    ai_recommendation_repo.get_aiRec_by_id = lambda db, idAIRec: recommendation
+    ai_recommendation_repo._regenerate_day = fake_regenerate_day
+    ai_recommendation_repo._save_regenerated_day = fake_save
+    try:
+        asyncio.run(ai_recommendation_repo.regenerate_day_async(None, "AI0001", "US0001", day, ""))
+    finally:
+        ai_recommendation_repo.get_aiRec_by_id, ai_recommendation_repo._regenerate_day, ai_recommendation_repo._save_regenerated_day = originals
+    return saved["output"]
+
+def test_last_day_keeps_its_emoji_subsections():
+    output = render_local_recommendation(TRIP_REQUEST)
+    start, end = _day_sections(output)[3]
+    last_day = output[start:end]
+
+    for subsection in ("🌅 Sáng", "🍽️ Trưa", "🌆 Chiều", "🌙 Tối"):
+        assert subsection in last_day
+    assert "🎯" not in last_day
+
+def test_regenerate_last_day_replaces_the_whole_day():
+    output = render_local_recommendation(TRIP_REQUEST)
+    new_section = "NGÀY 3: Ngày mới\n• Hoạt động mới"
+
+    spliced = regenerate(output, 3, new_section)
+    start = spliced.index("NGÀY 3:")
+
+    # Nothing of the old day 3 is left between the new day and the next section
+    assert spliced[start:spliced.index("🎯")].strip() == new_section
+    assert spliced[:start] == output[:output.index("NGÀY 3:")]
+    assert spliced[spliced.index("🎯"):] == output[output.index("🎯"):]
+
+def test_regenerate_middle_day_keeps_the_following_days():
+    output = render_local_recommendation(TRIP_REQUEST)
+
+    spliced = regenerate(output, 2, "NGÀY 2: Ngày mới\n• Hoạt động mới")
+
+    assert spliced.count("🌅 Sáng") == 2
+    assert spliced[spliced.index("NGÀY 3:"):] == output[output.index("NGÀY 3:"):]
+
+def test_rendered_itinerary_last_day_ends_at_costs():
+    itinerary = Itinerary(
+        title="Đà Lạt",
+        destination="Đà Lạt",
+        days=[ItineraryDay(day=day, title=f"Ngày {day}", activities=[
+            ItineraryActivity(time="08:00", place="Hồ Xuân Hương", description="Dạo hồ", estimatedCost=0)
+        ]) for day in (1, 2)],
+        estimatedTotalCost=1000000,
+        tips=["Mang áo ấm"]
+    )
+    output = render_itinerary_text(itinerary)
+
+    start, end = _day_sections(output)[2]
+
+    assert output[start:end].strip().endswith("(~0 VND)")
+    assert output[end:].lstrip().startswith("💰")
+
+def test_markdown_last_day_ends_at_same_level_heading():
+    start, end = _day_sections(MARKDOWN_OUTPUT)[2]
+
+    assert "### 🌙 Tối" in MARKDOWN_OUTPUT[start:end]
+    assert MARKDOWN_OUTPUT[end:].lstrip().startswith("## 💰")
+
+    spliced = regenerate(MARKDOWN_OUTPUT, 2, "## 📅 Ngày 2: Mới\n- Đồi chè")
+    assert spliced.endswith("## 📅 Ngày 2: Mới\n- Đồi chè\n\n## 💰 Chi phí\n- 3 triệu VND\n")
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
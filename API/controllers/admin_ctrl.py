@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from controllers.auth_ctrl import get_current_user
+import database
+import os
+
+router = APIRouter()
+
+# Danh sách idUser được xem trang admin, cách nhau bởi dấu phẩy; để trống = mọi user đã đăng nhập
+ADMIN_USER_IDS = {idUser.strip() for idUser in os.getenv("ADMIN_USER_IDS", "").split(",") if idUser.strip()}
+
+def _require_admin(current_user):
+    if not current_user or (ADMIN_USER_IDS and current_user.idUser not in ADMIN_USER_IDS):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+
+# Live connection pool statistics of this worker
+@router.get("/admin/db/pool")
+def get_db_pool_stats(current_user = Depends(get_current_user)):
+    """Report checked-out connections, overflow, timeouts and connection wait times of this worker's pools, and replica routing"""
+    _require_admin(current_user)
+    
+    return {
+        "config": {
+            "pool_size": database.DB_POOL_SIZE,
+            "max_overflow": database.DB_MAX_OVERFLOW,
+            "pool_timeout": database.DB_POOL_TIMEOUT,
+            "pool_recycle": database.DB_POOL_RECYCLE,
+            "pool_pre_ping": database.DB_POOL_PRE_PING,
+            "statement_timeout_ms": database.DB_STATEMENT_TIMEOUT_MS
+        },
+        "pools": [database.pool_monitor.snapshot(database.engine)] + (
+            [database.async_pool_monitor.snapshot(database.async_engine)] if database.async_engine is not None else []
+        ) + [monitor.snapshot(replica_engine) for monitor, replica_engine in database.replica_pools],
+        "replicas": database.replica_router.snapshot()
+    }
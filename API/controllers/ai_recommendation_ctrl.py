@@ -1,18 +1,53 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from schemas import ai_recommendation_schema
-from repositories import ai_recommendation_repo
-from database import get_db
+from repositories import ai_recommendation_repo, ai_rec_job_repo
+from database import get_db, sessionLocal
 from controllers.auth_ctrl import get_current_user
+from controllers.admin_ctrl import _require_admin
+from services.usage_quota import usage_quota
+from datetime import datetime, timedelta
+from typing import Literal
+import asyncio
+import json
 import logging
+import os
+import time
 
 router = APIRouter()
 
-@router.get("/ai_recs", response_model=list[ai_recommendation_schema.AIRecResponse])
-def get_ai_recs(db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100):
+JOB_EVENTS_POLL_SECONDS = 1.0
+AI_BATCH_MAX_ITEMS = int(os.getenv("AI_BATCH_MAX_ITEMS", "50"))
+
+# Convert request to dict for repository/service functions
+def _build_trip_data(trip_request: ai_recommendation_schema.TripGenerateRequest) -> dict:
+    return {
+        "departure": trip_request.departure.strip(),
+        "destination": trip_request.destination.strip(),
+        "people": trip_request.people,
+        "days": trip_request.days,
+        "time": trip_request.time.strip() if trip_request.time else "",
+        "money": trip_request.money.strip() if trip_request.money else "",
+        "transportation": trip_request.transportation.strip() if trip_request.transportation else "",
+        "travelStyle": trip_request.travelStyle.strip() if trip_request.travelStyle else "",
+        "interests": [interest.strip() for interest in trip_request.interests if interest.strip()],
+        "accommodation": trip_request.accommodation.strip() if trip_request.accommodation else "",
+        "outputFormat": trip_request.outputFormat
+    }
+
+def _itinerary_of(ai_rec) -> ai_recommendation_schema.Itinerary | None:
+    return ai_recommendation_schema.Itinerary.model_validate(ai_rec.outputJson) if ai_rec and ai_rec.outputJson is not None else None
+
+@router.get("/ai_recs", response_model=list[ai_recommendation_schema.AIRecResponse] | list[ai_recommendation_schema.AIRecSummary])
+def get_ai_recs(db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100, view: Literal["full", "summary"] = "full"):
+    """List recommendations; view=summary returns title, destination, days and a preview instead of full outputs"""
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
+    if view == "summary":
+        return ai_recommendation_repo.get_aiRec_summaries(db, skip, limit)
     return ai_recommendation_repo.get_aiRec(db, skip, limit)
 
 @router.get("/ai_recs/id/{idAIRec}", response_model=ai_recommendation_schema.AIRecResponse)
@@ -21,17 +56,84 @@ def get_ai_rec_by_id(idAIRec: str, db: Session = Depends(get_db), current_user =
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
     ai_rec = ai_recommendation_repo.get_aiRec_by_id(db, idAIRec)
-    if not ai_rec:
+    # Prefetched rows have no owner and are not user-facing
+    if not ai_rec or ai_rec.idUser is None:
         raise HTTPException(404, "AI recommendation not found")
     
     return ai_rec
 
-@router.get("/ai_recs/user", response_model=list[ai_recommendation_schema.AIRecResponse])
-def get_ai_rec_by_user(db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100):
+@router.get("/ai_recs/id/{idAIRec}/itinerary", response_model=ai_recommendation_schema.Itinerary)
+def get_ai_rec_itinerary(idAIRec: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Get the structured itinerary of a recommendation generated with outputFormat=json"""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    return ai_recommendation_repo.get_itinerary(db, idAIRec)
+
+@router.get("/ai_recs/id/{idAIRec}/itinerary/days/{day}", response_model=ai_recommendation_schema.ItineraryDay)
+def get_ai_rec_itinerary_day(idAIRec: str, day: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Get a single day of a structured itinerary"""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    itinerary = ai_recommendation_repo.get_itinerary(db, idAIRec)
+    for itinerary_day in itinerary.days:
+        if itinerary_day.day == day:
+            return itinerary_day
+    
+    raise HTTPException(404, "Itinerary day not found")
+
+@router.post("/ai_recs/id/{idAIRec}/days/{day}/regenerate", response_model=ai_recommendation_schema.TripGenerateResponse)
+async def regenerate_ai_rec_day(
+    idAIRec: str,
+    day: int,
+    change: ai_recommendation_schema.DayRegenerateRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Regenerate a single day of a saved recommendation following an instruction, keeping the other days"""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    if not change.instruction.strip():
+        raise HTTPException(status_code=400, detail="Instruction is required")
+    
+    await run_in_threadpool(usage_quota.check, current_user.idUser)
+    recommendation = await ai_recommendation_repo.regenerate_day_async(db, idAIRec, current_user.idUser, day, change.instruction.strip())
+    
+    return ai_recommendation_schema.TripGenerateResponse(
+        idAIRec=recommendation.idAIRec,
+        recommendation=recommendation.output,
+        itinerary=_itinerary_of(recommendation)
+    )
+
+@router.post("/ai_recs/id/{idAIRec}/itinerary/to-details", response_model=ai_recommendation_schema.ItineraryToDetailsResponse)
+def convert_ai_rec_itinerary_to_details(idAIRec: str, idTrip: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Create DetailInformation rows of a trip from a structured itinerary; activities whose place is unknown are skipped"""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    from repositories import detail_information_repo
+    
+    itinerary = ai_recommendation_repo.get_itinerary(db, idAIRec)
+    created, skipped = detail_information_repo.create_details_from_itinerary(db, idTrip, itinerary)
+    
+    return ai_recommendation_schema.ItineraryToDetailsResponse(
+        idTrip=idTrip,
+        created=[detail.idDetail for detail in created],
+        skipped=skipped
+    )
+
+@router.get("/ai_recs/user", response_model=list[ai_recommendation_schema.AIRecResponse] | list[ai_recommendation_schema.AIRecSummary])
+def get_ai_rec_by_user(db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100, view: Literal["full", "summary"] = "full"):
+    """List the current user's recommendations; view=summary skips the full outputs"""
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
 
-    ai_recs = ai_recommendation_repo.get_aiRec_by_user(db, current_user.idUser, skip, limit)
+    if view == "summary":
+        ai_recs = ai_recommendation_repo.get_aiRec_summaries(db, skip, limit, current_user.idUser)
+    else:
+        ai_recs = ai_recommendation_repo.get_aiRec_by_user(db, current_user.idUser, skip, limit)
     if ai_recs == []:
         raise HTTPException(404, "AI recommendation not found")
     
@@ -51,13 +153,22 @@ def delete_ai_rec(idAIRec: str, db: Session = Depends(get_db), current_user = De
     
     return ai_recommendation_repo.delete_aiRec(db, idAIRec)
 
-@router.post("/ai_recs/generate-trip", response_model=ai_recommendation_schema.TripGenerateResponse)
-def generate_trip_recommendation(
+@router.post(
+    "/ai_recs/generate-trip",
+    response_model=ai_recommendation_schema.TripGenerateResponse | ai_recommendation_schema.AIRecJobResponse
+)
+async def generate_trip_recommendation(
     trip_request: ai_recommendation_schema.TripGenerateRequest,
+    response: Response,
+    mode: str = "sync",
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """Generate a new trip recommendation using Gemini AI based on user input"""
+    """Generate a new trip recommendation using Gemini AI based on user input.
+    
+    With mode=job the request is queued and a job id is returned right away (202);
+    poll /ai_recs/jobs/{idJob} or subscribe to /ai_recs/jobs/{idJob}/events for the result.
+    """
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
@@ -68,25 +179,24 @@ def generate_trip_recommendation(
     if trip_request.days <= 0 or trip_request.people <= 0:
         raise HTTPException(status_code=400, detail="Days and people must be positive numbers")
     
+    if mode not in ("sync", "job"):
+        raise HTTPException(status_code=400, detail="mode must be 'sync' or 'job'")
+    
+    await run_in_threadpool(usage_quota.check, current_user.idUser)
+    
     # Convert request to dict for repository function
-    trip_data = {
-        "departure": trip_request.departure.strip(),
-        "destination": trip_request.destination.strip(),
-        "people": trip_request.people,
-        "days": trip_request.days,
-        "time": trip_request.time.strip() if trip_request.time else "",
-        "money": trip_request.money.strip() if trip_request.money else "",
-        "transportation": trip_request.transportation.strip() if trip_request.transportation else "",
-        "travelStyle": trip_request.travelStyle.strip() if trip_request.travelStyle else "",
-        "interests": [interest.strip() for interest in trip_request.interests if interest.strip()],
-        "accommodation": trip_request.accommodation.strip() if trip_request.accommodation else ""
-    }
+    trip_data = _build_trip_data(trip_request)
+    
+    if mode == "job":
+        job = await run_in_threadpool(ai_rec_job_repo.create_job, db, current_user.idUser, trip_data)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return ai_recommendation_schema.AIRecJobResponse(idJob=job.idJob, status=job.status)
     
     try:
         logging.info(f"Generating trip recommendation for user {current_user.idUser}: {trip_data['departure']} -> {trip_data['destination']}")
         
-        # Generate recommendation using Gemini AI
-        recommendation = ai_recommendation_repo.generate_trip_recommendation(
+        # Generate recommendation using Gemini AI (awaited, so the worker thread pool stays free)
+        recommendation = await ai_recommendation_repo.generate_trip_recommendation_async(
             db, current_user.idUser, trip_data
         )
         
@@ -94,7 +204,8 @@ def generate_trip_recommendation(
         
         return ai_recommendation_schema.TripGenerateResponse(
             idAIRec=recommendation.idAIRec,
-            recommendation=recommendation.output
+            recommendation=recommendation.output,
+            itinerary=_itinerary_of(recommendation)
         )
     except HTTPException:
         # Re-raise HTTP exceptions (like user not found)
@@ -106,29 +217,258 @@ def generate_trip_recommendation(
             detail="Internal server error while generating recommendation. Please try again later."
         )
 
+@router.post("/ai_recs/generate-trip/batch", response_model=ai_recommendation_schema.TripBatchResponse)
+async def generate_trip_recommendation_batch(
+    trip_requests: list[ai_recommendation_schema.TripGenerateRequest],
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Generate many trip recommendations in one call; each item gets its own result or error"""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    if not trip_requests:
+        raise HTTPException(status_code=400, detail="At least one trip request is required")
+    
+    if len(trip_requests) > AI_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {AI_BATCH_MAX_ITEMS} trip requests")
+    
+    # Invalid items are reported individually instead of failing the whole batch
+    results = [None] * len(trip_requests)
+    valid = []
+    for index, trip_request in enumerate(trip_requests):
+        if not trip_request.departure or not trip_request.destination:
+            results[index] = ai_recommendation_schema.TripBatchItemResult(index=index, error="Departure and destination are required")
+        elif trip_request.days <= 0 or trip_request.people <= 0:
+            results[index] = ai_recommendation_schema.TripBatchItemResult(index=index, error="Days and people must be positive numbers")
+        else:
+            valid.append(index)
+    
+    unique_trips = 0
+    if valid:
+        await run_in_threadpool(usage_quota.check, current_user.idUser, len(valid))
+        logging.info(f"Generating batch of {len(valid)} trip recommendations for user {current_user.idUser}")
+        try:
+            items, unique_trips = await ai_recommendation_repo.generate_trip_batch_async(
+                db, current_user.idUser, [_build_trip_data(trip_requests[index]) for index in valid]
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logging.error(f"Unexpected error generating trip batch: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail="Internal server error while generating recommendations. Please try again later."
+            )
+        
+        for index, (recommendation, source, error) in zip(valid, items):
+            if error:
+                results[index] = ai_recommendation_schema.TripBatchItemResult(index=index, error=error)
+            else:
+                results[index] = ai_recommendation_schema.TripBatchItemResult(
+                    index=index,
+                    idAIRec=recommendation.idAIRec,
+                    recommendation=recommendation.output,
+                    itinerary=_itinerary_of(recommendation),
+                    source=source
+                )
+    
+    return ai_recommendation_schema.TripBatchResponse(
+        total=len(results),
+        succeeded=sum(1 for result in results if result.error is None),
+        unique_trips=unique_trips,
+        results=results
+    )
+
+def _job_response(db: Session, job) -> ai_recommendation_schema.AIRecJobResponse:
+    ai_rec = None
+    if job.status == "done" and job.idAIRec:
+        ai_rec = ai_recommendation_repo.get_aiRec_by_id(db, job.idAIRec)
+    
+    return ai_recommendation_schema.AIRecJobResponse(
+        idJob=job.idJob,
+        status=job.status,
+        idAIRec=job.idAIRec,
+        recommendation=ai_rec.output if ai_rec else None,
+        itinerary=_itinerary_of(ai_rec),
+        error=job.error
+    )
+
+@router.get("/ai_recs/jobs/{idJob}", response_model=ai_recommendation_schema.AIRecJobResponse)
+def get_trip_job(idJob: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Poll the status of a queued trip generation job"""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    job = ai_rec_job_repo.get_job_by_id(db, idJob)
+    if not job or job.idUser != current_user.idUser:
+        raise HTTPException(404, "Job not found")
+    
+    return _job_response(db, job)
+
+async def _job_events(idJob: str):
+    # Poll with a fresh short session each time; the request session is closed while streaming
+    def _poll():
+        db = sessionLocal()
+        try:
+            job = ai_rec_job_repo.get_job_by_id(db, idJob)
+            return _job_response(db, job) if job else None
+        finally:
+            db.close()
+    
+    last_status = None
+    while True:
+        job = await run_in_threadpool(_poll)
+        if job is None:
+            yield _sse("error", {"detail": "Job not found"})
+            return
+        
+        if job.status != last_status:
+            last_status = job.status
+            yield _sse(job.status, job.model_dump())
+        
+        if job.status in ("done", "failed"):
+            return
+        await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+@router.get("/ai_recs/jobs/{idJob}/events")
+def subscribe_trip_job(idJob: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Subscribe to a trip generation job as Server-Sent Events until it is done or failed"""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    job = ai_rec_job_repo.get_job_by_id(db, idJob)
+    if not job or job.idUser != current_user.idUser:
+        raise HTTPException(404, "Job not found")
+    
+    return StreamingResponse(
+        _job_events(idJob),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Format one Server-Sent Event
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _stream_trip_events(idUser: str, trip_data: dict):
+    from services.gemini_service import GenerationResult, gemini_service
+    
+    # Flush an event straight away so the client sees the first byte before Gemini answers
+    yield _sse("start", {"destination": trip_data["destination"], "days": trip_data["days"]})
+    
+    parts = []
+    source, cache_key = "local", ""
+    usage = {"prompt_tokens": 0, "response_tokens": 0}
+    started = time.monotonic()
+    try:
+        async for chunk in gemini_service.stream_async(trip_data, usage):
+            parts.append(chunk.text)
+            source, cache_key = chunk.source, chunk.cache_key
+            yield _sse("chunk", {"text": chunk.text})
+    except Exception as e:
+        logging.error(f"Trip recommendation stream interrupted: {e}")
+        yield _sse("error", {"detail": "AI generation was interrupted. Please try again later."})
+        return
+    
+    # The request-scoped session is already closed once streaming starts, so persist with a short-lived one
+    db = sessionLocal()
+    try:
+        result = GenerationResult("".join(parts), source, cache_key, latency_ms=int((time.monotonic() - started) * 1000), **usage)
+        recommendation = await run_in_threadpool(ai_recommendation_repo.save_trip_recommendation, db, idUser, trip_data, result)
+        yield _sse("done", {"idAIRec": recommendation.idAIRec, "source": source})
+    except Exception as e:
+        logging.error(f"Error saving streamed trip recommendation: {e}")
+        yield _sse("error", {"detail": "Recommendation was generated but could not be saved."})
+    finally:
+        db.close()
+
+@router.post("/ai_recs/generate-trip/stream")
+async def stream_trip_recommendation(
+    trip_request: ai_recommendation_schema.TripGenerateRequest,
+    current_user = Depends(get_current_user)
+):
+    """Stream a trip recommendation from Gemini as Server-Sent Events, then save it"""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    if not trip_request.departure or not trip_request.destination:
+        raise HTTPException(status_code=400, detail="Departure and destination are required")
+    
+    if trip_request.days <= 0 or trip_request.people <= 0:
+        raise HTTPException(status_code=400, detail="Days and people must be positive numbers")
+    
+    # A partial JSON document is of no use to the client, so structured itineraries are not streamed
+    if trip_request.outputFormat == "json":
+        raise HTTPException(status_code=400, detail="Streaming only supports outputFormat 'text'")
+    
+    await run_in_threadpool(usage_quota.check, current_user.idUser)
+    
+    trip_data = _build_trip_data(trip_request)
+    logging.info(f"Streaming trip recommendation for user {current_user.idUser}: {trip_data['departure']} -> {trip_data['destination']}")
+    
+    return StreamingResponse(
+        _stream_trip_events(current_user.idUser, trip_data),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/ai_recs/health")
 def check_ai_service_health(current_user = Depends(get_current_user)):
-    """Check the health status of AI service (Gemini API)"""
+    """Check the health status of AI service (Gemini API) from the background prober's recent numbers"""
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
     try:
-        from services.gemini_service import gemini_service
+        from services.gemini_service import gemini_service, gemini_breaker, GEMINI_MODEL
+        from services.health_probe import health_prober
+        
+        breaker = gemini_breaker.snapshot()
+        probe = health_prober.snapshot()
+        degraded_reason = health_prober.degraded_reason(probe)
         
         # Check if Gemini service is available
-        if gemini_service.model:
+        if not gemini_service.model:
             return {
-                "status": "healthy",
+                "status": "fallback",
+                "ai_service": "Local Generation",
+                "model": "fallback",
+                "message": "Using local fallback due to Gemini API unavailability",
+                "circuit_breaker": breaker,
+                "probe": probe
+            }
+        elif breaker["state"] == "open":
+            return {
+                "status": "degraded",
+                "ai_service": "Local Generation",
+                "model": GEMINI_MODEL,
+                "message": "Circuit breaker is open: Gemini is failing or slow, requests use the local fallback",
+                "circuit_breaker": breaker,
+                "probe": probe
+            }
+        elif degraded_reason:
+            return {
+                "status": "degraded",
                 "ai_service": "Gemini AI",
-                "model": "gemini-1.5-flash",
-                "message": "AI service is running properly"
+                "model": GEMINI_MODEL,
+                "message": degraded_reason,
+                "circuit_breaker": breaker,
+                "probe": probe
             }
         else:
+            if breaker["state"] != "closed":
+                message = "Gemini is being probed after an outage"
+            elif probe["stale"]:
+                message = "AI service is configured; no recent health probe results"
+            else:
+                message = "AI service is running properly"
             return {
-                "status": "fallback",
-                "ai_service": "Local Generation",
-                "model": "fallback",
-                "message": "Using local fallback due to Gemini API unavailability"
+                "status": "healthy",
+                "ai_service": "Gemini AI",
+                "model": GEMINI_MODEL,
+                "message": message,
+                "circuit_breaker": breaker,
+                "probe": probe
             }
     except Exception as e:
         logging.error(f"Error checking AI service health: {e}")
@@ -139,8 +479,50 @@ def check_ai_service_health(current_user = Depends(get_current_user)):
             "message": f"Error checking service: {str(e)}"
         }
 
+@router.get("/ai_recs/metrics")
+def get_ai_service_metrics(current_user = Depends(get_current_user)):
+    """Report in-process AI service counters (cache hits/misses, coalesced requests)"""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    from services.recommendation_cache import recommendation_cache
+    from services.gemini_service import gemini_service, trip_flights
+    from services.prefetch import prefetch_scheduler
+    from services.health_probe import health_prober
+    
+    return {
+        "cache": recommendation_cache.stats(),
+        "single_flight": trip_flights.stats(),
+        "gemini": gemini_service.stats(),
+        "prefetch": prefetch_scheduler.stats(),
+        "health_probe": health_prober.snapshot(),
+        "quota": usage_quota.stats()
+    }
+
+@router.get("/ai_recs/usage", response_model=ai_recommendation_schema.AIUsageReport)
+def get_ai_usage(days: int = 7, idUser: str | None = None, allUsers: bool = False, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+    """Report tokens, p50/p95 latency and cache hit rate per day for the caller (admins: any user or all users), plus the caller's quota for today"""
+    if not current_user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    # Other users' usage is admin-only
+    if allUsers or (idUser and idUser != current_user.idUser):
+        _require_admin(current_user)
+    idUser = None if allUsers else idUser or current_user.idUser
+    
+    if days <= 0:
+        raise HTTPException(status_code=400, detail="days must be a positive number")
+    
+    since = datetime.combine(datetime.utcnow().date() - timedelta(days=days - 1), datetime.min.time())
+    
+    return ai_recommendation_schema.AIUsageReport(
+        since=since.date().isoformat(),
+        usage=ai_recommendation_repo.get_usage_report(db, since, idUser),
+        quota=usage_quota.usage(current_user.idUser)
+    )
+
 @router.post("/ai_recs/test-gemini")
-def test_gemini_generation(
+async def test_gemini_generation(
     trip_request: ai_recommendation_schema.TripGenerateRequest,
     current_user = Depends(get_current_user)
 ):
@@ -152,25 +534,15 @@ def test_gemini_generation(
     from datetime import datetime
     
     # Convert request to dict
-    trip_data = {
-        "departure": trip_request.departure.strip(),
-        "destination": trip_request.destination.strip(),
-        "people": trip_request.people,
-        "days": trip_request.days,
-        "time": trip_request.time.strip() if trip_request.time else "",
-        "money": trip_request.money.strip() if trip_request.money else "",
-        "transportation": trip_request.transportation.strip() if trip_request.transportation else "",
-        "travelStyle": trip_request.travelStyle.strip() if trip_request.travelStyle else "",
-        "interests": [interest.strip() for interest in trip_request.interests if interest.strip()],
-        "accommodation": trip_request.accommodation.strip() if trip_request.accommodation else ""
-    }
+    trip_data = _build_trip_data(trip_request)
     
     try:
         # Generate recommendation using Gemini
-        recommendation = gemini_service.generate_travel_recommendation(trip_data)
+        result = await gemini_service.generate_async(trip_data)
+        recommendation = result.text
         
         # Determine which service was used
-        ai_service = "Gemini AI" if gemini_service.model else "Local Fallback"
+        ai_service = {"gemini": "Gemini AI", "coalesced": "Gemini AI", "cache": "Recommendation Cache"}.get(result.source, "Local Fallback")
         
         return {
             "success": True,
@@ -3,7 +3,9 @@ from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from jose import jwt
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
+from repositories import user_repo
 from models.token import Token
 from models.user import User
 import auth
@@ -15,6 +17,12 @@ router = APIRouter()
 # Config security with OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
 
+CREDENTIALS_EXCEPTION = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
 # API register user
 @router.post("/register")
 def register(
@@ -121,24 +129,33 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
         "language": user.language
     }
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
+def _token_username(token: str) -> str:
     try:
         payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise CREDENTIALS_EXCEPTION
     except jwt.JWTError:
-        raise credentials_exception
+        raise CREDENTIALS_EXCEPTION
+    
+    return username
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    username = _token_username(token)
     
     # Thay đổi: lấy thông tin từ User thay vì Token
     user = db.query(User).filter(User.username == username).first()
     if user is None:
-        raise credentials_exception
+        raise CREDENTIALS_EXCEPTION
+    
+    return user
+
+# Same check on the async engine, so async endpoints do not take a threadpool thread for authentication
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    username = _token_username(token)
+    
+    user = await user_repo.get_user_by_async(db, "username", username)
+    if user is None:
+        raise CREDENTIALS_EXCEPTION
     
     return user
@@ -2,26 +2,27 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from schemas import notification_schema
 from repositories import notification_repo
-from database import get_db
-from controllers.auth_ctrl import get_current_user
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_read_db
+from controllers.auth_ctrl import get_current_user, get_current_user_async
 
 router = APIRouter()
 
 # Get all notifcations
 @router.get("/notifications", response_model=list[notification_schema.NotificationResponse])
-def get_notifications(db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int =0, limit: int = 100):
+async def get_notifications(db: AsyncSession = Depends(get_async_read_db), current_user = Depends(get_current_user_async), skip: int =0, limit: int = 100):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return notification_repo.get_notifications(db=db, skip=skip, limit=limit)
+    return await notification_repo.get_notifications_async(db=db, skip=skip, limit=limit)
 
 # Get notification by id
 @router.get("/notifications", response_model=notification_schema.NotificationResponse)
-def get_notification_by_id(idNotf: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_notification_by_id(idNotf: str, db: AsyncSession = Depends(get_async_read_db), current_user = Depends(get_current_user_async)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    notf = notification_repo.get_notification_by_id(db=db, idNotf=idNotf)
+    notf = await notification_repo.get_notification_by_id_async(db=db, idNotf=idNotf)
     if notf is None:
         raise HTTPException(status_code=404, detail="Notification not found")
     
@@ -29,29 +30,29 @@ def get_notification_by_id(idNotf: str, db: Session = Depends(get_db), current_u
 
 # Get notification by user
 @router.get("/notifications/{idUser}", response_model=list[notification_schema.NotificationResponse])
-def get_notification_by_user(idUser: str, db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100):
+async def get_notification_by_user(idUser: str, db: AsyncSession = Depends(get_async_read_db), current_user = Depends(get_current_user_async), skip: int = 0, limit: int = 100):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    notf = notification_repo.get_notification_by_user(db, idUser, skip, limit)
+    notf = await notification_repo.get_notification_by_user_async(db, idUser, skip, limit)
     if notf == []:
         raise HTTPException(status_code=404, detail="Notification not found")
     
     return notf
 
 @router.get("notifications/unread/{user_id}", response_model=list[notification_schema.NotificationResponse])
-def get_unread_notifications(
+async def get_unread_notifications(
     user_id: str,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user = Depends(get_current_user_async)
 ):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
     """Get all unread notifications for a specific user"""
-    notifications = notification_repo.get_unread_notifications(db, user_id, skip=skip, limit=limit)
+    notifications = await notification_repo.get_unread_notifications_async(db, user_id, skip=skip, limit=limit)
     return notifications
 
 # Post a new notification
@@ -1,25 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_read_db
 from schemas import place_schema, booking_schema
-from controllers.auth_ctrl import get_current_user
+from controllers.auth_ctrl import get_current_user, get_current_user_async
 from repositories import place_repo
 
 router = APIRouter()
 
 @router.get("/places/all", response_model=list[place_schema.PlaceResponse])
-def get_places(db: Session = Depends(get_db), current_user = Depends(get_current_user), skip: int = 0, limit: int = 100):
+async def get_places(db: AsyncSession = Depends(get_async_read_db), current_user = Depends(get_current_user_async), skip: int = 0, limit: int = 100):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    return place_repo.get_places(db, skip, limit)
+    return await place_repo.get_places_async(db, skip, limit)
 
 @router.get("/places", response_model=place_schema.PlaceResponse)
-def get_place_by_id(idPlace: str, db: Session = Depends(get_db)):
+async def get_place_by_id(idPlace: str, db: AsyncSession = Depends(get_async_read_db)):
     # if not current_user:
     #     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    place = place_repo.get_place_by_id(db, idPlace)
+    place = await place_repo.get_place_by_id_async(db, idPlace)
     if place is None:
         raise HTTPException(404, "Place not found")
     
@@ -37,11 +38,11 @@ def get_bookings_by_place(idPlace: str, db: Session = Depends(get_db), current_u
     return bookings
 
 @router.get("/places/{select}", response_model=list[place_schema.PlaceResponse])
-def get_place_by(select: str, lookup: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+async def get_place_by(select: str, lookup: str, db: AsyncSession = Depends(get_async_read_db), current_user = Depends(get_current_user_async)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
-    places = place_repo.get_place_by(db, select, lookup)
+    places = await place_repo.get_place_by_async(db, select, lookup)
     if places == []:
         raise HTTPException(status_code=404, detail="Place not found")
     
@@ -81,14 +82,14 @@ def delete_place(idPlace: str, db: Session = Depends(get_db), current_user = Dep
     return place_repo.delete_place(db, idPlace)
 
 @router.get("/search/", response_model=list[place_schema.PlaceResponse])
-def search_places(
+async def search_places(
     query: str,
     place_type: int = None,
     min_rating: int = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Search places with filters"""
-    places = place_repo.search_places(
+    places = await place_repo.search_places_async(
         db,
         query=query,
         place_type=place_type,
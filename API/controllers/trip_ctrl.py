@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from schemas import trip_schema, user_schema, place_schema
 from repositories import trip_repo
-from database import get_db
+from database import get_db, get_read_db
 from controllers.auth_ctrl import get_current_user
 
 router = APIRouter()
@@ -17,7 +17,7 @@ def create_trip(trip: trip_schema.TripCreate, db: Session = Depends(get_db), cur
 
 # Get all trips
 @router.get("/trips/", response_model=list[trip_schema.TripResponse])
-def get_trips(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_trips(db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
@@ -25,7 +25,7 @@ def get_trips(db: Session = Depends(get_db), current_user = Depends(get_current_
 
 # Get a trip by id
 @router.get("/trips", response_model=trip_schema.TripResponse)
-def get_trip_by_id(idTrip: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_trip_by_id(idTrip: str, db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
@@ -37,7 +37,7 @@ def get_trip_by_id(idTrip: str, db: Session = Depends(get_db), current_user = De
 
 # Get a trip by
 @router.get("/trips/{select}", response_model=list[trip_schema.TripResponse])
-def get_trip_by(select: str, lookup: str, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_trip_by(select: str, lookup: str, db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
@@ -49,7 +49,7 @@ def get_trip_by(select: str, lookup: str, db: Session = Depends(get_db), current
 
 # Get trips by date and keyword
 @router.get("/trips/date-key", response_model=list[trip_schema.TripResponse])
-def get_trips_date_key(start_date: str = None, end_date: str = None, keyword: str = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_trips_date_key(start_date: str = None, end_date: str = None, keyword: str = None, db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
@@ -61,7 +61,7 @@ def get_trips_date_key(start_date: str = None, end_date: str = None, keyword: st
 
 # Get members by trip
 @router.get("/trips/{idTrip}/members/", response_model=list[user_schema.UserResponse])
-def get_members_by_trip(idTrip: str = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_members_by_trip(idTrip: str = None, db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
@@ -72,7 +72,7 @@ def get_members_by_trip(idTrip: str = None, db: Session = Depends(get_db), curre
     return members
 
 @router.get("/trips/{idTrip}/reviewed/", response_model=list[user_schema.UserResponse])
-def get_users_reviewed_trip(idTrip: str = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_users_reviewed_trip(idTrip: str = None, db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
@@ -83,7 +83,7 @@ def get_users_reviewed_trip(idTrip: str = None, db: Session = Depends(get_db), c
     return users
 
 @router.get("/trips/{idTrip}/places/", response_model=list[place_schema.PlaceResponse])
-def get_places_of_trip(idTrip: str = None, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_places_of_trip(idTrip: str = None, db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
     
@@ -1,10 +1,16 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
 from sqlalchemy.exc import SQLAlchemyError
 from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, Request
 import os
 import logging
 import pathlib
+from services.pool_monitor import PoolMonitor
+from services.replica_router import Replica, ReplicaRouter, request_user
 
 # Cấu hình log
 logging.basicConfig(level=logging.INFO)
@@ -26,10 +32,70 @@ else:
 DATABASE_URL = os.getenv("DATABASE_URL")
 # Use a raw string to avoid escaping issues
 
+# Cấu hình connection pool cho mỗi worker (mỗi worker có pool riêng)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recycle connections before the server or a proxy drops idle ones; -1 = never
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# PostgreSQL statement_timeout per connection (ms); 0 = no limit
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+# Read replicas (cách nhau bởi dấu phẩy); để trống = mọi truy vấn đều vào primary
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# A replica further behind than this is taken out of rotation until it catches up
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "30"))
+DB_REPLICA_CHECK_SECONDS = float(os.getenv("DB_REPLICA_CHECK_SECONDS", "10"))
+# After a user's own write their reads stay on the primary this long (or longer while replicas lag more)
+DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+pool_monitor = PoolMonitor("primary")
+
+def engine_options(url: str, monitor: PoolMonitor, pool_base=QueuePool) -> dict:
+    """create_engine() / create_async_engine() keyword arguments for the configured pool"""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory SQLite uses a single-connection pool that takes no sizing options
+        return {}
+    
+    options = {
+        "poolclass": monitor.pool_class(pool_base),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if DB_STATEMENT_TIMEOUT_MS > 0 and url.get_backend_name() == "postgresql":
+        if url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+def async_database_url(url: str) -> str:
+    """Same database through an asyncio driver (asyncpg for PostgreSQL)"""
+    url = make_url(url)
+    drivers = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+    return url.set(drivername=drivers.get(url.get_backend_name(), url.drivername)).render_as_string(hide_password=False)
+
+class RoutingSession(Session):
+    """Session that reads from the replica chosen by get_read_db; flushes, DML and every read after them use the primary"""
+    def get_bind(self, mapper=None, clause=None, **kw):
+        read_bind = self.info.get("read_bind")
+        if read_bind is not None and not self._flushing and not isinstance(clause, UpdateBase):
+            return read_bind
+        # This session writes: its later reads must see the write, so it stays on the primary
+        self.info.pop("read_bind", None)
+        return super().get_bind(mapper, clause=clause, **kw)
+
 try:
-    engine = create_engine(DATABASE_URL)
-    sessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, pool_monitor))
+    pool_monitor.attach(engine)
+    sessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
     logger.info("✅ Đã kết nối đến PostgreSQL database thành công.")
+    logger.info(f"✅ Pool: size={DB_POOL_SIZE}, max_overflow={DB_MAX_OVERFLOW}, timeout={DB_POOL_TIMEOUT}s, recycle={DB_POOL_RECYCLE}s, pre_ping={DB_POOL_PRE_PING}")
     logger.info(f"✅ Kết nối với URL: {DATABASE_URL}")
 except SQLAlchemyError as e:
     logger.error("❌ Kết nối đến database thất bại.")
@@ -37,6 +103,49 @@ except SQLAlchemyError as e:
     logger.exception(e)
     raise e  # bắt buộc raise để FastAPI biết lỗi
 
+# Async engine next to the sync one, for endpoints that should not take a threadpool thread per request.
+# It has its own pool with the same DB_POOL_* settings.
+DATABASE_ASYNC_URL = os.getenv("DATABASE_ASYNC_URL") or async_database_url(DATABASE_URL)
+async_pool_monitor = PoolMonitor("async")
+
+try:
+    async_engine = create_async_engine(DATABASE_ASYNC_URL, **engine_options(DATABASE_ASYNC_URL, async_pool_monitor, AsyncAdaptedQueuePool))
+    async_pool_monitor.attach(async_engine)
+    asyncSessionLocal = async_sessionmaker(async_engine, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False)
+except ImportError as e:
+    # The async driver (asyncpg) is missing: only endpoints using get_async_db are affected
+    logger.error(f"❌ Không tạo được async engine: {e}")
+    async_engine = None
+    asyncSessionLocal = None
+
+# Each replica gets its own monitored pools with the DB_POOL_* settings
+replica_pools = []  # (PoolMonitor, engine) of every replica pool, for /admin/db/pool
+
+def _create_replica(index: int, url: str) -> Replica:
+    name = f"replica-{index}"
+    monitor = PoolMonitor(name)
+    replica_engine = create_engine(url, **engine_options(url, monitor))
+    monitor.attach(replica_engine)
+    replica_pools.append((monitor, replica_engine))
+
+    replica_async_engine = None
+    if async_engine is not None:
+        async_url = async_database_url(url)
+        async_monitor = PoolMonitor(f"{name}-async")
+        replica_async_engine = create_async_engine(async_url, **engine_options(async_url, async_monitor, AsyncAdaptedQueuePool))
+        async_monitor.attach(replica_async_engine)
+        replica_pools.append((async_monitor, replica_async_engine))
+    return Replica(name, replica_engine, replica_async_engine)
+
+replica_router = ReplicaRouter(
+    [_create_replica(index, url) for index, url in enumerate(DATABASE_REPLICA_URLS, start=1)],
+    max_lag_seconds=DB_REPLICA_MAX_LAG_SECONDS,
+    read_your_writes_seconds=DB_READ_YOUR_WRITES_SECONDS,
+    check_interval=DB_REPLICA_CHECK_SECONDS
+)
+if replica_router.enabled:
+    logger.info(f"✅ Read replicas: {len(replica_router.replicas)}, read-your-writes window {DB_READ_YOUR_WRITES_SECONDS}s")
+
 Base = declarative_base()  # Create a new base class for models
 
 # Get session and work with database
@@ -45,4 +154,25 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async session for async endpoints
+async def get_async_db():
+    if asyncSessionLocal is None:
+        raise HTTPException(status_code=503, detail="Async database driver is not installed")
+    async with asyncSessionLocal() as db:
+        yield db
+
+# Sessions for read-only endpoints: the request's reads go to a healthy replica (round-robin),
+# unless the user wrote within the read-your-writes window. get_current_user shares the session.
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    replica = replica_router.pick(request_user(request))
+    if replica is not None:
+        db.info["read_bind"] = replica.engine
+    return db
+
+async def get_async_read_db(request: Request, db: AsyncSession = Depends(get_async_db)):
+    replica = replica_router.pick(request_user(request), async_session=True)
+    if replica is not None:
+        db.info["read_bind"] = replica.async_engine.sync_engine
+    return db
@@ -1,9 +1,31 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from controllers import review_ctrl, trip_ctrl, trip_member_ctrl, user_ctrl, auth_ctrl, booking_ctrl, notification_ctrl, friend_ctrl, ai_recommendation_ctrl, detail_information_ctrl, place_ctrl, detail_booking_ctrl
-from controllers import social_auth_ctrl
+from controllers import social_auth_ctrl, admin_ctrl
+from services.ai_job_worker import ai_job_workers
+from services.prefetch import prefetch_scheduler
+from services.health_probe import health_prober
+from services.reservation_sweeper import reservation_sweeper
+from services.replica_router import READ_METHODS, request_user
+from database import replica_router
 
-app = FastAPI()
+# Start/stop background workers together with the app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ai_job_workers.start()
+    prefetch_scheduler.start()
+    health_prober.start()
+    replica_router.start()
+    reservation_sweeper.start()
+    yield
+    await reservation_sweeper.stop()
+    await replica_router.stop()
+    await health_prober.stop()
+    await prefetch_scheduler.stop()
+    await ai_job_workers.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS Middleware Configuration
 origins = [
@@ -23,6 +45,14 @@ app.add_middleware(
     allow_headers=["*"],  # Cho phép tất cả các header
 )
 
+# A user who just wrote reads from the primary for a short window, so replica lag never hides their own write
+@app.middleware("http")
+async def track_writes(request: Request, call_next):
+    response = await call_next(request)
+    if replica_router.enabled and request.method not in READ_METHODS and response.status_code < 400:
+        replica_router.note_write(request_user(request))
+    return response
+
 app.include_router(auth_ctrl.router, prefix="/api/v1", tags=["auth"])
 app.include_router(social_auth_ctrl.router, prefix="/api/v1", tags=["auth"])
 app.include_router(user_ctrl.router, prefix="/api/v1", tags=["users"])
@@ -36,6 +66,7 @@ app.include_router(review_ctrl.router, prefix="/api/v1", tags=["reviews"])
 app.include_router(booking_ctrl.router, prefix="/api/v1", tags=["bookings"])
 app.include_router(detail_booking_ctrl.router, prefix="/api/v1", tags=["detail_bookings"])
 app.include_router(ai_recommendation_ctrl.router, prefix="/api/v1", tags=["ai_recommendations"])
+app.include_router(admin_ctrl.router, prefix="/api/v1", tags=["admin"])
 # app.include_router(conversation_ctrl.router, prefix="/api/v1", tags=["conversations"])
 # app.include_router(message_ctrl.router, prefix="/api/v1", tags=["messages"])
 
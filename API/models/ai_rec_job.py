@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, ForeignKey, Text, Integer, DateTime
+from database import Base
+from datetime import datetime
+
+class AIRecJob(Base):
+    __tablename__ = "AIRecJobs"
+
+    idJob = Column(String(6), primary_key=True, index=True)
+    idUser = Column(String(6), ForeignKey("Users.idUser", ondelete="CASCADE"), index=True)
+    input = Column(Text)  # Trip request as JSON
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending, running, done, failed
+    idAIRec = Column(String(6), ForeignKey("AIRecommendations.idAIRec", ondelete="SET NULL"), nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    createdAt = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    leaseUntil = Column(DateTime, nullable=True)  # A running job whose lease expired is picked up again
+    finishedAt = Column(DateTime, nullable=True)
\ No newline at end of file
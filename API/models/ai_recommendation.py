@@ -1,13 +1,101 @@
-from sqlalchemy import Column, String, ForeignKey, Text
+from sqlalchemy import Column, String, ForeignKey, Text, DateTime, JSON, Integer, SmallInteger, LargeBinary, Index, or_
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import deferred
 from database import Base
 from sqlalchemy.orm import relationship
+from datetime import datetime
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Codec của output: 0 = text thường trong cột "output", 1 = zlib, 2 = zstd (trong "outputData")
+CODEC_PLAIN = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+AI_REC_OUTPUT_CODEC = os.getenv("AI_REC_OUTPUT_CODEC", "zlib")
+# Outputs shorter than this stay plain text; compressing them saves nothing
+AI_REC_COMPRESS_MIN_BYTES = int(os.getenv("AI_REC_COMPRESS_MIN_BYTES", "256"))
+AI_REC_PREVIEW_CHARS = int(os.getenv("AI_REC_PREVIEW_CHARS", "200"))
+
+def _write_codec() -> int:
+    if AI_REC_OUTPUT_CODEC == "zstd" and zstandard is not None:
+        return CODEC_ZSTD
+    if AI_REC_OUTPUT_CODEC == "none":
+        return CODEC_PLAIN
+    return CODEC_ZLIB
+
+def compress_output(text: str) -> tuple[int, bytes | None]:
+    """Encode an output for storage; returns (codec, data), data is None for plain text"""
+    raw = text.encode("utf-8")
+    codec = _write_codec()
+    if codec == CODEC_PLAIN or len(raw) < AI_REC_COMPRESS_MIN_BYTES:
+        return CODEC_PLAIN, None
+    if codec == CODEC_ZSTD:
+        return CODEC_ZSTD, zstandard.ZstdCompressor(level=9).compress(raw)
+    return CODEC_ZLIB, zlib.compress(raw, 6)
+
+def decompress_output(codec: int | None, text: str | None, data: bytes | None) -> str | None:
+    if not codec or data is None:
+        return text
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data).decode("utf-8")
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Output was stored with zstd but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown AI recommendation output codec: {codec}")
+
+def summarize_output(text: str | None) -> tuple[str | None, str | None]:
+    """(title, preview) for list views: the first non-empty line and the leading characters"""
+    title = next((line.strip()[:255] for line in (text or "").splitlines() if line.strip()), None)
+    return title, (text or "")[:AI_REC_PREVIEW_CHARS] or None
 
 class AIRecommendation(Base):
     __tablename__ = "AIRecommendations"
+    # Per-user, per-day usage report and quota seeding
+    __table_args__ = (Index("ix_AIRecommendations_idUser_createdAt", "idUser", "createdAt"),)
 
     idAIRec = Column(String(6), primary_key=True, index=True)
     idUser = Column(String(6), ForeignKey("Users.idUser"), index=True)
     input = Column(Text)  # Changed from String(1000) to Text for longer input
-    output = Column(Text)  # Changed from String(1000) to Text for longer recommendations
-    
-    owner_ai_rec = relationship("User", back_populates="ai_recs")
\ No newline at end of file
+    # Full outputs are only loaded when accessed (one query per row for the whole "output" group)
+    outputText = deferred(Column("output", Text), group="output")  # Plain output (codec 0); "" while a generation is in flight
+    outputData = deferred(Column(LargeBinary, nullable=True), group="output")  # Compressed output (codec 1/2)
+    outputCodec = Column(SmallInteger, nullable=True, default=CODEC_PLAIN)
+    outputJson = deferred(Column(JSON, nullable=True), group="output")  # Structured itinerary when generated with outputFormat "json"
+    title = Column(String(255), nullable=True)  # First line of the output, for list views
+    outputPreview = Column(String(500), nullable=True)  # Leading characters of the output, for list views
+    cacheKey = Column(String(64), nullable=True, index=True)  # Canonical trip hash, set only for Gemini outputs
+    createdAt = Column(DateTime, nullable=True, default=datetime.utcnow, index=True)
+    source = Column(String(16), nullable=True)  # gemini, cache, coalesced or local
+    promptTokens = Column(Integer, nullable=True)
+    responseTokens = Column(Integer, nullable=True)
+    latencyMs = Column(Integer, nullable=True)
+
+    owner_ai_rec = relationship("User", back_populates="ai_recs")
+
+    @property
+    def output(self) -> str | None:
+        return decompress_output(self.outputCodec, self.outputText, self.outputData)
+
+    @output.setter
+    def output(self, text: str | None):
+        codec, data = compress_output(text) if text else (CODEC_PLAIN, None)
+        self.outputCodec = codec
+        self.outputData = data
+        self.outputText = text if data is None else None
+        self.title, self.outputPreview = summarize_output(text)
+
+    @hybrid_property
+    def hasOutput(self) -> bool:
+        return self.outputData is not None or bool(self.outputText)
+
+    @hasOutput.expression
+    def hasOutput(cls):
+        # Rows reserved by in-flight generations have neither plain nor compressed output
+        return or_(cls.outputData.isnot(None), cls.outputText != "")
@@ -0,0 +1,106 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import or_, and_
+from models.ai_rec_job import AIRecJob
+from repositories import user_repo, ai_recommendation_repo
+from services.gemini_service import GenerationResult
+from fastapi import HTTPException
+from datetime import datetime, timedelta
+import uuid
+import json
+
+# Get job by id
+def get_job_by_id(db: Session, idJob: str):
+    return db.query(AIRecJob).filter(AIRecJob.idJob == idJob).first()
+
+# Queue a new trip generation job
+def create_job(db: Session, idUser: str, trip_request: dict):
+    if not user_repo.get_user_by(db, "idUser", idUser):
+        raise HTTPException(404, "User not found")
+
+    idJob = ""
+    while not idJob or get_job_by_id(db, idJob):
+        idJob = f"JB{str(uuid.uuid4())[:4]}"
+
+    db_job = AIRecJob(idJob=idJob, idUser=idUser, input=json.dumps(trip_request, ensure_ascii=False), status="pending", attempts=0)
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+
+    return db_job
+
+# Claim the oldest runnable job; SKIP LOCKED lets many workers (on any node) poll the same table
+def claim_next_job(db: Session, lease_seconds: int, max_attempts: int):
+    now = datetime.utcnow()
+
+    while True:
+        db_job = db.query(AIRecJob).filter(or_(
+            AIRecJob.status == "pending",
+            and_(AIRecJob.status == "running", AIRecJob.leaseUntil < now)
+        )).order_by(AIRecJob.createdAt).with_for_update(skip_locked=True).first()
+
+        if not db_job:
+            db.rollback()
+            return None
+
+        # A job whose worker died repeatedly is given up instead of being retried forever
+        if db_job.attempts >= max_attempts:
+            db_job.status = "failed"
+            db_job.error = "Job exceeded the maximum number of attempts"
+            db_job.finishedAt = now
+            db.commit()
+            continue
+
+        db_job.status = "running"
+        db_job.attempts += 1
+        db_job.leaseUntil = now + timedelta(seconds=lease_seconds)
+        db.commit()
+        db.refresh(db_job)
+
+        return db_job
+
+# Finish a job only while this worker still holds its claim: once the lease has expired another
+# worker may have re-claimed it (attempts was bumped) and only the current claim's result is kept
+def _finish_claimed_job(db: Session, idJob: str, attempts: int, values: dict) -> bool:
+    updated = db.query(AIRecJob).filter(
+        AIRecJob.idJob == idJob,
+        AIRecJob.status == "running",
+        AIRecJob.attempts == attempts
+    ).update(values, synchronize_session=False)
+    return updated == 1
+
+# Save the recommendation and mark the job done in one transaction; None when the claim was lost
+def complete_job(db: Session, idJob: str, attempts: int, result: GenerationResult):
+    db_job = get_job_by_id(db, idJob)
+    if not db_job:
+        raise HTTPException(404, "Job not found")
+
+    # The conditional update also locks the job row, so a worker racing on the same job waits here
+    if not _finish_claimed_job(db, idJob, attempts, {"status": "done", "error": None, "finishedAt": datetime.utcnow()}):
+        db.rollback()
+        return None
+
+    db_AIRecommendation = ai_recommendation_repo.build_trip_recommendation(db, db_job.idUser, json.loads(db_job.input), result)
+    db.add(db_AIRecommendation)
+    # Insert the recommendation first so the job's foreign key to it is satisfied
+    db.flush()
+
+    db.query(AIRecJob).filter(AIRecJob.idJob == idJob).update({"idAIRec": db_AIRecommendation.idAIRec}, synchronize_session=False)
+    db.commit()
+    db.refresh(db_job)
+
+    return db_job
+
+# Mark a job as failed; None when the claim was lost
+def fail_job(db: Session, idJob: str, attempts: int, error: str):
+    db_job = get_job_by_id(db, idJob)
+    if not db_job:
+        raise HTTPException(404, "Job not found")
+
+    if not _finish_claimed_job(db, idJob, attempts, {"status": "failed", "error": error, "finishedAt": datetime.utcnow()}):
+        db.rollback()
+        return None
+
+    db.commit()
+    db.refresh(db_job)
+
+    return db_job
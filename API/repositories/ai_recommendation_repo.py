@@ -1,15 +1,25 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer_group
 from models.ai_recommendation import AIRecommendation
-from schemas.ai_recommendation_schema import AIRecCreate
+from schemas.ai_recommendation_schema import AIRecCreate, AIRecSummary, Itinerary, ItineraryDay
 from repositories import user_repo
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 import uuid
-from services.gemini_service import gemini_service
+import re
+from services.gemini_service import gemini_service, GenerationResult, render_itinerary_text, PRIORITY_BACKGROUND
+from services.recommendation_cache import canonical_trip_key
+from services.usage_quota import usage_quota
+from collections import Counter
+from datetime import datetime
+import asyncio
 import logging
 
 # Get all AI recommendations
 def get_aiRec(db: Session, skip: int, limit: int):
-    return db.query(AIRecommendation).order_by(AIRecommendation.idAIRec).offset(skip).limit(limit).all()
+    # Outputs are deferred; load them with the rows instead of one query per row.
+    # Prefetched rows have no owner: they are cache entries, not anyone's history; rows reserved
+    # by in-flight generations have no output yet
+    return db.query(AIRecommendation).options(undefer_group("output")).filter(AIRecommendation.idUser.isnot(None), AIRecommendation.hasOutput).order_by(AIRecommendation.idAIRec).offset(skip).limit(limit).all()
 
 # Get AI recommendation by
 def get_aiRec_by_id(db: Session, idAIRec: str):
@@ -19,7 +29,35 @@ def get_aiRec_by_user(db: Session, idUser: str, skip: int, limit: int):
     if not user_repo.get_user_by(db, "idUser", idUser):
         raise HTTPException(404, "User not found")
     
-    return db.query(AIRecommendation).filter(AIRecommendation.idUser == idUser).order_by(AIRecommendation.idAIRec).offset(skip).limit(limit).all()
+    return db.query(AIRecommendation).options(undefer_group("output")).filter(AIRecommendation.idUser == idUser, AIRecommendation.hasOutput).order_by(AIRecommendation.idAIRec).offset(skip).limit(limit).all()
+
+# Summaries for list views: never reads output, outputData or outputJson
+def get_aiRec_summaries(db: Session, skip: int, limit: int, idUser: str | None = None) -> list[AIRecSummary]:
+    query = db.query(
+        AIRecommendation.idAIRec, AIRecommendation.idUser, AIRecommendation.input, AIRecommendation.title,
+        AIRecommendation.outputPreview, AIRecommendation.source, AIRecommendation.createdAt
+    ).filter(AIRecommendation.hasOutput)
+    if idUser is not None:
+        if not user_repo.get_user_by(db, "idUser", idUser):
+            raise HTTPException(404, "User not found")
+        query = query.filter(AIRecommendation.idUser == idUser)
+    else:
+        query = query.filter(AIRecommendation.idUser.isnot(None))
+    
+    summaries = []
+    for row in query.order_by(AIRecommendation.idAIRec).offset(skip).limit(limit):
+        trip_request = _parse_trip_input(row.input) or {}
+        summaries.append(AIRecSummary(
+            idAIRec=row.idAIRec,
+            idUser=row.idUser,
+            title=row.title,
+            destination=trip_request.get("destination"),
+            days=trip_request.get("days"),
+            preview=row.outputPreview,
+            source=row.source,
+            createdAt=row.createdAt.isoformat() if row.createdAt else None
+        ))
+    return summaries
 
 # Post new AI recommendation
 def create_aiRec(db: Session, aiRecommendation: AIRecCreate):
@@ -49,49 +87,418 @@ def delete_aiRec(db: Session, idAIRec: str):
     return db_AIRecommendation
 
 # Generate trip recommendation
+# The work is split into two short transactions (reserve, then complete) with the model
+# call in between, so no pooled connection stays checked out while Gemini is generating
 def generate_trip_recommendation(db: Session, idUser: str, trip_request: dict):
     """Generate a trip recommendation based on user input"""
-    if not user_repo.get_user_by(db, "idUser", idUser):
-        raise HTTPException(404, "User not found")
+    idAIRec = _reserve_aiRec(db, idUser, _format_trip_input(trip_request))
+    
+    try:
+        # Generate intelligent recommendation
+        result = generate_intelligent_recommendation(trip_request)
+    except BaseException:
+        _discard_aiRec(db, idAIRec)
+        raise
     
-    # Generate unique ID
+    # Save to database
+    return _complete_aiRec(db, idAIRec, result)
+
+# Generate trip recommendation (async endpoint path)
+async def generate_trip_recommendation_async(db: Session, idUser: str, trip_request: dict):
+    """Generate a trip recommendation while awaiting Gemini instead of blocking a worker thread"""
+    idAIRec = await run_in_threadpool(_reserve_aiRec, db, idUser, _format_trip_input(trip_request))
+    
+    try:
+        result = await generate_intelligent_recommendation_async(trip_request)
+    except BaseException:
+        # Also on cancellation (client disconnect), so no empty row is left behind
+        await run_in_threadpool(_discard_aiRec, db, idAIRec)
+        raise
+    
+    return await run_in_threadpool(_complete_aiRec, db, idAIRec, result)
+
+def _new_aiRec_id(db: Session) -> str:
     idAIRec = ""
     while not idAIRec or get_aiRec_by_id(db, idAIRec):
         idAIRec = f"AI{str(uuid.uuid4())[:4]}"
+    return idAIRec
+
+def _new_aiRec_ids(db: Session, count: int) -> list[str]:
+    # One lookup per round instead of one per row
+    ids = set()
+    while len(ids) < count:
+        candidates = {f"AI{str(uuid.uuid4())[:4]}" for _ in range(count - len(ids))} - ids
+        taken = {row.idAIRec for row in db.query(AIRecommendation.idAIRec).filter(AIRecommendation.idAIRec.in_(candidates))}
+        ids |= candidates - taken
+    return list(ids)
+
+def _format_trip_input(trip_request: dict) -> str:
+    return f"Departure: {trip_request['departure']}, Destination: {trip_request['destination']}, People: {trip_request['people']}, Days: {trip_request['days']}, Time: {trip_request['time']}, Budget: {trip_request['money']}, Transportation: {trip_request['transportation']}, Style: {trip_request['travelStyle']}, Interests: {', '.join(trip_request['interests'])}, Accommodation: {trip_request['accommodation']}"
+
+_INPUT_FIELDS = {
+    "Departure": "departure", "Destination": "destination", "People": "people", "Days": "days", "Time": "time",
+    "Budget": "money", "Transportation": "transportation", "Style": "travelStyle", "Interests": "interests", "Accommodation": "accommodation"
+}
+_INPUT_LABEL = re.compile(r"(?:^|, )(" + "|".join(_INPUT_FIELDS) + r"): ")
+
+def _parse_trip_input(input_text: str) -> dict | None:
+    """Inverse of _format_trip_input; None for rows that were not created from a trip request"""
+    parts = _INPUT_LABEL.split(input_text or "")
+    trip_request = {_INPUT_FIELDS[label]: value.strip() for label, value in zip(parts[1::2], parts[2::2])}
+    if set(trip_request) != set(_INPUT_FIELDS.values()) or not trip_request["departure"] or not trip_request["destination"]:
+        return None
+    try:
+        trip_request["people"] = int(trip_request["people"])
+        trip_request["days"] = int(trip_request["days"])
+    except ValueError:
+        return None
+    trip_request["interests"] = [interest.strip() for interest in trip_request["interests"].split(",") if interest.strip()]
+    return trip_request
+
+# Source of rows reserved by in-flight generations; _complete_aiRec replaces it
+RESERVED_SOURCE = "pending"
+
+# Transaction 1: validate the user and reserve an ID with an empty output row
+def _reserve_aiRec(db: Session, idUser: str, input_text: str) -> str:
+    if not user_repo.get_user_by(db, "idUser", idUser):
+        raise HTTPException(404, "User not found")
     
-    # Convert trip request to input string
-    input_text = f"Departure: {trip_request['departure']}, Destination: {trip_request['destination']}, People: {trip_request['people']}, Days: {trip_request['days']}, Time: {trip_request['time']}, Budget: {trip_request['money']}, Transportation: {trip_request['transportation']}, Style: {trip_request['travelStyle']}, Interests: {', '.join(trip_request['interests'])}, Accommodation: {trip_request['accommodation']}"
+    idAIRec = _new_aiRec_id(db)
+    db.add(AIRecommendation(idAIRec=idAIRec, idUser=idUser, input=input_text, output="", source=RESERVED_SOURCE))
+    # Committing ends the transaction and returns the connection to the pool before the model call
+    db.commit()
+    return idAIRec
+
+# Transaction 2: store the generated output on the reserved row
+def _complete_aiRec(db: Session, idAIRec: str, result: GenerationResult):
+    db_AIRecommendation = get_aiRec_by_id(db, idAIRec)
+    if not db_AIRecommendation:
+        raise HTTPException(404, "AI recommendation not found")
     
-    # Generate intelligent recommendation
-    output_text = generate_intelligent_recommendation(trip_request)
+    _apply_output(db_AIRecommendation, result)
+    _apply_usage(db_AIRecommendation, result)
+    db_AIRecommendation.cacheKey = _durable_cache_key(result)
+    db.commit()
+    db.refresh(db_AIRecommendation)
     
-    # Save to database
+    return db_AIRecommendation
+
+# Persist a finished recommendation (e.g. an assembled stream) in a single transaction
+def save_trip_recommendation(db: Session, idUser: str, trip_request: dict, result: GenerationResult):
+    if not user_repo.get_user_by(db, "idUser", idUser):
+        raise HTTPException(404, "User not found")
+    
+    db_AIRecommendation = build_trip_recommendation(db, idUser, trip_request, result)
+    db.add(db_AIRecommendation)
+    db.commit()
+    db.refresh(db_AIRecommendation)
+    
+    return db_AIRecommendation
+
+# Build (but do not add or commit) a recommendation row, so callers can save it inside their own transaction
+def build_trip_recommendation(db: Session, idUser: str, trip_request: dict, result: GenerationResult, idAIRec: str | None = None, record_quota: bool = True) -> AIRecommendation:
     db_AIRecommendation = AIRecommendation(
-        idAIRec=idAIRec,
+        idAIRec=idAIRec or _new_aiRec_id(db),
         idUser=idUser,
-        input=input_text,
-        output=output_text
+        input=_format_trip_input(trip_request),
+        cacheKey=_durable_cache_key(result)
+    )
+    _apply_output(db_AIRecommendation, result)
+    _apply_usage(db_AIRecommendation, result, record_quota)
+    return db_AIRecommendation
+
+# Structured results keep the itinerary in outputJson and a rendered copy in output for text-only clients
+def _apply_output(db_AIRecommendation: AIRecommendation, result: GenerationResult):
+    if result.structured:
+        itinerary = Itinerary.model_validate_json(result.text)
+        db_AIRecommendation.outputJson = itinerary.model_dump()
+        db_AIRecommendation.output = render_itinerary_text(itinerary)
+    else:
+        db_AIRecommendation.output = result.text
+
+# Token/latency accounting of the generation, also charged to the owner's daily quota (before the commit that stores it)
+def _apply_usage(db_AIRecommendation: AIRecommendation, result: GenerationResult, record_quota: bool = True):
+    db_AIRecommendation.source = result.source
+    db_AIRecommendation.promptTokens = result.prompt_tokens
+    db_AIRecommendation.responseTokens = result.response_tokens
+    db_AIRecommendation.latencyMs = result.latency_ms
+    if record_quota:
+        usage_quota.record(db_AIRecommendation.idUser, result.prompt_tokens + result.response_tokens)
+
+# Get the structured itinerary of a recommendation
+def get_itinerary(db: Session, idAIRec: str) -> Itinerary:
+    db_AIRecommendation = get_aiRec_by_id(db, idAIRec)
+    if not db_AIRecommendation:
+        raise HTTPException(404, "AI recommendation not found")
+    
+    if db_AIRecommendation.outputJson is None:
+        raise HTTPException(404, "AI recommendation has no structured itinerary")
+    
+    return Itinerary.model_validate(db_AIRecommendation.outputJson)
+
+# Generate many trips at once: identical trips (same canonical key) are generated once,
+# distinct ones run concurrently under the shared Gemini limits, and all rows are inserted in one transaction
+async def generate_trip_batch_async(db: Session, idUser: str, trip_requests: list[dict]) -> tuple[list, int]:
+    """Returns (items, unique_trips) where items[i] is (AIRecommendation, source, None) or (None, None, error)"""
+    if not await run_in_threadpool(user_repo.get_user_by, db, "idUser", idUser):
+        raise HTTPException(404, "User not found")
+    
+    keys = [canonical_trip_key(trip_request) for trip_request in trip_requests]
+    unique = dict(zip(keys, trip_requests))
+    # Background priority: a partner batch must not starve interactive users of the shared quota
+    outcomes = await asyncio.gather(
+        *(gemini_service.generate_async(trip_request, priority=PRIORITY_BACKGROUND) for trip_request in unique.values()),
+        return_exceptions=True
     )
+    results = dict(zip(unique.keys(), outcomes))
+    for key, outcome in results.items():
+        if isinstance(outcome, BaseException):
+            logging.error(f"Batch trip generation failed: {outcome}")
+    
+    items = await run_in_threadpool(_save_trip_batch, db, idUser, trip_requests, [results[key] for key in keys])
+    return items, len(unique)
+
+def _save_trip_batch(db: Session, idUser: str, trip_requests: list[dict], outcomes: list) -> list:
+    generated = [i for i, outcome in enumerate(outcomes) if not isinstance(outcome, BaseException)]
+    ids = iter(_new_aiRec_ids(db, len(generated)))
+    
+    items = [(None, None, "AI generation failed") for _ in outcomes]
+    rows = []
+    billed = set()
+    for i in generated:
+        # Duplicates share one generation: only the first row carries its tokens and is charged to the quota
+        result = outcomes[i]
+        duplicate = id(result) in billed
+        billed.add(id(result))
+        if duplicate:
+            result = gemini_service.coalesced(result)
+        db_AIRecommendation = build_trip_recommendation(db, idUser, trip_requests[i], result, next(ids), record_quota=not duplicate)
+        rows.append(db_AIRecommendation)
+        items[i] = (db_AIRecommendation, result.source, None)
+    
+    db.add_all(rows)
+    db.commit()
+    
+    return items
+
+# Most requested trips since a date: the top destination/days/style combinations,
+# each represented by its most frequent complete request (so it maps to one cache key)
+def get_popular_trip_requests(db: Session, limit: int, since: datetime) -> list[dict]:
+    combos = Counter()
+    variants: dict[tuple, Counter] = {}
+    requests = {}
+    rows = db.query(AIRecommendation.input).filter(
+        AIRecommendation.idUser.isnot(None),
+        AIRecommendation.createdAt >= since
+    ).yield_per(1000)
+    for row in rows:
+        trip_request = _parse_trip_input(row.input)
+        if not trip_request:
+            continue
+        combo = (trip_request["destination"].lower(), trip_request["days"], trip_request["travelStyle"].lower())
+        key = canonical_trip_key(trip_request)
+        combos[combo] += 1
+        variants.setdefault(combo, Counter())[key] += 1
+        requests.setdefault(key, trip_request)
     
+    return [requests[variants[combo].most_common(1)[0][0]] for combo, _ in combos.most_common(limit)]
+
+# Store a prefetched recommendation without an owner so every process can serve it from the durable cache
+def save_prefetched_recommendation(db: Session, trip_request: dict, result: GenerationResult):
+    db_AIRecommendation = build_trip_recommendation(db, None, trip_request, result)
     db.add(db_AIRecommendation)
     db.commit()
+    
+    return db_AIRecommendation
+
+def _percentile(values: list[int], q: float) -> int | None:
+    # Nearest-rank, like LatencyWindow
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+# Usage per user and per day (UTC) since a date: tokens, p50/p95 latency and cache hit rate
+def get_usage_report(db: Session, since: datetime, idUser: str | None = None) -> list[dict]:
+    query = db.query(
+        AIRecommendation.idUser,
+        AIRecommendation.createdAt,
+        AIRecommendation.source,
+        AIRecommendation.promptTokens,
+        AIRecommendation.responseTokens,
+        AIRecommendation.latencyMs
+    ).filter(AIRecommendation.createdAt >= since, AIRecommendation.idUser.isnot(None))
+    if idUser:
+        query = query.filter(AIRecommendation.idUser == idUser)
+    
+    groups: dict[tuple, dict] = {}
+    for row in query.yield_per(1000):
+        group = groups.setdefault((row.idUser, row.createdAt.date()), {
+            "requests": 0, "promptTokens": 0, "responseTokens": 0, "cacheHits": 0, "latencies": []
+        })
+        group["requests"] += 1
+        group["promptTokens"] += row.promptTokens or 0
+        group["responseTokens"] += row.responseTokens or 0
+        group["cacheHits"] += 1 if row.source == "cache" else 0
+        if row.latencyMs is not None:
+            group["latencies"].append(row.latencyMs)
+    
+    return [
+        {
+            "idUser": idUser,
+            "day": day.isoformat(),
+            "requests": group["requests"],
+            "promptTokens": group["promptTokens"],
+            "responseTokens": group["responseTokens"],
+            "cacheHits": group["cacheHits"],
+            "cacheHitRate": round(group["cacheHits"] / group["requests"], 4),
+            "p50LatencyMs": _percentile(group["latencies"], 0.5),
+            "p95LatencyMs": _percentile(group["latencies"], 0.95)
+        }
+        for (idUser, day), group in sorted(groups.items(), key=lambda item: (item[0][1], item[0][0]), reverse=True)
+    ]
+
+# Only model outputs feed the durable cache tier, never the local fallback
+def _durable_cache_key(result: GenerationResult) -> str | None:
+    return result.cache_key if result.source != "local" else None
+
+def _discard_aiRec(db: Session, idAIRec: str):
+    db_AIRecommendation = get_aiRec_by_id(db, idAIRec)
+    if db_AIRecommendation:
+        db.delete(db_AIRecommendation)
+        db.commit()
+
+# Delete reservations left empty by generations that never finished (e.g. the process died);
+# only rows reserved by a generation, not empty rows created through POST /ai_recs/
+def sweep_abandoned_aiRecs(db: Session, older_than: datetime) -> int:
+    deleted = db.query(AIRecommendation).filter(
+        AIRecommendation.source == RESERVED_SOURCE,
+        ~AIRecommendation.hasOutput,
+        AIRecommendation.createdAt < older_than
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+# Day headings of text outputs: "NGÀY 2: ...", "## 📅 Ngày 2 - ...", "**Ngày 2:**"
+_DAY_HEADING = re.compile(r"^(#*)[ \t]*(?:\*\*)?[^\w\s•+\-*]*[ \t]*ngày[ \t]+(\d+)[ \t]*(?:\*\*)?[ \t]*[:\-—.(]", re.IGNORECASE | re.MULTILINE)
+
+# Sections that follow the days (costs, activities by interest, tips); emoji sub-sections
+# of a day ("🌅 Sáng", "🍽️ Trưa", ...) are not among them
+_TOP_LEVEL_MARKERS = r"(?:\*\*)?[ \t]*(?:💰|🎯|🛡)"
+
+def _day_sections(text: str) -> dict[int, tuple[int, int]]:
+    """Locate each day section of a text output as (start, end) offsets"""
+    headings = list(_DAY_HEADING.finditer(text))
+    sections = {}
+    for index, match in enumerate(headings):
+        if index + 1 < len(headings):
+            end = headings[index + 1].start()
+        else:
+            # The last day runs until the next top-level section: a known marker, or a heading
+            # at the day headings' level when they are markdown headings
+            level = len(match.group(1))
+            marker = rf"{_TOP_LEVEL_MARKERS}|#{{1,{level}}}\s" if level else _TOP_LEVEL_MARKERS
+            after = re.compile(rf"\n[ \t]*\n(?=[ \t]*(?:{marker}))").search(text, match.end())
+            end = after.start() if after else len(text)
+        sections.setdefault(int(match.group(2)), (match.start(), end))
+    return sections
+
+def _replace_day_section(text: str, start: int, end: int, new_section: str) -> str:
+    """Swap a day section for its regenerated text, keeping the whitespace that separated it from what follows"""
+    return text[:start] + new_section + text[start + len(text[start:end].rstrip()):]
+
+# Regenerate one day of a saved recommendation and patch it in place
+async def regenerate_day_async(db: Session, idAIRec: str, idUser: str, day: int, instruction: str):
+    db_AIRecommendation = await run_in_threadpool(get_aiRec_by_id, db, idAIRec)
+    if not db_AIRecommendation or db_AIRecommendation.idUser != idUser:
+        raise HTTPException(404, "AI recommendation not found")
+    
+    usage = {"prompt_tokens": 0, "response_tokens": 0}
+    if db_AIRecommendation.outputJson is not None:
+        itinerary = Itinerary.model_validate(db_AIRecommendation.outputJson)
+        index = next((i for i, itinerary_day in enumerate(itinerary.days) if itinerary_day.day == day), None)
+        if index is None:
+            raise HTTPException(404, "Itinerary day not found")
+        
+        context = "\n".join(
+            f"- Ngày {other.day}: {other.title} ({', '.join(activity.place for activity in other.activities)})"
+            for other in itinerary.days if other.day != day
+        )
+        current = itinerary.days[index].model_dump_json()
+        new_day = ItineraryDay.model_validate_json(await _regenerate_day(db_AIRecommendation.input, context, day, current, instruction, True, usage))
+        
+        days = list(itinerary.days)
+        days[index] = new_day
+        itinerary = itinerary.model_copy(update={
+            "days": days,
+            "estimatedTotalCost": itinerary.estimatedTotalCost
+                - sum(activity.estimatedCost for activity in itinerary.days[index].activities)
+                + sum(activity.estimatedCost for activity in new_day.activities)
+        })
+        outputJson, output = itinerary.model_dump(), render_itinerary_text(itinerary)
+    else:
+        text = db_AIRecommendation.output or ""
+        sections = _day_sections(text)
+        if day not in sections:
+            raise HTTPException(404, "Itinerary day not found")
+        
+        start, end = sections[day]
+        context = "\n".join(f"- {text[s:e].strip().splitlines()[0]}" for other, (s, e) in sorted(sections.items()) if other != day)
+        new_section = await _regenerate_day(db_AIRecommendation.input, context, day, text[start:end].strip(), instruction, False, usage)
+        outputJson, output = None, _replace_day_section(text, start, end, new_section)
+    
+    return await run_in_threadpool(_save_regenerated_day, db, idAIRec, output, outputJson, usage)
+
+async def _regenerate_day(trip_input: str, context: str, day: int, current: str, instruction: str, structured: bool, usage: dict) -> str:
+    try:
+        return await gemini_service.regenerate_day_async(trip_input, context, day, current, instruction, structured, usage)
+    except Exception as e:
+        logging.error(f"Error regenerating itinerary day {day}: {e}")
+        raise HTTPException(503, "AI service is unavailable, please try again later")
+
+def _save_regenerated_day(db: Session, idAIRec: str, output: str, outputJson: dict | None, usage: dict):
+    db_AIRecommendation = get_aiRec_by_id(db, idAIRec)
+    if not db_AIRecommendation:
+        raise HTTPException(404, "AI recommendation not found")
+    
+    db_AIRecommendation.output = output
+    db_AIRecommendation.outputJson = outputJson
+    # Edits add to the row's token totals
+    db_AIRecommendation.promptTokens = (db_AIRecommendation.promptTokens or 0) + usage["prompt_tokens"]
+    db_AIRecommendation.responseTokens = (db_AIRecommendation.responseTokens or 0) + usage["response_tokens"]
+    usage_quota.record(db_AIRecommendation.idUser, usage["prompt_tokens"] + usage["response_tokens"])
+    # An edited itinerary no longer answers the original request, so it leaves the durable cache
+    db_AIRecommendation.cacheKey = None
+    db.commit()
     db.refresh(db_AIRecommendation)
     
     return db_AIRecommendation
 
-def generate_intelligent_recommendation(trip_request: dict) -> str:
+def generate_intelligent_recommendation(trip_request: dict) -> GenerationResult:
     """Generate intelligent trip recommendation using Gemini AI"""
     
     try:
         # Use Gemini service to generate recommendation
-        recommendation = gemini_service.generate_travel_recommendation(trip_request)
-        logging.info("Successfully generated recommendation using Gemini AI")
-        return recommendation
+        result = gemini_service.generate(trip_request)
+        logging.info(f"Successfully generated recommendation (source: {result.source})")
+        return result
     
     except Exception as e:
         logging.error(f"Error in generate_intelligent_recommendation: {e}")
         # Fallback to simple recommendation if Gemini fails
-        return _generate_simple_fallback_recommendation(trip_request)
+        return GenerationResult(_generate_simple_fallback_recommendation(trip_request), "local", "")
+
+async def generate_intelligent_recommendation_async(trip_request: dict) -> GenerationResult:
+    """Generate intelligent trip recommendation using Gemini's async API"""
+    
+    try:
+        result = await gemini_service.generate_async(trip_request)
+        logging.info(f"Successfully generated recommendation (source: {result.source})")
+        return result
+    
+    except Exception as e:
+        logging.error(f"Error in generate_intelligent_recommendation_async: {e}")
+        return GenerationResult(_generate_simple_fallback_recommendation(trip_request), "local", "")
 
 def _generate_simple_fallback_recommendation(trip_request: dict) -> str:
     """Simple fallback recommendation if Gemini fails"""
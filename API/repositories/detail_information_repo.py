@@ -3,6 +3,10 @@ from models.detail_information import DetailInformation
 from schemas.detail_information_schema import DetailCreate, DetailUpdate
 import uuid
 from repositories import place_repo, trip_repo
+from models.place import Place
+from schemas.ai_recommendation_schema import Itinerary, ItineraryActivity
+from sqlalchemy import func
+import re
 from fastapi import HTTPException
 from datetime import datetime, timedelta
 
@@ -88,3 +92,59 @@ def delete_detail_information(db: Session, id: str):
     db.delete(db_detail)
     db.commit()
     return db_detail
+
+def _activity_times(day_start: datetime, time: str) -> tuple[datetime, datetime]:
+    # Itinerary slots look like "08:00-11:00"; anything else becomes a 2-hour slot from 08:00
+    match = re.match(r"\s*(\d{1,2})[:h](\d{2})\s*(?:-\s*(\d{1,2})[:h](\d{2}))?", time or "")
+    if not match:
+        start = day_start + timedelta(hours=8)
+        return start, start + timedelta(hours=2)
+    
+    start = day_start + timedelta(hours=int(match.group(1)) % 24, minutes=int(match.group(2)))
+    if match.group(3):
+        end = day_start + timedelta(hours=int(match.group(3)) % 24, minutes=int(match.group(4)))
+        if end <= start:
+            end += timedelta(days=1)
+    else:
+        end = start + timedelta(hours=2)
+    return start, end
+
+# Bulk-convert an itinerary into detail information rows of a trip (one place lookup, one commit)
+def create_details_from_itinerary(db: Session, idTrip: str, itinerary: Itinerary) -> tuple[list[DetailInformation], list[ItineraryActivity]]:
+    trip = trip_repo.get_trip_by_id(db, idTrip)
+    if not trip:
+        raise HTTPException(404, "Trip not found")
+    
+    names = {activity.place.strip().lower() for day in itinerary.days for activity in day.activities}
+    places = {}
+    for place in db.query(Place).filter(func.lower(Place.name).in_(names)).all():
+        places.setdefault(place.name.strip().lower(), place)
+    
+    trip_start = datetime.combine(trip.startDate.date(), datetime.min.time())
+    created, skipped, used_ids = [], [], set()
+    for day in itinerary.days:
+        day_start = trip_start + timedelta(days=max(day.day, 1) - 1)
+        for activity in day.activities:
+            place = places.get(activity.place.strip().lower())
+            if not place:
+                skipped.append(activity)
+                continue
+            
+            idDetail = ""
+            while not idDetail or idDetail in used_ids or get_detail_information_by_id(db, idDetail):
+                idDetail = f"DI{str(uuid.uuid4())[:4]}"
+            used_ids.add(idDetail)
+            
+            startTime, endTime = _activity_times(day_start, activity.time)
+            created.append(DetailInformation(
+                idDetail = idDetail,
+                idPlace = place.idPlace,
+                idTrip = idTrip,
+                startTime = startTime,
+                endTime = endTime,
+                note = f"{activity.description} (~{activity.estimatedCost:,} VND)"[:1000]
+            ))
+    
+    db.add_all(created)
+    db.commit()
+    return created, skipped
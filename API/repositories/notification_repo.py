@@ -1,4 +1,6 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from models.notification import Notification
 from schemas.notification_schema import NotificationUpdate, NotificationCreate
 from repositories import user_repo
@@ -26,6 +28,28 @@ def get_unread_notifications(db: Session, user_id: str, skip: int, limit: int):
         Notification.idUser == user_id,
         Notification.isRead == False).order_by(Notification.idNotf).offset(skip).limit(limit).all()
     
+# Async variants of the read paths, for endpoints on the async engine
+async def get_notifications_async(db: AsyncSession, skip: int, limit: int):
+    return (await db.execute(select(Notification).order_by(Notification.idNotf).offset(skip).limit(limit))).scalars().all()
+
+async def get_notification_by_id_async(db: AsyncSession, idNotf: str):
+    return (await db.execute(select(Notification).where(Notification.idNotf == idNotf).limit(1))).scalars().first()
+
+async def get_notification_by_user_async(db: AsyncSession, idUser: str, skip: int, limit: int):
+    if await user_repo.get_user_by_async(db, "idUser", idUser) is None:
+        raise HTTPException(404, "User not found")
+    return (await db.execute(
+        select(Notification).where(Notification.idUser == idUser).order_by(Notification.idNotf).offset(skip).limit(limit)
+    )).scalars().all()
+
+async def get_unread_notifications_async(db: AsyncSession, user_id: str, skip: int, limit: int):
+    if await user_repo.get_user_by_async(db, "idUser", user_id) is None:
+        raise HTTPException(404, "User not found")
+    return (await db.execute(select(Notification).where(
+        Notification.idUser == user_id,
+        Notification.isRead == False).order_by(Notification.idNotf).offset(skip).limit(limit)
+    )).scalars().all()
+    
 # Post a new notification
 def create_notification(db: Session, notification: NotificationCreate):
     user = user_repo.get_user_by(db, "idUser", notification.idUser)
@@ -1,4 +1,6 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select as sa_select
 from models.place import Place
 from schemas.place_schema import PlaceCreate, PlaceUpdate
 from fastapi import HTTPException
@@ -27,6 +29,25 @@ def get_place_by(db: Session, select: str, lookup: str):
     else:
         raise HTTPException(400, "Bad Request")
 
+_PLACE_LOOKUP_COLUMNS = {"name": Place.name, "country": Place.country, "city": Place.city, "province": Place.province, "type": Place.type, "rating": Place.rating}
+
+# Async variants of the read paths, for endpoints on the async engine
+async def get_places_async(db: AsyncSession, skip: int, limit: int):
+    return (await db.execute(sa_select(Place).order_by(Place.idPlace).offset(skip).limit(limit))).scalars().all()
+
+async def get_place_by_id_async(db: AsyncSession, id: str):
+    return (await db.execute(sa_select(Place).where(Place.idPlace == id).limit(1))).scalars().first()
+
+async def get_place_by_async(db: AsyncSession, select: str, lookup: str):
+    column = _PLACE_LOOKUP_COLUMNS.get(select)
+    if column is None:
+        raise HTTPException(400, "Bad Request")
+    value = int(lookup) if select in ("type", "rating") else lookup
+    return (await db.execute(sa_select(Place).where(column == value))).scalars().all()
+
+async def search_places_async(db: AsyncSession, query: str, place_type: int = None, min_rating: int = None):
+    return (await db.execute(sa_select(Place).where(*_search_filters(query, place_type, min_rating)))).scalars().all()
+
 def get_bookings_of_place(db: Session, idPlace: str):
     place = get_place_by_id(db, idPlace)
     if not place:
@@ -41,7 +62,7 @@ def get_trips_contain_place(db: Session, idPlace: str):
     
     return place.trip_belong
 
-def search_places(db: Session, query: str, place_type: int = None, min_rating: int = None):
+def _search_filters(query: str, place_type: int = None, min_rating: int = None) -> list:
     from sqlalchemy import or_
 
     filters = [or_(
@@ -58,7 +79,19 @@ def search_places(db: Session, query: str, place_type: int = None, min_rating: i
     if min_rating is not None:
         filters.append(Place.rating >= min_rating)
     
-    return db.query(Place).filter(*filters).all()
+    return filters
+
+def search_places(db: Session, query: str, place_type: int = None, min_rating: int = None):
+    return db.query(Place).filter(*_search_filters(query, place_type, min_rating)).all()
+
+# Places of a destination for prompt grounding: equality on the indexed city/province columns, best rated first
+def get_places_in_destination(db: Session, names: list[str], limit: int):
+    from sqlalchemy import or_
+
+    return db.query(Place).filter(or_(
+        Place.city.in_(names),
+        Place.province.in_(names)
+    )).order_by(Place.rating.desc()).limit(limit).all()
 
 # Post place
 def post_place(db: Session, place: PlaceCreate):
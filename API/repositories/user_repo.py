@@ -1,8 +1,11 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.user import User
 from schemas.user_schema import UserCreate, UserUpdate
 from fastapi import HTTPException
 from sqlalchemy import or_
+# Aliased: get_user_by's "select" parameter shadows the name
+from sqlalchemy import select as sa_select
 import uuid
 
 # Get all users
@@ -21,6 +24,16 @@ def get_user_by(db: Session, select: str, lookup: str):
         return db.query(User).filter(User.phoneNumber == lookup).first()
     else:
         raise HTTPException(status_code=400, detail="Bad Request")
+
+_USER_LOOKUP_COLUMNS = {"idUser": User.idUser, "username": User.username, "email": User.email, "phone": User.phoneNumber}
+
+# Async variant of get_user_by for endpoints on the async engine
+async def get_user_by_async(db: AsyncSession, select: str, lookup: str):
+    column = _USER_LOOKUP_COLUMNS.get(select)
+    if column is None:
+        raise HTTPException(status_code=400, detail="Bad Request")
+    
+    return (await db.execute(sa_select(User).where(column == lookup).limit(1))).scalars().first()
     
 # Get trips of user
 def get_trips_of_user(db: Session, idUser: str):
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import Literal
 
 class AIRecommendationBase(BaseModel):
     input: str
@@ -11,12 +12,56 @@ class AIRecResponse(AIRecommendationBase):
     class Config:
         from_attributes = True
 
+# List view: what a history page shows without the full output
+class AIRecSummary(BaseModel):
+    idAIRec: str
+    idUser: str
+    title: str | None = None
+    destination: str | None = None
+    days: int | None = None
+    preview: str | None = None
+    source: str | None = None
+    createdAt: str | None = None
+
 class AIRecCreate(AIRecommendationBase):
     pass
 
 class AIRecUpdate(AIRecommendationBase):
     pass
 
+# Structured itinerary (outputFormat="json"); also sent to Gemini as response_schema, so fields have no defaults
+class ItineraryActivity(BaseModel):
+    time: str
+    place: str
+    description: str
+    estimatedCost: int
+
+class ItineraryDay(BaseModel):
+    day: int
+    title: str
+    activities: list[ItineraryActivity]
+
+class Itinerary(BaseModel):
+    title: str
+    destination: str
+    days: list[ItineraryDay]
+    estimatedTotalCost: int
+    tips: list[str]
+
+# Chunked generation of long trips: a short skeleton first, then blocks of days in parallel
+class TripSkeletonDay(BaseModel):
+    day: int
+    title: str
+    focus: str
+
+class TripSkeleton(BaseModel):
+    title: str
+    days: list[TripSkeletonDay]
+    tips: list[str]
+
+class ItineraryDays(BaseModel):
+    days: list[ItineraryDay]
+
 # Schema cho API generate trip
 class TripGenerateRequest(BaseModel):
     departure: str
@@ -29,10 +74,39 @@ class TripGenerateRequest(BaseModel):
     travelStyle: str
     interests: list[str]
     accommodation: str
+    outputFormat: Literal["text", "json"] = "text"
 
 class TripGenerateResponse(BaseModel):
     idAIRec: str
     recommendation: str
+    itinerary: Itinerary | None = None
+    
+    class Config:
+        from_attributes = True
+
+# Batch generation: one result per submitted trip, in request order
+class TripBatchItemResult(BaseModel):
+    index: int
+    idAIRec: str | None = None
+    recommendation: str | None = None
+    itinerary: Itinerary | None = None
+    source: str | None = None
+    error: str | None = None
+
+class TripBatchResponse(BaseModel):
+    total: int
+    succeeded: int
+    unique_trips: int
+    results: list[TripBatchItemResult]
+
+# Job mode: generation runs in the background worker pool
+class AIRecJobResponse(BaseModel):
+    idJob: str
+    status: str
+    idAIRec: str | None = None
+    recommendation: str | None = None
+    itinerary: Itinerary | None = None
+    error: str | None = None
     
     class Config:
         from_attributes = True
@@ -54,3 +128,30 @@ class AIServiceHealthResponse(BaseModel):
     ai_service: str
     model: str
     message: str
+
+# Regenerate one day of a saved recommendation
+class DayRegenerateRequest(BaseModel):
+    instruction: str
+
+# Token/latency accounting per user and per day
+class AIUsageDay(BaseModel):
+    idUser: str
+    day: str
+    requests: int
+    promptTokens: int
+    responseTokens: int
+    cacheHits: int
+    cacheHitRate: float
+    p50LatencyMs: int | None = None
+    p95LatencyMs: int | None = None
+
+class AIUsageReport(BaseModel):
+    since: str
+    usage: list[AIUsageDay]
+    quota: dict
+
+# Converting itinerary activities into DetailInformation rows of a trip
+class ItineraryToDetailsResponse(BaseModel):
+    idTrip: str
+    created: list[str]
+    skipped: list[ItineraryActivity]
@@ -0,0 +1,92 @@
+"""
+Background worker pool for AI trip generation jobs (AIRecJobs table).
+Runs inside the API process (AI_JOB_WORKERS > 0) or standalone on dedicated nodes:
+    python -m services.ai_job_worker
+"""
+from fastapi.concurrency import run_in_threadpool
+from database import sessionLocal
+from repositories import ai_rec_job_repo
+from services.gemini_service import gemini_service, PRIORITY_BACKGROUND
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+AI_JOB_WORKERS = int(os.getenv("AI_JOB_WORKERS", "2"))
+AI_JOB_POLL_SECONDS = float(os.getenv("AI_JOB_POLL_SECONDS", "1"))
+AI_JOB_LEASE_SECONDS = int(os.getenv("AI_JOB_LEASE_SECONDS", "300"))
+AI_JOB_MAX_ATTEMPTS = int(os.getenv("AI_JOB_MAX_ATTEMPTS", "3"))
+
+def _with_session(fn, *args):
+    # Each step uses its own short session so no connection is held while Gemini generates
+    db = sessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+class AIJobWorkerPool:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        for index in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._run(index)))
+        if self._tasks:
+            logger.info(f"Started {len(self._tasks)} AI job workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run(self, index: int):
+        while True:
+            try:
+                job = await run_in_threadpool(_with_session, ai_rec_job_repo.claim_next_job, AI_JOB_LEASE_SECONDS, AI_JOB_MAX_ATTEMPTS)
+                if job is None:
+                    await asyncio.sleep(AI_JOB_POLL_SECONDS)
+                    continue
+
+                await self._process(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"AI job worker {index} error: {e}")
+                await asyncio.sleep(AI_JOB_POLL_SECONDS)
+
+    async def _process(self, job):
+        logger.info(f"Processing AI job {job.idJob} (attempt {job.attempts})")
+        try:
+            result = await gemini_service.generate_async(json.loads(job.input), priority=PRIORITY_BACKGROUND)
+        except Exception as e:
+            logger.error(f"AI job {job.idJob} failed: {e}")
+            if await run_in_threadpool(_with_session, ai_rec_job_repo.fail_job, job.idJob, job.attempts, str(e)) is None:
+                logger.warning(f"AI job {job.idJob} was re-claimed after its lease expired; attempt {job.attempts} is discarded")
+            return
+
+        if await run_in_threadpool(_with_session, ai_rec_job_repo.complete_job, job.idJob, job.attempts, result) is None:
+            logger.warning(f"AI job {job.idJob} was re-claimed after its lease expired; attempt {job.attempts} is discarded")
+            return
+        logger.info(f"AI job {job.idJob} done (source: {result.source})")
+
+# Create singleton instance
+ai_job_workers = AIJobWorkerPool(AI_JOB_WORKERS)
+
+async def _run_standalone():
+    # Register every model so relationship() targets resolve outside the API process
+    import main  # noqa: F401
+
+    pool = AIJobWorkerPool(max(AI_JOB_WORKERS, 1))
+    pool.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await pool.stop()
+
+if __name__ == "__main__":
+    asyncio.run(_run_standalone())
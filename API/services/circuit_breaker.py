@@ -0,0 +1,141 @@
+"""
+Circuit breaker for outbound model calls (closed -> open -> half-open -> closed)
+"""
+from collections import deque
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        error_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 20.0,
+        slow_call_rate_threshold: float = 0.8,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 2
+    ):
+        self.name = name
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=window_size)  # (failed, slow) per call
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        self._rejected = 0
+
+    def allow_request(self) -> bool:
+        """Return False while open, so the caller can fall back without waiting on the upstream"""
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self._rejected += 1
+                    return False
+                self._transition(HALF_OPEN)
+
+            if self._state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    self._rejected += 1
+                    return False
+                self._half_open_in_flight += 1
+
+            return True
+
+    def record_success(self, latency: float):
+        slow = latency >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight = max(self._half_open_in_flight - 1, 0)
+                if slow:
+                    self._transition(OPEN)
+                    return
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._transition(CLOSED)
+                return
+
+            self._window.append((False, slow))
+            self._evaluate()
+
+    def record_failure(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight = max(self._half_open_in_flight - 1, 0)
+                self._transition(OPEN)
+                return
+
+            self._window.append((True, False))
+            self._evaluate()
+
+    def release(self):
+        """Give back a half-open trial slot for a call that was abandoned (e.g. cancelled) before completing"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight = max(self._half_open_in_flight - 1, 0)
+
+    def _evaluate(self):
+        if self._state != CLOSED or len(self._window) < self.min_calls:
+            return
+
+        calls = len(self._window)
+        error_rate = sum(1 for failed, _ in self._window if failed) / calls
+        slow_rate = sum(1 for _, slow in self._window if slow) / calls
+        if error_rate >= self.error_rate_threshold or slow_rate >= self.slow_call_rate_threshold:
+            self._transition(OPEN)
+
+    def _transition(self, state: str):
+        if state == self._state:
+            return
+
+        logger.warning(f"Circuit breaker '{self.name}': {self._state} -> {state}")
+        self._state = state
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._window.clear()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            # An expired open period is reported as half-open even before the next call arrives
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def snapshot(self) -> dict:
+        state = self.state
+        with self._lock:
+            calls = len(self._window)
+            return {
+                "state": state,
+                "calls_in_window": calls,
+                "error_rate": round(sum(1 for failed, _ in self._window if failed) / calls, 4) if calls else 0.0,
+                "slow_call_rate": round(sum(1 for _, slow in self._window if slow) / calls, 4) if calls else 0.0,
+                "rejected": self._rejected,
+                "open_for_seconds": round(max(self.open_seconds - (time.monotonic() - self._opened_at), 0), 1) if state == OPEN else 0,
+                "thresholds": {
+                    "error_rate": self.error_rate_threshold,
+                    "slow_call_seconds": self.slow_call_seconds,
+                    "slow_call_rate": self.slow_call_rate_threshold,
+                    "min_calls": self.min_calls,
+                    "open_seconds": self.open_seconds
+                }
+            }
@@ -0,0 +1,403 @@
+"""
+Pluggable model backends for GeminiService:
+    google  - the real Gemini API (default)
+    standin - offline stand-in that replays recorded fixtures, with configurable latency,
+              error injection and streaming, for load tests that must not burn quota
+    record  - the real API, saving every response as a fixture for the stand-in
+"""
+from google.api_core import exceptions as google_exceptions
+from types import SimpleNamespace
+import google.generativeai as genai
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "google")
+GEMINI_FIXTURES_DIR = os.getenv("GEMINI_FIXTURES_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "gemini"))
+# Phân phối độ trễ của stand-in: "fixed:1.5", "uniform:0.5,3", "normal:2,0.5", "lognormal:1.5,0.6" (median, sigma) hoặc "recorded"
+GEMINI_STANDIN_LATENCY = os.getenv("GEMINI_STANDIN_LATENCY", "lognormal:1.5,0.5")
+GEMINI_STANDIN_ERROR_RATE = float(os.getenv("GEMINI_STANDIN_ERROR_RATE", "0"))
+# Loại lỗi được tiêm, chọn ngẫu nhiên: unavailable, resource_exhausted, internal, deadline
+GEMINI_STANDIN_ERROR_KINDS = [kind.strip() for kind in os.getenv("GEMINI_STANDIN_ERROR_KINDS", "unavailable,resource_exhausted").split(",") if kind.strip()]
+# Share of the latency spent before the first stream chunk; the rest is spread over the chunks
+GEMINI_STANDIN_FIRST_CHUNK_RATIO = float(os.getenv("GEMINI_STANDIN_FIRST_CHUNK_RATIO", "0.3"))
+GEMINI_STANDIN_CHUNK_CHARS = int(os.getenv("GEMINI_STANDIN_CHUNK_CHARS", "200"))
+
+_ERRORS = {
+    "unavailable": google_exceptions.ServiceUnavailable,
+    "resource_exhausted": google_exceptions.ResourceExhausted,
+    "internal": google_exceptions.InternalServerError,
+    "deadline": google_exceptions.DeadlineExceeded,
+}
+
+# Returned when no fixture of the requested kind exists, sized like a real text answer
+_SYNTHETIC_DAY = """
+NGÀY {day}: Khám phá (stand-in)
+• 07:00-11:00 — Tham quan điểm chính, ăn sáng đặc sản (~150,000 VND)
+• 11:00-14:00 — Ăn trưa và nghỉ ngơi (~150,000 VND)
+• 14:00-18:00 — Tham quan điểm thứ hai, mua sắm (~200,000 VND)
+• 18:00-22:00 — Chợ đêm và ẩm thực đường phố (~200,000 VND)
+"""
+
+def _kind(generation_config: dict | None) -> str:
+    schema = (generation_config or {}).get("response_schema")
+    return getattr(schema, "__name__", None) or "text"
+
+def fixture_key(model_name: str, prompt: str, generation_config: dict | None) -> str:
+    payload = json.dumps([model_name, _kind(generation_config), prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _usage(prompt_tokens: int, response_tokens: int, cached_tokens: int = 0):
+    return SimpleNamespace(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=response_tokens,
+        cached_content_token_count=cached_tokens,
+        total_token_count=prompt_tokens + response_tokens
+    )
+
+def _usage_dict(response) -> dict | None:
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return None
+    return {
+        "prompt_token_count": getattr(usage, "prompt_token_count", 0) or 0,
+        "candidates_token_count": getattr(usage, "candidates_token_count", 0) or 0,
+        "cached_content_token_count": getattr(usage, "cached_content_token_count", 0) or 0,
+    }
+
+class FixtureStore:
+    """Recorded responses, one JSON file per (model, kind, prompt)"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._by_key: dict[str, dict] | None = None
+        self._by_kind: dict[str, list[dict]] = {}
+        self._next_by_kind: dict[str, int] = {}
+
+    def _load(self):
+        # Caller holds the lock
+        if self._by_key is not None:
+            return
+        self._by_key = {}
+        if os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                if name.endswith(".json"):
+                    with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                        self._index(json.load(f))
+        logger.info(f"Loaded {len(self._by_key)} Gemini fixtures from {self.directory}")
+
+    def _index(self, fixture: dict):
+        self._by_key[fixture["key"]] = fixture
+        self._by_kind.setdefault(fixture["kind"], []).append(fixture)
+
+    def find(self, key: str, kind: str) -> tuple[dict | None, bool]:
+        """Exact recording for the prompt, else the next recording of the same kind (round-robin); (fixture, exact)"""
+        with self._lock:
+            self._load()
+            if key in self._by_key:
+                return self._by_key[key], True
+            candidates = self._by_kind.get(kind)
+            if not candidates:
+                return None, False
+            index = self._next_by_kind.get(kind, 0)
+            self._next_by_kind[kind] = index + 1
+            return candidates[index % len(candidates)], False
+
+    def save(self, fixture: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{fixture['kind']}-{fixture['key'][:16]}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2)
+        with self._lock:
+            if self._by_key is not None:
+                self._index(fixture)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._by_key)
+
+class LatencyDistribution:
+    """Seconds per call from a spec like "lognormal:1.5,0.5"; "recorded" replays the fixture's own latency"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        name, _, args = spec.partition(":")
+        self.name = name.strip()
+        self.args = [float(arg) for arg in args.split(",") if arg.strip()]
+        if self.name not in ("fixed", "uniform", "normal", "lognormal", "recorded"):
+            raise ValueError(f"Unknown stand-in latency distribution: {spec}")
+
+    def sample(self, recorded_ms: int | None = None) -> float:
+        if self.name == "recorded":
+            return (recorded_ms or 1000) / 1000
+        if self.name == "fixed":
+            return self.args[0]
+        if self.name == "uniform":
+            return random.uniform(self.args[0], self.args[1])
+        if self.name == "normal":
+            return max(random.gauss(self.args[0], self.args[1]), 0)
+        return random.lognormvariate(0, self.args[1]) * self.args[0]
+
+class StandInResponse:
+    def __init__(self, text: str, usage):
+        self.text = text
+        self.usage_metadata = usage
+
+class StandInStream:
+    """Async stream of chunks; usage_metadata is set once the stream has been consumed, like the real API"""
+
+    def __init__(self, chunks: list[str], usage, first_delay: float, chunk_delay: float):
+        self._chunks = chunks
+        self._usage = usage
+        self._first_delay = first_delay
+        self._chunk_delay = chunk_delay
+        self.usage_metadata = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for index, chunk in enumerate(self._chunks):
+            await asyncio.sleep(self._first_delay if index == 0 else self._chunk_delay)
+            yield SimpleNamespace(text=chunk)
+        self.usage_metadata = self._usage
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+class StandInModel:
+    """Answers like genai.GenerativeModel from recorded fixtures, without network access"""
+
+    def __init__(self, backend: "StandInBackend", model_name: str):
+        self.backend = backend
+        self.model_name = model_name
+
+    def _plan(self, prompt, generation_config: dict | None, request_options: dict | None):
+        # Decide the whole call up front: (text, chunks, usage, latency, error, timeout)
+        prompt = prompt if isinstance(prompt, str) else json.dumps(prompt, ensure_ascii=False, default=str)
+        kind = _kind(generation_config)
+        fixture, exact = self.backend.store.find(fixture_key(self.model_name, prompt, generation_config), kind)
+        self.backend._count("replayed_exact" if exact else "replayed_similar" if fixture else "synthetic")
+
+        if fixture:
+            text, chunks, recorded_ms = fixture["text"], fixture.get("chunks"), fixture.get("latency_ms")
+            recorded = fixture.get("usage") or {}
+            # A fixture recorded for another prompt only lends its answer; bill the prompt actually sent
+            usage = _usage(
+                recorded.get("prompt_token_count", len(prompt) // 3) if exact else len(prompt) // 3,
+                recorded.get("candidates_token_count", len(text) // 3),
+                recorded.get("cached_content_token_count", 0) if exact else 0
+            )
+        else:
+            text, chunks, recorded_ms = self.backend.synthetic(kind, prompt), None, None
+            usage = _usage(len(prompt) // 3, len(text) // 3)
+
+        latency = self.backend.latency.sample(recorded_ms)
+        error = None
+        if self.backend.error_rate and random.random() < self.backend.error_rate:
+            error = random.choice(self.backend.error_kinds)
+            self.backend._count(f"injected_{error}")
+        timeout = (request_options or {}).get("timeout")
+        chunks = chunks or [text[i:i + GEMINI_STANDIN_CHUNK_CHARS] for i in range(0, len(text), GEMINI_STANDIN_CHUNK_CHARS)] or [""]
+        return text, chunks, usage, latency, error, timeout
+
+    def _outcome(self, latency: float, error: str | None, timeout: float | None) -> tuple[float, Exception | None]:
+        """How long the call takes and what it raises: the client's own timeout wins over a slower answer"""
+        if timeout is not None and (latency > timeout or error == "deadline"):
+            self.backend._count("timed_out")
+            return timeout, google_exceptions.DeadlineExceeded(f"Stand-in {self.model_name} exceeded the {timeout}s timeout")
+        if error:
+            # Injected failures come back quickly, like a real 429/503
+            return min(latency, 0.05), _ERRORS[error](f"Stand-in {self.model_name}: injected {error}")
+        return latency, None
+
+    def generate_content(self, prompt, generation_config: dict | None = None, request_options: dict | None = None, stream: bool = False, **kwargs):
+        text, chunks, usage, latency, error, timeout = self._plan(prompt, generation_config, request_options)
+        delay, exception = self._outcome(latency, error, timeout)
+        time.sleep(delay)
+        if exception:
+            raise exception
+        return StandInResponse(text, usage)
+
+    async def generate_content_async(self, prompt, generation_config: dict | None = None, request_options: dict | None = None, stream: bool = False, **kwargs):
+        text, chunks, usage, latency, error, timeout = self._plan(prompt, generation_config, request_options)
+        if stream:
+            # Request options do not bound a stream; errors surface before the first chunk
+            if error:
+                await asyncio.sleep(0.05)
+                raise _ERRORS[error](f"Stand-in {self.model_name}: injected {error}")
+            first = latency * GEMINI_STANDIN_FIRST_CHUNK_RATIO
+            rest = (latency - first) / max(len(chunks) - 1, 1)
+            return StandInStream(chunks, usage, first, rest)
+
+        delay, exception = self._outcome(latency, error, timeout)
+        await asyncio.sleep(delay)
+        if exception:
+            raise exception
+        return StandInResponse(text, usage)
+
+    def count_tokens(self, contents):
+        return SimpleNamespace(total_tokens=len(str(contents)) // 3)
+
+class RecordingModel:
+    """Wraps a real model and saves each successful response as a fixture"""
+
+    def __init__(self, model, store: FixtureStore, model_name: str):
+        self._model = model
+        self._store = store
+        self.model_name = model_name
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def _save(self, prompt, generation_config: dict | None, text: str, chunks: list[str] | None, response, started: float):
+        try:
+            self._store.save({
+                "key": fixture_key(self.model_name, prompt, generation_config),
+                "model": self.model_name,
+                "kind": _kind(generation_config),
+                "prompt": prompt,
+                "text": text,
+                "chunks": chunks,
+                "usage": _usage_dict(response),
+                "latency_ms": int((time.monotonic() - started) * 1000),
+            })
+        except Exception as e:
+            logger.warning(f"Could not save Gemini fixture: {e}")
+
+    def generate_content(self, prompt, generation_config: dict | None = None, **kwargs):
+        started = time.monotonic()
+        response = self._model.generate_content(prompt, generation_config=generation_config, **kwargs)
+        if not kwargs.get("stream"):
+            self._save(prompt, generation_config, response.text, None, response, started)
+        return response
+
+    async def generate_content_async(self, prompt, generation_config: dict | None = None, stream: bool = False, **kwargs):
+        started = time.monotonic()
+        response = await self._model.generate_content_async(prompt, generation_config=generation_config, stream=stream, **kwargs)
+        if not stream:
+            self._save(prompt, generation_config, response.text, None, response, started)
+            return response
+        return _RecordingStream(response, lambda chunks: self._save(prompt, generation_config, "".join(chunks), chunks, response, started))
+
+class _RecordingStream:
+    def __init__(self, response, on_done):
+        self._response = response
+        self._on_done = on_done
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        chunks = []
+        async for chunk in self._response:
+            chunks.append(chunk.text)
+            yield chunk
+        self._on_done(chunks)
+
+class GoogleBackend:
+    name = "google"
+    supports_context_cache = True
+
+    def __init__(self):
+        self.api_key = os.getenv("GEMINI_API_KEY")
+        if self.api_key:
+            genai.configure(api_key=self.api_key)
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key)
+
+    def model(self, model_name: str, system_instruction: str | None = None, record: bool = True):
+        return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+    def model_from_cached_content(self, cached_content):
+        return genai.GenerativeModel.from_cached_content(cached_content)
+
+    def stats(self) -> dict:
+        return {"name": self.name}
+
+class RecordingBackend(GoogleBackend):
+    name = "record"
+    # Cached-content models answer differently from a plain one; record what the stand-in will replay
+    supports_context_cache = False
+
+    def __init__(self, store: FixtureStore):
+        super().__init__()
+        self.store = store
+
+    def model(self, model_name: str, system_instruction: str | None = None, record: bool = True):
+        # record=False for calls that must not end up as replayable answers (e.g. health probes)
+        model = super().model(model_name, system_instruction)
+        return RecordingModel(model, self.store, model_name) if record else model
+
+    def stats(self) -> dict:
+        return {"name": self.name, "fixtures_dir": self.store.directory}
+
+class StandInBackend:
+    name = "standin"
+    supports_context_cache = False
+    available = True
+
+    def __init__(self, store: FixtureStore, latency: str = GEMINI_STANDIN_LATENCY, error_rate: float = GEMINI_STANDIN_ERROR_RATE, error_kinds: list[str] | None = None):
+        self.store = store
+        self.latency = LatencyDistribution(latency)
+        self.error_rate = error_rate
+        self.error_kinds = error_kinds or GEMINI_STANDIN_ERROR_KINDS
+        unknown = set(self.error_kinds) - set(_ERRORS)
+        if unknown:
+            raise ValueError(f"Unknown stand-in error kinds: {sorted(unknown)}")
+        self._lock = threading.Lock()
+        self._stats: dict[str, int] = {}
+
+    def model(self, model_name: str, system_instruction: str | None = None, record: bool = True):
+        return StandInModel(self, model_name)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] = self._stats.get(key, 0) + 1
+
+    @staticmethod
+    def synthetic(kind: str, prompt: str) -> str:
+        if kind == "text":
+            return "🌟 GỢI Ý CHUYẾN ĐI (stand-in)\n\n📅 LỊCH TRÌNH CHI TIẾT:\n" + "".join(_SYNTHETIC_DAY.format(day=day) for day in range(1, 4))
+        # No recording of a structured kind: fail like a malformed answer so the caller's validation path runs
+        return "{}"
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._stats)
+        return {
+            "name": self.name,
+            "fixtures": len(self.store),
+            "fixtures_dir": self.store.directory,
+            "latency": self.latency.spec,
+            "error_rate": self.error_rate,
+            "error_kinds": self.error_kinds,
+            **counters
+        }
+
+def create_backend(name: str = GEMINI_BACKEND):
+    if name == "standin":
+        return StandInBackend(FixtureStore(GEMINI_FIXTURES_DIR))
+    if name == "record":
+        return RecordingBackend(FixtureStore(GEMINI_FIXTURES_DIR))
+    if name != "google":
+        logger.warning(f"Unknown GEMINI_BACKEND '{name}', using the Gemini API")
+    return GoogleBackend()
+
+# Create singleton instance
+gemini_backend = create_backend()
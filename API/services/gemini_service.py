@@ -1,10 +1,31 @@
 """
 Gemini AI Service for generating intelligent travel recommendations
 """
-import google.generativeai as genai
+from google.generativeai import caching
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
 import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import timedelta
 from dotenv import load_dotenv
 from fastapi import HTTPException
+from google.api_core import exceptions as google_exceptions
+from fastapi.concurrency import run_in_threadpool
+from services.recommendation_cache import recommendation_cache, canonical_trip_key
+from services.single_flight import SingleFlight
+from services.gemini_backend import gemini_backend
+from services.circuit_breaker import CircuitBreaker
+from services.latency_window import LatencyWindow
+from services.place_retrieval import place_retriever, places_context
+from services.local_fallback import render_local_recommendation, cache_stats as local_fallback_cache_stats
+from services.model_router import model_router, Route, TIER_LOCAL, TIER_LIGHT, TIER_STANDARD, TIER_HEAVY
+from schemas.ai_recommendation_schema import Itinerary, ItineraryDay, ItineraryDays, TripSkeleton
+from pydantic import ValidationError
 import logging
 
 # Load environment variables
@@ -14,314 +35,1044 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Configure Gemini API
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-if not gemini_api_key:
+# Configure Gemini API (the real API, the offline stand-in or recording, see services/gemini_backend.py)
+if not gemini_backend.available:
     logger.warning("GEMINI_API_KEY not found in environment variables. Using fallback mode.")
-else:
-    genai.configure(api_key=gemini_api_key)
+
+# Giới hạn số lời gọi Gemini async chạy đồng thời trên mỗi worker
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+
+# Deadline cho mỗi lần generate (thấp hơn timeout 30s của proxy frontend)
+GEMINI_DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", "25"))
+# Hedging: gửi thêm 1 request khi request đầu chậm hơn percentile latency cấu hình
+GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() == "true"
+GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "0.95"))
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+
+# Quota outbound dùng chung cho worker (0 = tắt giới hạn)
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+GEMINI_EXPECTED_OUTPUT_TOKENS = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "2000"))
+GEMINI_QUEUE_MAX_WAIT_SECONDS = float(os.getenv("GEMINI_QUEUE_MAX_WAIT_SECONDS", "5"))
+
+# Chuyến đi dài: tạo khung trước rồi sinh song song từng khối ngày (0 = tắt)
+GEMINI_CHUNKED_MIN_DAYS = int(os.getenv("GEMINI_CHUNKED_MIN_DAYS", "6"))
+GEMINI_CHUNK_DAYS = max(int(os.getenv("GEMINI_CHUNK_DAYS", "2")), 1)
+
+# Structured mode: Gemini must answer with JSON matching the Itinerary schema
+ITINERARY_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": Itinerary}
+SKELETON_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": TripSkeleton}
+DAYS_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": ItineraryDays}
+DAY_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": ItineraryDay}
+
+# Model dùng chung; context caching cần tên model có phiên bản cố định
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+# Model cho chuyến đi đơn giản / phức tạp (để trống = không dùng tier đó, mặc định cả hai đều tắt)
+GEMINI_MODEL_LIGHT = os.getenv("GEMINI_MODEL_LIGHT", "")
+GEMINI_MODEL_HEAVY = os.getenv("GEMINI_MODEL_HEAVY", "")
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+GEMINI_CONTEXT_CACHE_MODEL = os.getenv("GEMINI_CONTEXT_CACHE_MODEL", "models/gemini-1.5-flash-001")
+GEMINI_CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+
+# Static instructions, sent once as the model's system instruction instead of inside every prompt
+TRAVEL_SYSTEM_INSTRUCTION = """
+Bạn là một chuyên gia tư vấn du lịch thông minh với kinh nghiệm sâu rộng về du lịch Việt Nam và quốc tế.
+Mỗi yêu cầu gồm THÔNG TIN CHUYẾN ĐI và nhiệm vụ cụ thể. Nếu nhiệm vụ yêu cầu JSON theo schema, chỉ trả về JSON đúng schema đó.
+Nếu có mục ĐỊA ĐIỂM CÓ SẴN, xây dựng lịch trình chủ yếu từ các địa điểm đó (giữ nguyên tên), chỉ bổ sung địa điểm khác khi thật cần thiết.
+
+Khi tạo gợi ý du lịch dạng văn bản:
+📋 YÊU CẦU PHẢN HỒI:
+1. Tạo lộ trình chi tiết theo từng ngày với timeline cụ thể, mỗi ngày bắt đầu bằng dòng "NGÀY <số>: <tiêu đề>"
+2. Gợi ý địa điểm tham quan phù hợp với sở thích
+3. Đề xuất nhà hàng/quán ăn địa phương ngon
+4. Thông tin về accommodation phù hợp ngân sách
+5. Chi phí ước tính cho từng hạng mục
+6. Tips tiết kiệm và lưu ý quan trọng
+7. Các hoạt động giải trí buổi tối
+8. Thông tin thực tế về giao thông, thời tiết
+
+💡 PHONG CÁCH PHẢN HỒI:
+- Sử dụng emoji để làm bắt mắt
+- Chia thành các section rõ ràng
+- Đưa ra lý do tại sao chọn địa điểm đó
+- Bao gồm thông tin giá cả cụ thể (VND)
+- Mention các món ăn đặc sản phải thử
+- Đưa ra alternative options
+"""
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_PREFETCH = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background", PRIORITY_PREFETCH: "prefetch"}
+
+@dataclass
+class GenerationResult:
+    text: str
+    source: str  # "gemini", "cache", "coalesced" or "local"
+    cache_key: str
+    structured: bool = False  # text is a JSON itinerary (outputFormat "json")
+    prompt_tokens: int = 0  # billed by the model calls made for this result (0 for cache/coalesced)
+    response_tokens: int = 0
+    latency_ms: int | None = None  # end-to-end, including cache lookups and fallbacks
+
+# Token usage of the model calls made for the current generation; child tasks (chunks, hedges) share the dict
+_usage_scope: contextvars.ContextVar[dict | None] = contextvars.ContextVar("gemini_usage_scope", default=None)
+
+# Model picked by the router for the current generation attempt
+_model_scope: contextvars.ContextVar[object | None] = contextvars.ContextVar("gemini_model_scope", default=None)
+
+# Monotonic deadline of the current generation: every model call made for it (fallback tiers, skeleton, day blocks)
+# waits only for what is left
+_deadline_scope: contextvars.ContextVar[float | None] = contextvars.ContextVar("gemini_deadline_scope", default=None)
+
+def _deadline() -> float:
+    """Deadline of the current generation, or a fresh one for a standalone call"""
+    return _deadline_scope.get() or time.monotonic() + GEMINI_DEADLINE_SECONDS
+
+def _new_usage() -> dict:
+    return {"prompt_tokens": 0, "response_tokens": 0}
+
+class RateLimitExceeded(Exception):
+    """Raised when a call could not get outbound quota within its maximum queue wait"""
+
+class OutboundRateLimiter:
+    """Requests/minute and tokens/minute token buckets with a priority queue of waiting callers"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._waiters = []  # heap of [priority, seq, tokens, future]
+        self._seq = itertools.count()
+        self._pump_task = None
+        self.wait_times = LatencyWindow()
+        self._stats = {"granted": 0, "timed_out": 0, "throttled_by_upstream": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0 and self.tpm > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def _take(self, tokens: int) -> bool:
+        # Caller holds the lock; an oversized request is capped so it can still pass eventually
+        self._refill()
+        tokens = min(tokens, self.tpm)
+        if self._requests >= 1 and self._tokens >= tokens:
+            self._requests -= 1
+            self._tokens -= tokens
+            self._stats["granted"] += 1
+            return True
+        return False
+
+    def _seconds_until(self, tokens: int) -> float:
+        missing_requests = max(1 - self._requests, 0) * 60 / self.rpm
+        missing_tokens = max(min(tokens, self.tpm) - self._tokens, 0) * 60 / self.tpm
+        return max(missing_requests, missing_tokens)
+
+    def try_acquire(self, tokens: int) -> bool:
+        """Take quota only if it is free right now and nobody is queued ahead"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            return not self._waiters and self._take(tokens)
+
+    def acquire_blocking(self, tokens: int, max_wait: float) -> bool:
+        """Sync callers poll for quota; they never overtake queued async callers"""
+        if not self.enabled:
+            return True
+        started = time.monotonic()
+        while not self.try_acquire(tokens):
+            if time.monotonic() - started >= max_wait:
+                self._stats["timed_out"] += 1
+                return False
+            time.sleep(0.05)
+        self.wait_times.add(time.monotonic() - started)
+        return True
+
+    async def acquire(self, tokens: int, priority: int, max_wait: float) -> bool:
+        """Wait up to max_wait for quota, served in priority order; False if it timed out"""
+        if not self.enabled:
+            return True
+
+        started = time.monotonic()
+        with self._lock:
+            if not self._waiters and self._take(tokens):
+                self.wait_times.add(0.0)
+                return True
+            future = asyncio.get_running_loop().create_future()
+            entry = [priority, next(self._seq), tokens, future]
+            heapq.heappush(self._waiters, entry)
+
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.get_running_loop().create_task(self._pump())
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=max(max_wait, 0))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                granted = future.done() and not future.cancelled()
+                if not granted:
+                    future.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            if not granted:
+                self._stats["timed_out"] += 1
+                return False
+
+        self.wait_times.add(time.monotonic() - started)
+        return True
+
+    async def _pump(self):
+        # Hands out quota to the head of the queue as the buckets refill
+        while True:
+            with self._lock:
+                while self._waiters and self._waiters[0][3].done():
+                    heapq.heappop(self._waiters)
+                if not self._waiters:
+                    return
+                _, _, tokens, future = self._waiters[0]
+                if self._take(tokens):
+                    heapq.heappop(self._waiters)
+                    future.set_result(True)
+                    continue
+                delay = self._seconds_until(tokens)
+            await asyncio.sleep(max(delay, 0.01))
+
+    def settle(self, estimated: int, actual: int | None):
+        """Correct the token bucket once the real usage of a call is known"""
+        if not self.enabled or actual is None:
+            return
+        with self._lock:
+            self._tokens = min(self.tpm, self._tokens + estimated - actual)
+
+    def throttled(self):
+        """Upstream answered 429: stop handing out requests until the bucket refills"""
+        with self._lock:
+            self._requests = min(self._requests, 0)
+            self._stats["throttled_by_upstream"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refill()
+            depth = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _, _, future in self._waiters:
+                if not future.done():
+                    depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            snapshot = {
+                **self._stats,
+                "enabled": self.enabled,
+                "queue_depth": sum(depth.values()),
+                "queue_depth_by_priority": depth,
+                "available_requests": round(self._requests, 2),
+                "available_tokens": int(self._tokens),
+                "rpm": self.rpm,
+                "tpm": self.tpm
+            }
+        snapshot["wait_time"] = self.wait_times.snapshot()
+        return snapshot
+
+# Shared outbound quota for every Gemini call made by this worker
+gemini_limiter = OutboundRateLimiter(GEMINI_RPM, GEMINI_TPM)
+
+# In-flight Gemini generations keyed by canonical trip key
+trip_flights = SingleFlight()
+
+# Trips to local generation as soon as Gemini is failing or too slow
+gemini_breaker = CircuitBreaker(
+    "gemini",
+    error_rate_threshold=float(os.getenv("GEMINI_BREAKER_ERROR_RATE", "0.5")),
+    slow_call_seconds=float(os.getenv("GEMINI_BREAKER_SLOW_CALL_SECONDS", "20")),
+    slow_call_rate_threshold=float(os.getenv("GEMINI_BREAKER_SLOW_CALL_RATE", "0.8")),
+    window_size=int(os.getenv("GEMINI_BREAKER_WINDOW", "20")),
+    min_calls=int(os.getenv("GEMINI_BREAKER_MIN_CALLS", "5")),
+    open_seconds=float(os.getenv("GEMINI_BREAKER_OPEN_SECONDS", "30")),
+    half_open_max_calls=int(os.getenv("GEMINI_BREAKER_HALF_OPEN_CALLS", "2"))
+)
 
 class GeminiService:
     def __init__(self):
         self.model = None
+        self.tier_models: dict[str, object] = {}  # light/heavy router tiers; the standard tier is self.model
+        self._async_limit = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        self.latency = LatencyWindow()
+        self._stats = {"deadline_exceeded": 0, "hedges_sent": 0, "hedge_wins": 0, "chunked_generations": 0}
+        self._usage = {"measured_calls": 0, "input_tokens": 0, "cached_input_tokens": 0}
+        self._context_cache = None
+        self._context_cache_refresh_at = 0.0
+        self._context_cache_lock = threading.Lock()
         try:
-            if gemini_api_key:
-                self.model = genai.GenerativeModel('gemini-1.5-flash')
-                logger.info("Gemini AI model initialized successfully")
+            if gemini_backend.available:
+                # One long-lived model object holds the static instructions for every call
+                self.model = self._create_model()
+                for tier, name in ((TIER_LIGHT, GEMINI_MODEL_LIGHT), (TIER_HEAVY, GEMINI_MODEL_HEAVY)):
+                    if name:
+                        self.tier_models[tier] = gemini_backend.model(name, TRAVEL_SYSTEM_INSTRUCTION)
+                logger.info(f"Gemini AI model initialized successfully (backend: {gemini_backend.name}, extra tiers: {sorted(self.tier_models)})")
             else:
                 logger.warning("Gemini API key not found, falling back to local generation")
         except Exception as e:
             logger.error(f"Failed to initialize Gemini model: {e}")
             self.model = None
 
+    def _create_model(self):
+        if GEMINI_CONTEXT_CACHE and gemini_backend.supports_context_cache:
+            try:
+                self._context_cache = caching.CachedContent.create(
+                    model=GEMINI_CONTEXT_CACHE_MODEL,
+                    display_name="travel-system-instruction",
+                    system_instruction=TRAVEL_SYSTEM_INSTRUCTION,
+                    ttl=timedelta(seconds=GEMINI_CONTEXT_CACHE_TTL_SECONDS)
+                )
+                self._context_cache_refresh_at = time.monotonic() + GEMINI_CONTEXT_CACHE_TTL_SECONDS / 2
+                logger.info(f"Gemini context cache created: {self._context_cache.name}")
+                return gemini_backend.model_from_cached_content(self._context_cache)
+            except Exception as e:
+                # e.g. the instruction is below the API's minimum cacheable size
+                logger.warning(f"Gemini context caching unavailable, using a plain system instruction: {e}")
+                self._context_cache = None
+        return gemini_backend.model(GEMINI_MODEL, TRAVEL_SYSTEM_INSTRUCTION)
+
+    def _touch_context_cache(self):
+        """Extend the context cache TTL in the background before it expires"""
+        if self._context_cache is None or time.monotonic() < self._context_cache_refresh_at:
+            return
+        with self._context_cache_lock:
+            if time.monotonic() < self._context_cache_refresh_at:
+                return
+            self._context_cache_refresh_at = time.monotonic() + GEMINI_CONTEXT_CACHE_TTL_SECONDS / 2
+        
+        def _refresh():
+            try:
+                self._context_cache.update(ttl=timedelta(seconds=GEMINI_CONTEXT_CACHE_TTL_SECONDS))
+            except Exception as e:
+                logger.warning(f"Could not extend Gemini context cache, dropping it: {e}")
+                self._context_cache = None
+                self.model = gemini_backend.model(GEMINI_MODEL, TRAVEL_SYSTEM_INSTRUCTION)
+        
+        threading.Thread(target=_refresh, daemon=True).start()
+
     def generate_travel_recommendation(self, trip_request: dict) -> str:
         """Generate travel recommendation using Gemini AI"""
+        return self.generate(trip_request).text
+
+    async def generate_travel_recommendation_async(self, trip_request: dict) -> str:
+        """Generate travel recommendation using Gemini's async API without blocking the event loop"""
+        return (await self.generate_async(trip_request)).text
+
+    def generate(self, trip_request: dict) -> GenerationResult:
+        """Generate a recommendation, serving repeated trips from the recommendation cache"""
+        started = time.monotonic()
+        return self._timed(self._generate(trip_request), started)
+
+    async def generate_async(self, trip_request: dict, priority: int = PRIORITY_INTERACTIVE) -> GenerationResult:
+        """Async variant of generate(); the durable cache lookup runs in the threadpool.
+        
+        priority orders the call in the outbound quota queue (interactive before background/prefetch).
+        """
+        started = time.monotonic()
+        return self._timed(await self._generate_async(trip_request, priority), started)
+
+    def _generate(self, trip_request: dict) -> GenerationResult:
+        cache_key = canonical_trip_key(trip_request)
+        cached = recommendation_cache.get(cache_key)
+        if cached is not None:
+            return self._result(trip_request, cached, "cache", cache_key)
         
         if not self.model:
             # Fallback to local generation if Gemini is not available
-            return self._generate_local_recommendation(trip_request)
+            return self._local_result(trip_request, cache_key)
         
+        route = model_router.route(trip_request, self._available_tiers())
+        if route.tier == TIER_LOCAL:
+            return self._local_result(trip_request, cache_key)
+        
+        # Concurrent identical trips share a single Gemini call
+        result, shared = trip_flights.do(cache_key, lambda: self._generate_with_gemini(trip_request, cache_key, route))
+        return self.coalesced(result) if shared else result
+
+    async def _generate_async(self, trip_request: dict, priority: int) -> GenerationResult:
+        cache_key = canonical_trip_key(trip_request)
+        cached = recommendation_cache.get_memory(cache_key)
+        if cached is None:
+            cached = await run_in_threadpool(recommendation_cache.get_durable, cache_key)
+        if cached is not None:
+            return self._result(trip_request, cached, "cache", cache_key)
+        
+        if not self.model:
+            return self._local_result(trip_request, cache_key)
+        
+        route = model_router.route(trip_request, self._available_tiers())
+        if route.tier == TIER_LOCAL:
+            return self._local_result(trip_request, cache_key)
+        
+        result, shared = await trip_flights.do_async(cache_key, lambda: self._generate_with_gemini_async(trip_request, cache_key, route, priority))
+        return self.coalesced(result) if shared else result
+
+    def _generate_with_gemini(self, trip_request: dict, cache_key: str, route: Route) -> GenerationResult:
+        # A flight that just finished may have filled the cache after our first lookup
+        cached = recommendation_cache.get_memory(cache_key)
+        if cached is not None:
+            return self._result(trip_request, cached, "cache", cache_key)
+        
+        # While the breaker is open, answer locally right away instead of waiting on a degraded API
+        if not gemini_breaker.allow_request():
+            return self._local_result(trip_request, cache_key)
+        
+        usage = _new_usage()
+        scope = _usage_scope.set(usage)
+        # One deadline for the whole fallback chain, not one per tier
+        deadline_scope = _deadline_scope.set(time.monotonic() + GEMINI_DEADLINE_SECONDS)
         try:
             # Create detailed prompt for Gemini
-            prompt = self._create_travel_prompt(trip_request)
+            prompt, generation_config = self._prompt_for(trip_request, place_retriever.retrieve(trip_request))
             
-            # Generate content using Gemini
-            response = self.model.generate_content(prompt)
-            
-            if response.text:
-                return response.text
-            else:
-                logger.warning("Gemini returned empty response, falling back to local generation")
-                return self._generate_local_recommendation(trip_request)
+            # Walk the route's fallback chain; the breaker admission above covers the first tier
+            for tier in self._gemini_tiers(route):
+                model_scope = _model_scope.set(self._model_for(tier))
+                try:
+                    # Generate content using Gemini
+                    text = self._checked_output(trip_request, self._call_model(prompt, generation_config))
+                except RateLimitExceeded:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Gemini model tier '{tier}' failed: {e}")
+                    model_router.record_error(tier)
+                    continue
+                finally:
+                    _model_scope.reset(model_scope)
+                
+                if text:
+                    recommendation_cache.put(cache_key, text)
+                    return self._result(trip_request, text, "gemini", cache_key, usage)
+                logger.warning(f"Gemini model tier '{tier}' returned empty or invalid response")
                 
+        except RateLimitExceeded as e:
+            logger.warning(f"{e}, falling back to local generation")
         except Exception as e:
             logger.error(f"Error generating recommendation with Gemini: {e}")
-            # Fallback to local generation
-            return self._generate_local_recommendation(trip_request)
+        finally:
+            _deadline_scope.reset(deadline_scope)
+            _usage_scope.reset(scope)
+        
+        # Fallback to local generation (tokens of a failed or invalid answer were still billed)
+        return self._local_result(trip_request, cache_key, usage)
 
-    def _create_travel_prompt(self, trip_request: dict) -> str:
-        """Create a detailed prompt for Gemini AI"""
+    async def _generate_with_gemini_async(self, trip_request: dict, cache_key: str, route: Route, priority: int = PRIORITY_INTERACTIVE) -> GenerationResult:
+        cached = recommendation_cache.get_memory(cache_key)
+        if cached is not None:
+            return self._result(trip_request, cached, "cache", cache_key)
         
-        departure = trip_request.get('departure', '')
-        destination = trip_request.get('destination', '')
-        people = trip_request.get('people', 1)
-        days = trip_request.get('days', 1)
-        budget = trip_request.get('money', '')
-        travel_style = trip_request.get('travelStyle', '')
-        interests = trip_request.get('interests', [])
-        accommodation = trip_request.get('accommodation', '')
-        transportation = trip_request.get('transportation', '')
-        time = trip_request.get('time', '')
-
-        prompt = f"""
-Bạn là một chuyên gia tư vấn du lịch thông minh với kinh nghiệm sâu rộng về du lịch Việt Nam và quốc tế. 
-Hãy tạo một gợi ý du lịch chi tiết, thực tế và hấp dẫn dựa trên thông tin sau:
-
-🌍 THÔNG TIN CHUYẾN ĐI:
-- Điểm khởi hành: {departure}
-- Điểm đến: {destination}
-- Số người: {people} người
-- Thời gian: {days} ngày ({time})
-- Ngân sách: {budget}
-- Phong cách du lịch: {travel_style}
-- Sở thích: {', '.join(interests) if interests else 'Chưa có'}
-- Loại accommodation: {accommodation}
-- Phương tiện di chuyển: {transportation}
+        if not gemini_breaker.allow_request():
+            return self._local_result(trip_request, cache_key)
+        
+        usage = _new_usage()
+        scope = _usage_scope.set(usage)
+        # One deadline for the whole fallback chain (and the chunks of each attempt), not one per call
+        deadline_scope = _deadline_scope.set(time.monotonic() + GEMINI_DEADLINE_SECONDS)
+        try:
+            # Retrieval may query the DB, so it runs in the threadpool; prompt builders only get the result
+            places = await run_in_threadpool(place_retriever.retrieve, trip_request)
+            
+            for tier in self._gemini_tiers(route):
+                # Child tasks (chunks, hedges) copy this context, so they use the same model
+                model_scope = _model_scope.set(self._model_for(tier))
+                try:
+                    if self._use_chunked(trip_request):
+                        text = self._checked_output(trip_request, await self._generate_chunked_async(trip_request, places, priority))
+                    else:
+                        prompt, generation_config = self._prompt_for(trip_request, places)
+                        text = self._checked_output(trip_request, await self._call_model_async(prompt, priority, generation_config))
+                except RateLimitExceeded:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Gemini model tier '{tier}' failed: {e}")
+                    model_router.record_error(tier)
+                    continue
+                finally:
+                    _model_scope.reset(model_scope)
+                
+                if text:
+                    recommendation_cache.put(cache_key, text)
+                    return self._result(trip_request, text, "gemini", cache_key, usage)
+                logger.warning(f"Gemini model tier '{tier}' returned empty or invalid response")
+                
+        except RateLimitExceeded as e:
+            logger.warning(f"{e}, falling back to local generation")
+        except Exception as e:
+            logger.error(f"Error generating recommendation with Gemini (async): {e}")
+        finally:
+            _deadline_scope.reset(deadline_scope)
+            _usage_scope.reset(scope)
+        
+        return self._local_result(trip_request, cache_key, usage)
 
-📋 YÊU CẦU PHẢN HỒI:
-1. Tạo lộ trình chi tiết theo từng ngày với timeline cụ thể
-2. Gợi ý địa điểm tham quan phù hợp với sở thích
-3. Đề xuất nhà hàng/quán ăn địa phương ngon
-4. Thông tin về accommodation phù hợp ngân sách
-5. Chi phí ước tính cho từng hạng mục
-6. Tips tiết kiệm và lưu ý quan trọng
-7. Các hoạt động giải trí buổi tối
-8. Thông tin thực tế về giao thông, thời tiết
+    def _available_tiers(self) -> set[str]:
+        return {TIER_STANDARD, *self.tier_models}
 
-💡 PHONG CÁCH PHẢN HỒI:
-- Sử dụng emoji để làm bắt mắt
-- Chia thành các section rõ ràng
-- Đưa ra lý do tại sao chọn địa điểm đó
-- Bao gồm thông tin giá cả cụ thể (VND)
-- Mention các món ăn đặc sản phải thử
-- Đưa ra alternative options
+    def _model_for(self, tier: str):
+        return self.model if tier == TIER_STANDARD else self.tier_models[tier]
 
-Hãy tạo một gợi ý toàn diện, thực tế và hữu ích cho chuyến đi này.
-"""
-        return prompt
+    def _gemini_tiers(self, route: Route):
+        """Yield the Gemini tiers of a route's chain, re-admitting every fallback through the breaker"""
+        for index, tier in enumerate(route.chain):
+            if tier == TIER_LOCAL:
+                return
+            if index > 0:
+                # Fallback tiers share the request's deadline; once it is used up, answer locally
+                if time.monotonic() >= _deadline():
+                    return
+                model_router.record_fallback(route.chain[index - 1], tier)
+                # The quota is shared by all models, so only the breaker decides whether to go on
+                if not gemini_breaker.allow_request():
+                    return
+            yield tier
 
-    def _generate_local_recommendation(self, trip_request: dict) -> str:
-        """Fallback function for local recommendation generation"""
+    def _call_model(self, prompt: str, generation_config: dict | None = None) -> str:
+        # Callers must have been admitted by gemini_breaker.allow_request()
+        deadline = _deadline()
+        if time.monotonic() >= deadline:
+            gemini_breaker.release()
+            self._stats["deadline_exceeded"] += 1
+            raise TimeoutError(f"Gemini deadline of {GEMINI_DEADLINE_SECONDS}s already used up")
         
-        departure = trip_request.get('departure', '')
-        destination = trip_request.get('destination', '')
-        people = trip_request.get('people', 1)
-        days = trip_request.get('days', 1)
-        budget = trip_request.get('money', '')
-        travel_style = trip_request.get('travelStyle', '')
-        interests = trip_request.get('interests', [])
-        accommodation = trip_request.get('accommodation', '')
-        transportation = trip_request.get('transportation', '')
+        estimated = self._estimate_tokens(prompt)
+        if not gemini_limiter.acquire_blocking(estimated, min(GEMINI_QUEUE_MAX_WAIT_SECONDS, deadline - time.monotonic())):
+            gemini_breaker.release()
+            raise RateLimitExceeded("No Gemini quota available within the queue wait")
+        
+        started = time.monotonic()
+        try:
+            self._touch_context_cache()
+            # The sync path cannot hedge, so the SDK timeout is its only bound: what is left of the deadline
+            response = (_model_scope.get() or self.model).generate_content(
+                prompt,
+                generation_config=generation_config,
+                request_options={"timeout": max(deadline - time.monotonic(), 0.1)}
+            )
+            text = response.text
+        except Exception as e:
+            self._record_upstream_error(e)
+            raise
+        latency = time.monotonic() - started
+        gemini_breaker.record_success(latency)
+        gemini_limiter.settle(estimated, self._total_tokens(response))
+        self._record_usage(response)
+        self.latency.add(latency)
+        return text
 
-        recommendation = f"""🌟 GỢI Ý CHUYẾN ĐI TỪ {departure.upper()} ĐẾN {destination.upper()}
+    async def _call_model_async(self, prompt: str, priority: int = PRIORITY_INTERACTIVE, generation_config: dict | None = None, report_breaker: bool = True) -> str:
+        """One model call under the caller's breaker admission; report_breaker=False leaves the outcome to a caller that made several calls under one admission"""
+        deadline = _deadline()
+        started = time.monotonic()
+        if started >= deadline:
+            # Earlier calls of this generation used the whole budget; not the upstream's fault
+            if report_breaker:
+                gemini_breaker.release()
+            self._stats["deadline_exceeded"] += 1
+            raise TimeoutError(f"Gemini deadline of {GEMINI_DEADLINE_SECONDS}s already used up")
+        try:
+            # Queue briefly for quota; time spent here counts against the deadline
+            max_wait = min(GEMINI_QUEUE_MAX_WAIT_SECONDS if priority == PRIORITY_INTERACTIVE else GEMINI_DEADLINE_SECONDS, deadline - started)
+            if not await gemini_limiter.acquire(self._estimate_tokens(prompt), priority, max_wait):
+                raise RateLimitExceeded(f"No Gemini quota available within {max_wait}s ({PRIORITY_NAMES.get(priority)})")
+            text = await self._hedged_call(prompt, deadline, generation_config)
+        except (asyncio.CancelledError, RateLimitExceeded):
+            if report_breaker:
+                gemini_breaker.release()
+            raise
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                self._stats["deadline_exceeded"] += 1
+            self._record_upstream_error(e, report_breaker)
+            raise
+        if report_breaker:
+            gemini_breaker.record_success(time.monotonic() - started)
+        return text
 
-📍 THÔNG TIN CHUYẾN ĐI:
-• Số người: {people} người
-• Thời gian: {days} ngày
-• Ngân sách: {budget}
-• Phong cách: {travel_style}
-• Sở thích: {', '.join(interests) if interests else 'Khám phá tổng quát'}
+    async def regenerate_day_async(self, trip_input: str, context: str, day: int, current: str, instruction: str, structured: bool, usage: dict | None = None) -> str:
+        """Regenerate one day of a saved itinerary, with the other days as compact context.
+        
+        Returns the day as ItineraryDay JSON when structured, else as a text section; token usage is added to usage.
+        Raises RuntimeError when Gemini cannot be used: an edit has no sensible local fallback.
+        """
+        if not self.model:
+            raise RuntimeError("Gemini is not available")
+        if not gemini_breaker.allow_request():
+            raise RuntimeError("Gemini circuit breaker is open")
+        
+        prompt = self._create_day_edit_prompt(trip_input, context, day, current, instruction, structured)
+        scope = _usage_scope.set(usage)
+        try:
+            text = await self._call_model_async(prompt, PRIORITY_INTERACTIVE, DAY_GENERATION_CONFIG if structured else None)
+        finally:
+            _usage_scope.reset(scope)
+        if not text or not text.strip():
+            raise RuntimeError("Gemini returned an empty day")
+        if structured:
+            return ItineraryDay.model_validate_json(text).model_copy(update={"day": day}).model_dump_json()
+        return text.strip()
 
-🏨 GỢI Ý LƯU TRÚ:
-"""
+    @staticmethod
+    def _use_chunked(trip_request: dict) -> bool:
+        return GEMINI_CHUNKED_MIN_DAYS > 0 and int(trip_request.get("days") or 1) >= GEMINI_CHUNKED_MIN_DAYS
 
-        # Accommodation recommendations based on style and budget
-        if travel_style == "luxury" or "cao cấp" in budget.lower():
-            recommendation += """• Resort 5 sao hoặc khách sạn boutique cao cấp
-• Dịch vụ spa và tiện nghi đầy đủ
-• Vị trí trung tâm hoặc view đẹp
-• Giá: 2-5 triệu VND/đêm
-"""
-        elif travel_style == "comfort" or "thoải mái" in travel_style:
-            recommendation += """• Khách sạn 3-4 sao với đầy đủ tiện nghi
-• Gần trung tâm và điểm tham quan
-• Có hồ bơi và gym
-• Giá: 800k-2 triệu VND/đêm
-"""
-        else:
-            recommendation += """• Homestay hoặc khách sạn 2-3 sao
-• Gần phương tiện công cộng
-• Sạch sẽ và an toàn
-• Giá: 300k-800k VND/đêm
-"""
+    async def _generate_chunked_async(self, trip_request: dict, places: list[dict], priority: int = PRIORITY_INTERACTIVE) -> str:
+        """Generate a long trip as a skeleton plus concurrent blocks of days, stitched back in order.
+        
+        Latency becomes skeleton + slowest block instead of one call producing the whole itinerary.
+        The caller's breaker admission covers the whole trip: the skeleton and the blocks report
+        one success or failure, so a half-open breaker spends one probe slot per trip.
+        Skeleton and blocks share one deadline, so the whole trip stays within GEMINI_DEADLINE_SECONDS.
+        """
+        self._stats["chunked_generations"] += 1
+        started = time.monotonic()
+        # Block tasks copy this context, so they see the same deadline
+        deadline_scope = _deadline_scope.set(_deadline())
+        try:
+            skeleton = TripSkeleton.model_validate_json(
+                await self._call_model_async(self._create_skeleton_prompt(trip_request, places), priority, SKELETON_GENERATION_CONFIG, report_breaker=False)
+            )
+            
+            days = int(trip_request.get("days") or 1)
+            blocks = [(first, min(first + GEMINI_CHUNK_DAYS - 1, days)) for first in range(1, days + 1, GEMINI_CHUNK_DAYS)]
+            tasks = [asyncio.ensure_future(self._generate_day_block_async(trip_request, places, skeleton, first, last, priority)) for first, last in blocks]
+            try:
+                parts = await asyncio.gather(*tasks)
+            finally:
+                # One failed block fails the whole trip, so stop paying for the others
+                for task in tasks:
+                    task.cancel()
+        except (asyncio.CancelledError, RateLimitExceeded):
+            gemini_breaker.release()
+            raise
+        except Exception:
+            gemini_breaker.record_failure()
+            raise
+        finally:
+            _deadline_scope.reset(deadline_scope)
+        gemini_breaker.record_success(time.monotonic() - started)
+        
+        if trip_request.get("outputFormat") == "json":
+            itinerary_days = [day for part in parts for day in part]
+            return Itinerary(
+                title=skeleton.title,
+                destination=trip_request.get("destination", ""),
+                days=itinerary_days,
+                estimatedTotalCost=sum(activity.estimatedCost for day in itinerary_days for activity in day.activities),
+                tips=skeleton.tips
+            ).model_dump_json()
+        
+        sections = [f"🌟 {skeleton.title.upper()}", "📅 LỊCH TRÌNH CHI TIẾT:", *(part.strip() for part in parts)]
+        if skeleton.tips:
+            sections.append("🛡️ TIPS VÀ LƯU Ý:\n" + "\n".join(f"• {tip}" for tip in skeleton.tips))
+        return "\n\n".join(sections)
 
-        recommendation += f"""
-🚗 PHƯƠNG TIỆN DI CHUYỂN:
-"""
-        if transportation == "máy bay":
-            recommendation += """• Đặt vé máy bay sớm để có giá tốt
-• Check-in online để tiết kiệm thời gian
-• Đến sân bay trước 2h (nội địa) hoặc 3h (quốc tế)
-• Chi phí: 1-5 triệu VND/người
-"""
-        elif transportation == "xe khách":
-            recommendation += """• Chọn xe giường nằm chất lượng cao
-• Mang theo đồ ăn nhẹ và nước uống
-• Đặt chỗ ngồi đầu xe để ít bị say
-• Chi phí: 200k-600k VND/người
-"""
-        elif transportation == "tàu hỏa":
-            recommendation += """• Đặt toa điều hòa để thoải mái hơn
-• Mang theo sạc dự phòng
-• Chuẩn bị đồ ăn cho chuyến đi dài
-• Chi phí: 300k-800k VND/người
-"""
-        else:
-            recommendation += f"""• Sử dụng {transportation} an toàn và tiện lợi
-• Kiểm tra lộ trình trước khi khởi hành
-• Chuẩn bị giấy tờ cần thiết
-"""
+    async def _generate_day_block_async(self, trip_request: dict, places: list[dict], skeleton: TripSkeleton, first: int, last: int, priority: int):
+        # Runs under the trip's breaker admission; _generate_chunked_async reports the outcome
+        structured = trip_request.get("outputFormat") == "json"
+        prompt = self._create_day_block_prompt(trip_request, places, skeleton, first, last)
+        text = await self._call_model_async(prompt, priority, DAYS_GENERATION_CONFIG if structured else None, report_breaker=False)
+        if not structured:
+            return text
+        
+        # Keep only the requested days, in order, whatever else the model added
+        days = {day.day: day for day in ItineraryDays.model_validate_json(text).days if first <= day.day <= last}
+        return [days[day] for day in sorted(days)]
 
-        # Generate daily itinerary
-        recommendation += f"""
-📅 LỊCH TRÌNH CHI TIẾT:
-"""
+    def _record_upstream_error(self, error: Exception, report_breaker: bool = True):
+        if isinstance(error, google_exceptions.ResourceExhausted):
+            gemini_limiter.throttled()
+        if report_breaker:
+            gemini_breaker.record_failure()
+
+    @staticmethod
+    def _estimate_tokens(prompt: str) -> int:
+        # Rough pre-call estimate (~3 chars/token for Vietnamese text) plus the expected answer size
+        return len(prompt) // 3 + GEMINI_EXPECTED_OUTPUT_TOKENS
+
+    def _record_usage(self, response, scope: dict | None = None):
+        # Input tokens actually billed per call, to compare prompt layouts and the context cache
+        usage = getattr(response, "usage_metadata", None)
+        if not usage:
+            return
+        prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+        self._usage["measured_calls"] += 1
+        self._usage["input_tokens"] += prompt_tokens
+        self._usage["cached_input_tokens"] += getattr(usage, "cached_content_token_count", 0) or 0
         
-        for day in range(1, int(days) + 1):
-            recommendation += f"""
-NGÀY {day}:
-🌅 Sáng (7:00-11:00):
-• Ăn sáng tại khách sạn hoặc quán phở địa phương
-• Tham quan điểm đến chính của {destination}
-• Chụp ảnh check-in
-
-🍽️ Trưa (11:00-14:00):
-• Thưởng thức đặc sản địa phương
-• Nghỉ ngơi tại accommodation
-• Khám phá khu vực lân cận
-
-🌆 Chiều (14:00-18:00):
-• Tham quan điểm thứ hai
-• Mua sắm quà lưu niệm
-• Trải nghiệm văn hóa địa phương
-
-🌙 Tối (18:00-22:00):
-• Dạo chợ đêm hoặc khu phố cổ
-• Thưởng thức ẩm thực đường phố
-• Giải trí và nghỉ ngơi
-"""
+        # Charge the generation (request) this call belongs to
+        scope = scope if scope is not None else _usage_scope.get()
+        if scope is not None:
+            scope["prompt_tokens"] += prompt_tokens
+            scope["response_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
 
-        # Interest-based activities
-        recommendation += f"""
-🎯 HOẠT ĐỘNG THEO SỞ THÍCH:
-"""
+    @staticmethod
+    def _total_tokens(response) -> int | None:
+        usage = getattr(response, "usage_metadata", None)
+        return getattr(usage, "total_token_count", None) if usage else None
+
+    async def _hedged_call(self, prompt: str, deadline: float, generation_config: dict | None = None) -> str:
+        """Race a hedged second request once the first is slower than the latency percentile; raise TimeoutError at the deadline"""
+        hedge_at = None
+        if GEMINI_HEDGE_ENABLED and len(self.latency) >= GEMINI_HEDGE_MIN_SAMPLES:
+            hedge_at = time.monotonic() + self.latency.percentile(GEMINI_HEDGE_PERCENTILE)
         
-        activity_map = {
-            "ẩm thực": """• Thử món đặc sản địa phương
-• Tham gia tour ẩm thực
-• Ghé thăm chợ đêm và food court
-• Học nấu món truyền thống
-""",
-            "văn hóa": """• Tham quan bảo tàng và di tích lịch sử
-• Xem biểu diễn nghệ thuật truyền thống
-• Tham gia lễ hội địa phương (nếu có)
-• Ghé thăm làng nghề truyền thống
-""",
-            "thiên nhiên": """• Trekking và leo núi
-• Tham quan vườn quốc gia
-• Ngắm cảnh hoàng hôn/bình minh
-• Khám phá động, thác nước
-""",
-            "biển": """• Tắm biển và thể thao nước
-• Du thuyền ngắm cảnh
-• Thưởng thức hải sản tươi sống
-• Lặn ngắm san hô
-""",
-            "mạo hiểm": """• Thể thao mạo hiểm như zipline, bungee
-• Khám phá hang động
-• Hoạt động outdoor như rafting
-• Paragliding hoặc skydiving
-""",
-            "thư giãn": """• Spa và massage thư giãn
-• Yoga buổi sáng
-• Đọc sách bên bãi biển/hồ bơi
-• Meditation và tắm nắng
-""",
-            "shopping": """• Ghé thăm trung tâm thương mại
-• Mua sắm đồ lưu niệm
-• Khám phá các chợ truyền thống
-• Săn sale và hàng hiệu
-"""
-        }
+        primary = asyncio.ensure_future(self._attempt_async(prompt, deadline, generation_config))
+        attempts = [primary]
+        pending = {primary}
+        error = None
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= deadline:
+                    raise TimeoutError(f"Gemini did not answer within {GEMINI_DEADLINE_SECONDS}s")
+                
+                timeout = deadline - now
+                if hedge_at is not None:
+                    timeout = min(timeout, max(hedge_at - now, 0))
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+                
+                if hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    # Only hedge into a free slot; a hedge that has to queue would not help
+                    if pending and not self._async_limit.locked() and gemini_limiter.try_acquire(self._estimate_tokens(prompt)):
+                        hedge = asyncio.ensure_future(self._attempt_async(prompt, deadline, generation_config))
+                        attempts.append(hedge)
+                        pending.add(hedge)
+                        self._stats["hedges_sent"] += 1
+            
+            raise error
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+    async def _attempt_async(self, prompt: str, deadline: float, generation_config: dict | None = None) -> str:
+        # Wait for a free slot so a traffic spike cannot open unbounded Gemini calls
+        async with self._async_limit:
+            started = time.monotonic()
+            self._touch_context_cache()
+            response = await (_model_scope.get() or self.model).generate_content_async(
+                prompt,
+                generation_config=generation_config,
+                request_options={"timeout": max(deadline - started, 1)}
+            )
+            text = response.text
+        self.latency.add(time.monotonic() - started)
+        gemini_limiter.settle(self._estimate_tokens(prompt), self._total_tokens(response))
+        self._record_usage(response)
+        return text
+
+    async def stream_async(self, trip_request: dict, usage: dict | None = None):
+        """Yield the recommendation as Gemini streams it; cached and local outputs arrive as one chunk.
+        
+        Token usage of the stream is added to usage (prompt_tokens/response_tokens) when given.
+        """
+        cache_key = canonical_trip_key(trip_request)
+        cached = recommendation_cache.get_memory(cache_key)
+        if cached is None:
+            cached = await run_in_threadpool(recommendation_cache.get_durable, cache_key)
+        if cached is not None:
+            yield self._result(trip_request, cached, "cache", cache_key)
+            return
         
-        for interest in interests:
-            if interest.lower() in activity_map:
-                recommendation += activity_map[interest.lower()]
+        # A stream cannot switch models midway, so it only uses the route's first tier
+        route = model_router.route(trip_request, self._available_tiers()) if self.model else None
+        if route and route.tier != TIER_LOCAL and gemini_breaker.allow_request():
+            parts = []
+            recorded = False
+            try:
+                places = await run_in_threadpool(place_retriever.retrieve, trip_request)
+                prompt = self._create_travel_prompt(trip_request, places)
+                
+                if not await gemini_limiter.acquire(self._estimate_tokens(prompt), PRIORITY_INTERACTIVE, GEMINI_QUEUE_MAX_WAIT_SECONDS):
+                    raise RateLimitExceeded("No Gemini quota available for streaming")
+                
+                async with self._async_limit:
+                    started = time.monotonic()
+                    self._touch_context_cache()
+                    response = await self._model_for(route.tier).generate_content_async(prompt, stream=True)
+                    async for chunk in response:
+                        if chunk.text:
+                            if not recorded:
+                                # For a stream, time to first chunk is what the breaker judges
+                                gemini_breaker.record_success(time.monotonic() - started)
+                                recorded = True
+                            parts.append(chunk.text)
+                            yield GenerationResult(chunk.text, "gemini", cache_key)
+                
+                if not recorded:
+                    gemini_breaker.record_success(time.monotonic() - started)
+                    recorded = True
+                # Usage metadata is complete once the stream has been consumed
+                self._record_usage(response, usage)
+                if parts:
+                    recommendation_cache.put(cache_key, "".join(parts))
+                    return
+                logger.warning("Gemini returned empty stream, falling back to local generation")
+                
+            except RateLimitExceeded as e:
+                logger.warning(f"{e}, falling back to local generation")
+            except Exception as e:
+                logger.error(f"Error streaming recommendation with Gemini: {e}")
+                if not recorded:
+                    self._record_upstream_error(e)
+                    recorded = True
+                # Part of the answer already reached the client, so a fallback cannot be spliced in
+                if parts:
+                    raise
+            finally:
+                # Client went away before Gemini answered
+                if not recorded:
+                    gemini_breaker.release()
         
-        if not any(interest.lower() in activity_map for interest in interests):
-            recommendation += """• Khám phá điểm tham quan nổi tiếng
-• Trải nghiệm văn hóa địa phương
-• Thưởng thức ẩm thực đặc sản
-• Chụp ảnh và làm kỷ niệm
+        yield self._local_result(trip_request, cache_key)
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "chunked_min_days": GEMINI_CHUNKED_MIN_DAYS,
+            "prompt_tokens": self.prompt_token_stats(),
+            "router": {**model_router.stats(), "models": {tier: getattr(self._model_for(tier), "model_name", None) for tier in sorted(self._available_tiers())}},
+            "backend": gemini_backend.stats(),
+            "latency": self.latency.snapshot(),
+            "local_fallback_cache": local_fallback_cache_stats(),
+            "rate_limiter": gemini_limiter.stats(),
+            "deadline_seconds": GEMINI_DEADLINE_SECONDS,
+            "hedging": GEMINI_HEDGE_ENABLED
+        }
+
+    def prompt_token_stats(self) -> dict:
+        calls = self._usage["measured_calls"]
+        return {
+            "measured_calls": calls,
+            "input_tokens_per_call": round(self._usage["input_tokens"] / calls, 1) if calls else None,
+            "cached_input_tokens_per_call": round(self._usage["cached_input_tokens"] / calls, 1) if calls else None,
+            "context_cache": self._context_cache.name if self._context_cache is not None else None
+        }
+
+    @staticmethod
+    def _result(trip_request: dict, text: str, source: str, cache_key: str, usage: dict | None = None) -> GenerationResult:
+        return GenerationResult(text, source, cache_key, structured=trip_request.get("outputFormat") == "json", **(usage or {}))
+
+    @staticmethod
+    def _timed(result: GenerationResult, started: float) -> GenerationResult:
+        return replace(result, latency_ms=int((time.monotonic() - started) * 1000))
+
+    def _local_result(self, trip_request: dict, cache_key: str, usage: dict | None = None) -> GenerationResult:
+        if trip_request.get("outputFormat") == "json":
+            text = json.dumps(self._generate_local_itinerary(trip_request), ensure_ascii=False)
+        else:
+            text = self._generate_local_recommendation(trip_request)
+        return self._result(trip_request, text, "local", cache_key, usage)
+
+    def _prompt_for(self, trip_request: dict, places: list[dict]) -> tuple[str, dict | None]:
+        if trip_request.get("outputFormat") == "json":
+            return self._create_itinerary_prompt(trip_request, places), ITINERARY_GENERATION_CONFIG
+        return self._create_travel_prompt(trip_request, places), None
+
+    @staticmethod
+    def _checked_output(trip_request: dict, text: str) -> str | None:
+        """Validate JSON itineraries against the schema; returns normalized JSON, or None if invalid"""
+        if not text or trip_request.get("outputFormat") != "json":
+            return text
+        try:
+            return Itinerary.model_validate_json(text).model_dump_json()
+        except ValidationError as e:
+            logger.warning(f"Gemini itinerary failed schema validation: {e.error_count()} errors")
+            return None
+
+    @staticmethod
+    def coalesced(result: GenerationResult) -> GenerationResult:
+        # Waiters get the leader's output but must not be counted as a model call of their own
+        return replace(result, source="coalesced", prompt_tokens=0, response_tokens=0) if result.source == "gemini" else result
+
+    def _create_travel_prompt(self, trip_request: dict, places: list[dict]) -> str:
+        """Create the per-request payload for Gemini; the static instructions live in TRAVEL_SYSTEM_INSTRUCTION"""
+        return f"""{self._trip_context(trip_request, places)}
+
+Hãy tạo một gợi ý toàn diện, thực tế và hữu ích cho chuyến đi này.
 """
 
-        # Budget breakdown
-        recommendation += f"""
-💰 BẢNG CHI PHÍ ƯỚC TÍNH (cho {people} người):
+    def _create_itinerary_prompt(self, trip_request: dict, places: list[dict]) -> str:
+        """Create a prompt for the structured (JSON) itinerary mode"""
+        return f"""
+Hãy lập lịch trình chi tiết dạng JSON theo đúng schema được cung cấp.
+
+{self._trip_context(trip_request, places)}
+
+YÊU CẦU:
+- Đúng {trip_request.get('days', 1)} phần tử trong "days", "day" đánh số từ 1
+- Mỗi ngày 3-6 hoạt động, "time" theo dạng "HH:MM-HH:MM"
+- "place" là tên địa điểm cụ thể, có thật tại điểm đến
+- "estimatedCost" và "estimatedTotalCost" là số nguyên VND (cho cả nhóm)
+- "tips" gồm 3-6 lưu ý ngắn gọn
 """
+
+    def _create_day_edit_prompt(self, trip_input: str, context: str, day: int, current: str, instruction: str, structured: bool) -> str:
+        """Create the prompt for regenerating a single day of an existing itinerary"""
+        if structured:
+            output_rules = f"""- Trả về JSON theo đúng schema của MỘT ngày, "day" = {day}
+- Mỗi ngày 3-6 hoạt động, "time" theo dạng "HH:MM-HH:MM"
+- "place" là tên địa điểm cụ thể, có thật tại điểm đến
+- "estimatedCost" là số nguyên VND (cho cả nhóm)"""
+        else:
+            output_rules = f"""- Chỉ viết lại ngày {day}, bắt đầu bằng dòng "NGÀY {day}: <tiêu đề>"
+- Giữ phong cách của bản hiện tại (emoji, timeline, chi phí VND)
+- KHÔNG viết phần mở đầu, tổng kết hay các ngày khác"""
         
-        if "dưới 5" in budget.lower():
-            recommendation += """• Accommodation: 300k-500k VND/đêm
-• Ăn uống: 200k-400k VND/người/ngày
-• Di chuyển: 100k-300k VND/người/ngày
-• Vé tham quan: 50k-200k VND/người
-• Shopping: 200k-500k VND/người
-• Tổng cộng: 3-5 triệu VND
+        return f"""
+Hãy viết lại NGÀY {day} của lịch trình dưới đây theo yêu cầu thay đổi.
+
+THÔNG TIN CHUYẾN ĐI: {trip_input}
+
+CÁC NGÀY KHÁC (giữ nguyên, tránh trùng địa điểm):
+{context or '- (không có)'}
+
+NGÀY {day} HIỆN TẠI:
+{current}
+
+YÊU CẦU THAY ĐỔI: {instruction}
+
+YÊU CẦU:
+{output_rules}
 """
-        elif "5" in budget and "10" in budget:
-            recommendation += """• Accommodation: 800k-1.5 triệu VND/đêm
-• Ăn uống: 400k-800k VND/người/ngày
-• Di chuyển: 300k-600k VND/người/ngày
-• Vé tham quan: 200k-500k VND/người
-• Shopping: 500k-1 triệu VND/người
-• Tổng cộng: 5-10 triệu VND
+
+    @staticmethod
+    def _trip_info(trip_request: dict) -> str:
+        interests = trip_request.get('interests', [])
+        return f"""THÔNG TIN CHUYẾN ĐI:
+- Điểm khởi hành: {trip_request.get('departure', '')}
+- Điểm đến: {trip_request.get('destination', '')}
+- Số người: {trip_request.get('people', 1)} người
+- Thời gian: {trip_request.get('days', 1)} ngày ({trip_request.get('time', '')})
+- Ngân sách: {trip_request.get('money', '')}
+- Phong cách du lịch: {trip_request.get('travelStyle', '')}
+- Sở thích: {', '.join(interests) if interests else 'Chưa có'}
+- Loại accommodation: {trip_request.get('accommodation', '')}
+- Phương tiện di chuyển: {trip_request.get('transportation', '')}"""
+
+    @staticmethod
+    def _trip_context(trip_request: dict, places: list[dict]) -> str:
+        """Trip fields plus the curated places retrieved for the destination"""
+        context = places_context(places)
+        return GeminiService._trip_info(trip_request) + (f"\n\n{context}" if context else "")
+
+    def _create_skeleton_prompt(self, trip_request: dict, places: list[dict]) -> str:
+        """Create the short skeleton prompt of chunked generation (one line per day, no details)"""
+        return f"""
+Hãy lập KHUNG lịch trình (chưa cần chi tiết) dạng JSON theo đúng schema được cung cấp.
+
+{self._trip_context(trip_request, places)}
+
+YÊU CẦU:
+- Đúng {trip_request.get('days', 1)} phần tử trong "days", "day" đánh số từ 1
+- "title" của mỗi ngày ngắn gọn, "focus" là khu vực/chủ đề chính trong ngày (tối đa 15 từ)
+- Phân bổ địa điểm hợp lý, không lặp lại giữa các ngày
+- "tips" gồm 3-6 lưu ý ngắn gọn cho cả chuyến đi
 """
+
+    def _create_day_block_prompt(self, trip_request: dict, places: list[dict], skeleton: TripSkeleton, first: int, last: int) -> str:
+        """Create the prompt for one block of days; the skeleton keeps blocks consistent with each other"""
+        outline = "\n".join(f"- Ngày {day.day}: {day.title} — {day.focus}" for day in skeleton.days)
+        days = f"ngày {first}" if first == last else f"ngày {first} đến ngày {last}"
+        
+        if trip_request.get("outputFormat") == "json":
+            output_rules = f"""- Trả về JSON theo đúng schema, chỉ gồm {days}, "day" giữ nguyên số thứ tự trong khung
+- Mỗi ngày 3-6 hoạt động, "time" theo dạng "HH:MM-HH:MM"
+- "place" là tên địa điểm cụ thể, có thật tại điểm đến
+- "estimatedCost" là số nguyên VND (cho cả nhóm)"""
         else:
-            recommendation += """• Accommodation: 1.5-3 triệu VND/đêm
-• Ăn uống: 800k-1.5 triệu VND/người/ngày
-• Di chuyển: 600k-1.2 triệu VND/người/ngày
-• Vé tham quan: 500k-1 triệu VND/người
-• Shopping: 1-3 triệu VND/người
-• Tổng cộng: 10+ triệu VND
-"""
+            output_rules = f"""- Chỉ viết {days}, mỗi ngày bắt đầu bằng dòng "NGÀY <số>: <tiêu đề>"
+- Timeline cụ thể, địa điểm, quán ăn đặc sản, chi phí ước tính (VND) cho từng hoạt động
+- Sử dụng emoji, KHÔNG viết phần mở đầu hay tổng kết chuyến đi"""
+        
+        return f"""
+Khung lịch trình "{skeleton.title}" đã được lập, hãy viết chi tiết cho {days}.
 
-        # Tips and notes
-        recommendation += f"""
-🛡️ TIPS VÀ LƯU Ý:
-• Mua bảo hiểm du lịch
-• Chuẩn bị thuốc cá nhân
-• Backup tài liệu quan trọng
-• Thông báo lịch trình cho người thân
-• Kiểm tra thời tiết trước khi đi
-• Mang theo tiền mặt và thẻ ATM
-• Tải app bản đồ offline
-• Học vài câu tiếng địa phương
-
-🍜 MÓN ĂN PHẢI THỬ:
-• Đặc sản nổi tiếng của {destination}
-• Bánh mì và cà phê Việt Nam
-• Hải sản tươi sống (nếu gần biển)
-• Chè và trái cây nhiệt đới
-
-✨ Chúc bạn có chuyến đi {destination} thật vui vẻ và đáng nhớ!
-
-📞 Liên hệ hỗ trợ:
-• Tổng đài du lịch: 1900-xxxx
-• Cấp cứu: 115
-• Cảnh sát: 113
+{self._trip_context(trip_request, places)}
+
+KHUNG LỊCH TRÌNH:
+{outline}
+
+YÊU CẦU:
+{output_rules}
 """
+
+    def _generate_local_recommendation(self, trip_request: dict) -> str:
+        """Fallback function for local recommendation generation"""
+        return render_local_recommendation(trip_request)
+
+    def _generate_local_itinerary(self, trip_request: dict) -> dict:
+        """Fallback structured itinerary matching the Itinerary schema"""
         
-        return recommendation
+        destination = trip_request.get('destination', '')
+        people = int(trip_request.get('people', 1) or 1)
+        days = int(trip_request.get('days', 1) or 1)
+        
+        slots = [
+            ("07:00-11:00", f"Điểm tham quan chính của {destination}", "Ăn sáng đặc sản địa phương và tham quan, chụp ảnh check-in", 150000),
+            ("11:00-14:00", f"Quán ăn địa phương tại {destination}", "Thưởng thức đặc sản và nghỉ trưa", 150000),
+            ("14:00-18:00", f"Điểm tham quan thứ hai tại {destination}", "Tham quan, mua sắm quà lưu niệm, trải nghiệm văn hóa", 200000),
+            ("18:00-22:00", f"Chợ đêm / phố đi bộ {destination}", "Ẩm thực đường phố và dạo phố buổi tối", 200000),
+        ]
+        
+        itinerary_days = []
+        for day in range(1, days + 1):
+            itinerary_days.append({
+                "day": day,
+                "title": f"Ngày {day} tại {destination}",
+                "activities": [
+                    {"time": time, "place": place, "description": description, "estimatedCost": cost * people}
+                    for time, place, description, cost in slots
+                ]
+            })
+        
+        return {
+            "title": f"Gợi ý chuyến đi từ {trip_request.get('departure', '')} đến {destination}",
+            "destination": destination,
+            "days": itinerary_days,
+            "estimatedTotalCost": sum(cost for _, _, _, cost in slots) * people * days,
+            "tips": [
+                "Mua bảo hiểm du lịch",
+                "Kiểm tra thời tiết trước khi đi",
+                "Mang theo tiền mặt và thẻ ATM",
+                "Tải app bản đồ offline"
+            ]
+        }
+
+def render_itinerary_text(itinerary: Itinerary) -> str:
+    """Render a structured itinerary as the emoji text stored in AIRecommendation.output"""
+    lines = [f"🌟 {itinerary.title.upper()}", "", "📅 LỊCH TRÌNH CHI TIẾT:"]
+    for day in itinerary.days:
+        lines.append("")
+        lines.append(f"NGÀY {day.day}: {day.title}")
+        for activity in day.activities:
+            lines.append(f"• {activity.time} — {activity.place}: {activity.description} (~{activity.estimatedCost:,} VND)")
+    lines.append("")
+    lines.append(f"💰 TỔNG CHI PHÍ ƯỚC TÍNH: ~{itinerary.estimatedTotalCost:,} VND")
+    if itinerary.tips:
+        lines.append("")
+        lines.append("🛡️ TIPS VÀ LƯU Ý:")
+        lines.extend(f"• {tip}" for tip in itinerary.tips)
+    return "\n".join(lines)
 
 # Create singleton instance
 gemini_service = GeminiService()
@@ -0,0 +1,162 @@
+"""
+Background health prober for Gemini: sends a tiny fixed prompt on an interval and keeps
+rolling latency/error numbers, so /ai_recs/health reports real upstream performance
+without making a live call per request
+"""
+from collections import deque
+from datetime import datetime
+from services.gemini_service import gemini_service, gemini_limiter, GEMINI_MODEL
+from services.gemini_backend import gemini_backend
+import asyncio
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+AI_HEALTH_PROBE_ENABLED = os.getenv("AI_HEALTH_PROBE_ENABLED", "true").lower() == "true"
+AI_HEALTH_PROBE_INTERVAL_SECONDS = float(os.getenv("AI_HEALTH_PROBE_INTERVAL_SECONDS", "30"))
+AI_HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("AI_HEALTH_PROBE_TIMEOUT_SECONDS", "10"))
+AI_HEALTH_PROBE_WINDOW = int(os.getenv("AI_HEALTH_PROBE_WINDOW", "60"))
+# Ngưỡng để báo "degraded": tỉ lệ lỗi trong cửa sổ và p95 độ trễ (ms)
+AI_HEALTH_PROBE_ERROR_RATE = float(os.getenv("AI_HEALTH_PROBE_ERROR_RATE", "0.5"))
+AI_HEALTH_PROBE_SLOW_MS = float(os.getenv("AI_HEALTH_PROBE_SLOW_MS", "8000"))
+
+# Fixed prompt and a one-token answer: the probe measures the round trip, not generation
+PROBE_PROMPT = "ping"
+PROBE_GENERATION_CONFIG = {"max_output_tokens": 1, "temperature": 0}
+PROBE_TOKENS = 2
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000)
+
+class HealthProber:
+    def __init__(self, enabled: bool, interval: float, window: int = AI_HEALTH_PROBE_WINDOW):
+        self.enabled = enabled
+        self.interval = interval
+        self.model = None
+        self._task: asyncio.Task | None = None
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=window)  # (latency seconds, ok) per probe
+        self._stats = {"probes": 0, "errors": 0, "skipped": 0, "consecutive_errors": 0}
+        self._last_probe_at = None
+        self._last_success_at = None
+        self._last_error = None
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Gemini health prober started (every {self.interval}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Health probe failed unexpectedly: {e}")
+            await asyncio.sleep(self.interval)
+
+    def _probe_model(self):
+        # Same model as generation but without the system instruction, so a probe costs a few tokens
+        if self.model is None and gemini_service.model is not None:
+            self.model = gemini_backend.model(GEMINI_MODEL, record=False)
+        return self.model
+
+    async def probe_once(self) -> bool | None:
+        """Send one probe; None when it was skipped (no model, or quota is needed by real traffic)"""
+        model = self._probe_model()
+        if model is None or not gemini_limiter.try_acquire(PROBE_TOKENS):
+            with self._lock:
+                self._stats["skipped"] += 1
+            return None
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(
+                model.generate_content_async(
+                    PROBE_PROMPT,
+                    generation_config=PROBE_GENERATION_CONFIG,
+                    request_options={"timeout": AI_HEALTH_PROBE_TIMEOUT_SECONDS}
+                ),
+                timeout=AI_HEALTH_PROBE_TIMEOUT_SECONDS
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record(time.monotonic() - started, False, f"{type(e).__name__}: {e}")
+            return False
+
+        self._record(time.monotonic() - started, True)
+        return True
+
+    def _record(self, latency: float, ok: bool, error: str | None = None):
+        with self._lock:
+            self._window.append((latency, ok))
+            self._stats["probes"] += 1
+            self._last_probe_at = datetime.now()
+            if ok:
+                self._stats["consecutive_errors"] = 0
+                self._last_success_at = self._last_probe_at
+            else:
+                self._stats["errors"] += 1
+                self._stats["consecutive_errors"] += 1
+                self._last_error = error
+                logger.warning(f"Gemini health probe failed: {error}")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            window = list(self._window)
+            stats = dict(self._stats)
+            last_probe_at, last_success_at, last_error = self._last_probe_at, self._last_success_at, self._last_error
+
+        latencies = sorted(latency * 1000 for latency, ok in window if ok)
+
+        def percentile(q: float):
+            return round(latencies[min(int(q * len(latencies)), len(latencies) - 1)], 1) if latencies else None
+
+        histogram = {f"le_{bound}": 0 for bound in LATENCY_BUCKETS_MS}
+        histogram["inf"] = 0
+        for latency in latencies:
+            bucket = next((f"le_{bound}" for bound in LATENCY_BUCKETS_MS if latency <= bound), "inf")
+            histogram[bucket] += 1
+
+        # A prober that stopped reporting must not keep vouching for the upstream
+        stale = last_probe_at is None or (datetime.now() - last_probe_at).total_seconds() > self.interval * 3 + AI_HEALTH_PROBE_TIMEOUT_SECONDS
+
+        return {
+            **stats,
+            "enabled": self.enabled,
+            "interval_seconds": self.interval,
+            "window": len(window),
+            "error_rate": round(sum(1 for _, ok in window if not ok) / len(window), 4) if window else None,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "latency_histogram_ms": histogram,
+            "stale": stale,
+            "last_probe_at": last_probe_at.isoformat() if last_probe_at else None,
+            "last_success_at": last_success_at.isoformat() if last_success_at else None,
+            "last_error": last_error
+        }
+
+    def degraded_reason(self, snapshot: dict) -> str | None:
+        """Why the probe numbers say the upstream is unhealthy, or None"""
+        if snapshot["stale"] or not snapshot["window"]:
+            return None
+        if snapshot["error_rate"] >= AI_HEALTH_PROBE_ERROR_RATE:
+            return f"Health probes are failing ({snapshot['error_rate']:.0%} errors, last: {snapshot['last_error']})"
+        if snapshot["p95_ms"] is not None and snapshot["p95_ms"] >= AI_HEALTH_PROBE_SLOW_MS:
+            return f"Gemini is slow (probe p95 {snapshot['p95_ms']} ms)"
+        return None
+
+# Create singleton instance
+health_prober = HealthProber(AI_HEALTH_PROBE_ENABLED, AI_HEALTH_PROBE_INTERVAL_SECONDS)
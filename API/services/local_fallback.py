@@ -0,0 +1,258 @@
+"""
+Template-based local trip recommendation, used when Gemini is unavailable.
+Sections are precompiled fragments joined once; the trip-shaped body is memoized
+so the fallback stays cheap when it takes all the traffic.
+"""
+from functools import lru_cache
+import os
+
+LOCAL_FALLBACK_CACHE_SIZE = int(os.getenv("LOCAL_FALLBACK_CACHE_SIZE", "1024"))
+
+_HEADER = """🌟 GỢI Ý CHUYẾN ĐI TỪ {departure} ĐẾN {destination}
+
+📍 THÔNG TIN CHUYẾN ĐI:
+• Số người: {people} người
+• Thời gian: {days} ngày
+• Ngân sách: {budget}
+• Phong cách: {travel_style}
+• Sở thích: {interests}
+
+🏨 GỢI Ý LƯU TRÚ:
+"""
+
+_LODGING = {
+    "luxury": """• Resort 5 sao hoặc khách sạn boutique cao cấp
+• Dịch vụ spa và tiện nghi đầy đủ
+• Vị trí trung tâm hoặc view đẹp
+• Giá: 2-5 triệu VND/đêm
+""",
+    "comfort": """• Khách sạn 3-4 sao với đầy đủ tiện nghi
+• Gần trung tâm và điểm tham quan
+• Có hồ bơi và gym
+• Giá: 800k-2 triệu VND/đêm
+""",
+    "basic": """• Homestay hoặc khách sạn 2-3 sao
+• Gần phương tiện công cộng
+• Sạch sẽ và an toàn
+• Giá: 300k-800k VND/đêm
+""",
+}
+
+_TRANSPORT_HEADER = """
+🚗 PHƯƠNG TIỆN DI CHUYỂN:
+"""
+
+_TRANSPORT = {
+    "máy bay": """• Đặt vé máy bay sớm để có giá tốt
+• Check-in online để tiết kiệm thời gian
+• Đến sân bay trước 2h (nội địa) hoặc 3h (quốc tế)
+• Chi phí: 1-5 triệu VND/người
+""",
+    "xe khách": """• Chọn xe giường nằm chất lượng cao
+• Mang theo đồ ăn nhẹ và nước uống
+• Đặt chỗ ngồi đầu xe để ít bị say
+• Chi phí: 200k-600k VND/người
+""",
+    "tàu hỏa": """• Đặt toa điều hòa để thoải mái hơn
+• Mang theo sạc dự phòng
+• Chuẩn bị đồ ăn cho chuyến đi dài
+• Chi phí: 300k-800k VND/người
+""",
+}
+
+_TRANSPORT_OTHER = """• Sử dụng {transportation} an toàn và tiện lợi
+• Kiểm tra lộ trình trước khi khởi hành
+• Chuẩn bị giấy tờ cần thiết
+"""
+
+_SCHEDULE_HEADER = """
+📅 LỊCH TRÌNH CHI TIẾT:
+"""
+
+# Formatted once per destination, then repeated for every day behind its "NGÀY <số>:" heading
+_DAY_BODY = """
+🌅 Sáng (7:00-11:00):
+• Ăn sáng tại khách sạn hoặc quán phở địa phương
+• Tham quan điểm đến chính của {destination}
+• Chụp ảnh check-in
+
+🍽️ Trưa (11:00-14:00):
+• Thưởng thức đặc sản địa phương
+• Nghỉ ngơi tại accommodation
+• Khám phá khu vực lân cận
+
+🌆 Chiều (14:00-18:00):
+• Tham quan điểm thứ hai
+• Mua sắm quà lưu niệm
+• Trải nghiệm văn hóa địa phương
+
+🌙 Tối (18:00-22:00):
+• Dạo chợ đêm hoặc khu phố cổ
+• Thưởng thức ẩm thực đường phố
+• Giải trí và nghỉ ngơi
+"""
+
+_ACTIVITIES_HEADER = """
+🎯 HOẠT ĐỘNG THEO SỞ THÍCH:
+"""
+
+_ACTIVITIES = {
+    "ẩm thực": """• Thử món đặc sản địa phương
+• Tham gia tour ẩm thực
+• Ghé thăm chợ đêm và food court
+• Học nấu món truyền thống
+""",
+    "văn hóa": """• Tham quan bảo tàng và di tích lịch sử
+• Xem biểu diễn nghệ thuật truyền thống
+• Tham gia lễ hội địa phương (nếu có)
+• Ghé thăm làng nghề truyền thống
+""",
+    "thiên nhiên": """• Trekking và leo núi
+• Tham quan vườn quốc gia
+• Ngắm cảnh hoàng hôn/bình minh
+• Khám phá động, thác nước
+""",
+    "biển": """• Tắm biển và thể thao nước
+• Du thuyền ngắm cảnh
+• Thưởng thức hải sản tươi sống
+• Lặn ngắm san hô
+""",
+    "mạo hiểm": """• Thể thao mạo hiểm như zipline, bungee
+• Khám phá hang động
+• Hoạt động outdoor như rafting
+• Paragliding hoặc skydiving
+""",
+    "thư giãn": """• Spa và massage thư giãn
+• Yoga buổi sáng
+• Đọc sách bên bãi biển/hồ bơi
+• Meditation và tắm nắng
+""",
+    "shopping": """• Ghé thăm trung tâm thương mại
+• Mua sắm đồ lưu niệm
+• Khám phá các chợ truyền thống
+• Săn sale và hàng hiệu
+""",
+}
+
+_ACTIVITIES_DEFAULT = """• Khám phá điểm tham quan nổi tiếng
+• Trải nghiệm văn hóa địa phương
+• Thưởng thức ẩm thực đặc sản
+• Chụp ảnh và làm kỷ niệm
+"""
+
+_COSTS_HEADER = """
+💰 BẢNG CHI PHÍ ƯỚC TÍNH (cho {people} người):
+"""
+
+_COSTS = {
+    "low": """• Accommodation: 300k-500k VND/đêm
+• Ăn uống: 200k-400k VND/người/ngày
+• Di chuyển: 100k-300k VND/người/ngày
+• Vé tham quan: 50k-200k VND/người
+• Shopping: 200k-500k VND/người
+• Tổng cộng: 3-5 triệu VND
+""",
+    "mid": """• Accommodation: 800k-1.5 triệu VND/đêm
+• Ăn uống: 400k-800k VND/người/ngày
+• Di chuyển: 300k-600k VND/người/ngày
+• Vé tham quan: 200k-500k VND/người
+• Shopping: 500k-1 triệu VND/người
+• Tổng cộng: 5-10 triệu VND
+""",
+    "high": """• Accommodation: 1.5-3 triệu VND/đêm
+• Ăn uống: 800k-1.5 triệu VND/người/ngày
+• Di chuyển: 600k-1.2 triệu VND/người/ngày
+• Vé tham quan: 500k-1 triệu VND/người
+• Shopping: 1-3 triệu VND/người
+• Tổng cộng: 10+ triệu VND
+""",
+}
+
+_TIPS = """
+🛡️ TIPS VÀ LƯU Ý:
+• Mua bảo hiểm du lịch
+• Chuẩn bị thuốc cá nhân
+• Backup tài liệu quan trọng
+• Thông báo lịch trình cho người thân
+• Kiểm tra thời tiết trước khi đi
+• Mang theo tiền mặt và thẻ ATM
+• Tải app bản đồ offline
+• Học vài câu tiếng địa phương
+
+🍜 MÓN ĂN PHẢI THỬ:
+• Đặc sản nổi tiếng của {destination}
+• Bánh mì và cà phê Việt Nam
+• Hải sản tươi sống (nếu gần biển)
+• Chè và trái cây nhiệt đới
+
+✨ Chúc bạn có chuyến đi {destination} thật vui vẻ và đáng nhớ!
+
+📞 Liên hệ hỗ trợ:
+• Tổng đài du lịch: 1900-xxxx
+• Cấp cứu: 115
+• Cảnh sát: 113
+"""
+
+def _lodging_band(travel_style: str, budget: str) -> str:
+    if travel_style == "luxury" or "cao cấp" in budget.lower():
+        return "luxury"
+    if travel_style == "comfort" or "thoải mái" in travel_style:
+        return "comfort"
+    return "basic"
+
+def _cost_band(budget: str) -> str:
+    if "dưới 5" in budget.lower():
+        return "low"
+    if "5" in budget and "10" in budget:
+        return "mid"
+    return "high"
+
+@lru_cache(maxsize=LOCAL_FALLBACK_CACHE_SIZE)
+def _trip_body(destination: str, days: int, lodging: str, transportation: str, cost: str, interests: tuple) -> tuple[str, str]:
+    """Everything after the header, split around the per-request cost heading"""
+    day_body = _DAY_BODY.format(destination=destination)
+    activities = [_ACTIVITIES[interest] for interest in interests if interest in _ACTIVITIES]
+
+    head = "".join([
+        _LODGING[lodging],
+        _TRANSPORT_HEADER,
+        _TRANSPORT.get(transportation) or _TRANSPORT_OTHER.format(transportation=transportation),
+        _SCHEDULE_HEADER,
+        "".join([f"\nNGÀY {day}:{day_body}" for day in range(1, days + 1)]),
+        _ACTIVITIES_HEADER,
+        "".join(activities) if activities else _ACTIVITIES_DEFAULT,
+    ])
+    tail = _COSTS[cost] + _TIPS.format(destination=destination)
+    return head, tail
+
+def render_local_recommendation(trip_request: dict) -> str:
+    """Emoji text recommendation built from templates; only the header and cost heading are per request"""
+    destination = trip_request.get('destination', '')
+    people = trip_request.get('people', 1)
+    days = trip_request.get('days', 1)
+    budget = trip_request.get('money', '')
+    travel_style = trip_request.get('travelStyle', '')
+    interests = trip_request.get('interests', [])
+
+    head, tail = _trip_body(
+        destination,
+        int(days),
+        _lodging_band(travel_style, budget),
+        trip_request.get('transportation', ''),
+        _cost_band(budget),
+        tuple(interest.lower() for interest in interests)
+    )
+    header = _HEADER.format(
+        departure=trip_request.get('departure', '').upper(),
+        destination=destination.upper(),
+        people=people,
+        days=days,
+        budget=budget,
+        travel_style=travel_style,
+        interests=', '.join(interests) if interests else 'Khám phá tổng quát'
+    )
+    return "".join([header, head, _COSTS_HEADER.format(people=people), tail])
+
+def cache_stats() -> dict:
+    info = _trip_body.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
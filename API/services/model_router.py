@@ -0,0 +1,100 @@
+"""
+Model routing by request complexity: pick a model tier (or the local generator) from
+days, interests and budget, with a fallback chain when a tier fails
+"""
+from collections import Counter
+from dataclasses import dataclass
+import os
+import re
+import threading
+
+TIER_LOCAL = "local"
+TIER_LIGHT = "light"
+TIER_STANDARD = "standard"
+TIER_HEAVY = "heavy"
+
+# Tried in order until one answers; local always ends the chain
+FALLBACK_CHAINS = {
+    TIER_HEAVY: [TIER_HEAVY, TIER_STANDARD, TIER_LIGHT, TIER_LOCAL],
+    TIER_STANDARD: [TIER_STANDARD, TIER_LIGHT, TIER_LOCAL],
+    TIER_LIGHT: [TIER_LIGHT, TIER_STANDARD, TIER_LOCAL],
+    TIER_LOCAL: [TIER_LOCAL],
+}
+
+# Ngưỡng điểm phức tạp (days + sở thích thêm + mức ngân sách); 0 = không dùng tier đó
+ROUTER_LOCAL_MAX_SCORE = int(os.getenv("ROUTER_LOCAL_MAX_SCORE", "0"))
+ROUTER_LIGHT_MAX_SCORE = int(os.getenv("ROUTER_LIGHT_MAX_SCORE", "3"))
+ROUTER_HEAVY_MIN_SCORE = int(os.getenv("ROUTER_HEAVY_MIN_SCORE", "15"))
+
+def _budget_points(money: str) -> int:
+    """0/1/2 for budgets under 10 million, under 30 million, and above (VND)"""
+    numbers = [float(n.replace(",", ".")) for n in re.findall(r"\d+(?:[.,]\d+)?", money or "")]
+    if not numbers:
+        return 0
+    millions = max(numbers)
+    # Plain VND amounts ("15000000") instead of "15 triệu"
+    if millions >= 1000:
+        millions /= 1_000_000
+    return 0 if millions < 10 else 1 if millions < 30 else 2
+
+@dataclass
+class Route:
+    tier: str
+    score: int
+    chain: list[str]
+
+class ModelRouter:
+    def __init__(self, local_max_score: int, light_max_score: int, heavy_min_score: int):
+        self.local_max_score = local_max_score
+        self.light_max_score = light_max_score
+        self.heavy_min_score = heavy_min_score
+        self._lock = threading.Lock()
+        self._decisions = Counter()
+        self._fallbacks = Counter()
+        self._errors = Counter()
+
+    @staticmethod
+    def complexity(trip_request: dict) -> int:
+        interests = len(trip_request.get("interests") or [])
+        return int(trip_request.get("days") or 1) + max(interests - 2, 0) + _budget_points(trip_request.get("money"))
+
+    def route(self, trip_request: dict, available: set[str]) -> Route:
+        """Pick the tier for a request; tiers without a configured model are skipped in the chain"""
+        score = self.complexity(trip_request)
+        if self.local_max_score > 0 and score <= self.local_max_score:
+            tier = TIER_LOCAL
+        elif self.light_max_score > 0 and score <= self.light_max_score:
+            tier = TIER_LIGHT
+        elif self.heavy_min_score > 0 and score >= self.heavy_min_score:
+            tier = TIER_HEAVY
+        else:
+            tier = TIER_STANDARD
+        
+        chain = [t for t in FALLBACK_CHAINS[tier] if t == TIER_LOCAL or t in available]
+        with self._lock:
+            self._decisions[chain[0]] += 1
+        return Route(chain[0], score, chain)
+
+    def record_fallback(self, from_tier: str, to_tier: str):
+        with self._lock:
+            self._fallbacks[f"{from_tier}->{to_tier}"] += 1
+
+    def record_error(self, tier: str):
+        with self._lock:
+            self._errors[tier] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "decisions": dict(self._decisions),
+                "fallbacks": dict(self._fallbacks),
+                "errors": dict(self._errors),
+                "thresholds": {
+                    "local_max_score": self.local_max_score,
+                    "light_max_score": self.light_max_score,
+                    "heavy_min_score": self.heavy_min_score
+                }
+            }
+
+# Create singleton instance
+model_router = ModelRouter(ROUTER_LOCAL_MAX_SCORE, ROUTER_LIGHT_MAX_SCORE, ROUTER_HEAVY_MIN_SCORE)
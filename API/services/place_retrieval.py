@@ -0,0 +1,81 @@
+"""
+Retrieval stage for trip prompts: pick the top-K curated places of the destination
+that fit the traveller's interests, and summarize them compactly for the prompt
+"""
+from cachetools import TTLCache
+from database import sessionLocal
+from repositories import place_repo
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+PLACES_TOP_K = int(os.getenv("PLACES_TOP_K", "8"))
+PLACES_CANDIDATES = int(os.getenv("PLACES_CANDIDATES", "200"))
+PLACES_CACHE_TTL_SECONDS = int(os.getenv("PLACES_CACHE_TTL_SECONDS", "600"))
+PLACES_DESCRIPTION_CHARS = 120
+
+def _destination_names(destination: str) -> list[str]:
+    # City/province are matched by equality (index-friendly), so try the common spellings
+    name = re.sub(r"\s+", " ", destination or "").strip()
+    return list(dict.fromkeys([name, name.title(), name.lower()])) if name else []
+
+def places_context(places: list[dict]) -> str:
+    """Compact prompt section listing retrieved places; empty when none are known"""
+    if not places:
+        return ""
+    
+    lines = []
+    for place in places:
+        description = place["description"][:PLACES_DESCRIPTION_CHARS].rstrip()
+        lines.append(f"- {place['name']} (★{place['rating']})" + (f": {description}" if description else ""))
+    return "ĐỊA ĐIỂM CÓ SẴN (ưu tiên sử dụng, giữ nguyên tên):\n" + "\n".join(lines)
+
+class PlaceRetriever:
+    def __init__(self, top_k: int, candidates: int, ttl: int):
+        self.top_k = top_k
+        self.candidates = candidates
+        # Candidates per destination; scoring against interests is cheap and done per request
+        self._cache = TTLCache(maxsize=256, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def _candidates(self, destination: str) -> list[dict]:
+        key = destination.strip().lower()
+        with self._lock:
+            places = self._cache.get(key)
+        if places is not None:
+            return places
+        
+        db = sessionLocal()
+        try:
+            places = [
+                {"name": place.name, "city": place.city, "rating": place.rating or 0, "description": place.description or ""}
+                for place in place_repo.get_places_in_destination(db, _destination_names(destination), self.candidates)
+            ]
+        except Exception as e:
+            logger.error(f"Place retrieval failed: {e}")
+            return []
+        finally:
+            db.close()
+        
+        with self._lock:
+            self._cache[key] = places
+        return places
+
+    def retrieve(self, trip_request: dict) -> list[dict]:
+        """Top-K places ranked by interest matches, then rating (blocking on a cache miss)"""
+        if self.top_k <= 0 or not trip_request.get("destination"):
+            return []
+        
+        interests = [interest.lower() for interest in trip_request.get("interests") or [] if interest]
+        
+        def score(place: dict) -> tuple:
+            text = f"{place['name']} {place['description']}".lower()
+            return (sum(1 for interest in interests if interest in text), place["rating"])
+        
+        return sorted(self._candidates(trip_request["destination"]), key=score, reverse=True)[:self.top_k]
+
+# Create singleton instance
+place_retriever = PlaceRetriever(PLACES_TOP_K, PLACES_CANDIDATES, PLACES_CACHE_TTL_SECONDS)
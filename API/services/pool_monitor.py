@@ -0,0 +1,93 @@
+"""
+Live connection-pool statistics: checkouts, overflow, timeouts and how long callers
+waited for a connection, to size DB_POOL_SIZE / DB_MAX_OVERFLOW per worker from data
+"""
+from sqlalchemy import event, exc
+from services.latency_window import LatencyWindow
+import threading
+import time
+
+# Upper bounds (ms) of the wait-time histogram buckets; the last bucket is open-ended
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+class PoolMonitor:
+    def __init__(self, name: str):
+        self.name = name
+        self.wait_times = LatencyWindow(maxlen=1000)
+        self._lock = threading.Lock()
+        self._histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._stats = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidated": 0, "timeouts": 0, "max_checked_out": 0}
+
+    def pool_class(self, base):
+        """Subclass of the pool class whose connect() is timed; engine.dispose() keeps the subclass"""
+        monitor = self
+
+        def connect(pool):
+            started = time.monotonic()
+            try:
+                connection = base.connect(pool)
+            except exc.TimeoutError:
+                monitor._record_wait(time.monotonic() - started, timed_out=True)
+                raise
+            monitor._record_wait(time.monotonic() - started)
+            return connection
+
+        return type(f"Monitored{base.__name__}", (base,), {"connect": connect})
+
+    def attach(self, engine):
+        """Count connection lifecycle events of an engine's pool"""
+        target = engine.sync_engine if hasattr(engine, "sync_engine") else engine
+
+        @event.listens_for(target, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            self._count("connects")
+
+        @event.listens_for(target, "checkout")
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            self._count("checkouts")
+            checked_out = getattr(target.pool, "checkedout", lambda: 0)()
+            with self._lock:
+                self._stats["max_checked_out"] = max(self._stats["max_checked_out"], checked_out)
+
+        @event.listens_for(target, "checkin")
+        def _on_checkin(dbapi_connection, connection_record):
+            self._count("checkins")
+
+        @event.listens_for(target, "invalidate")
+        def _on_invalidate(dbapi_connection, connection_record, exception):
+            self._count("invalidated")
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _record_wait(self, seconds: float, timed_out: bool = False):
+        self.wait_times.add(seconds)
+        milliseconds = seconds * 1000
+        bucket = next((index for index, bound in enumerate(WAIT_BUCKETS_MS) if milliseconds <= bound), len(WAIT_BUCKETS_MS))
+        with self._lock:
+            self._histogram[bucket] += 1
+            if timed_out:
+                self._stats["timeouts"] += 1
+
+    def snapshot(self, engine) -> dict:
+        pool = (engine.sync_engine if hasattr(engine, "sync_engine") else engine).pool
+        with self._lock:
+            stats = dict(self._stats)
+            histogram = list(self._histogram)
+
+        labels = [f"le_{bound}" for bound in WAIT_BUCKETS_MS] + ["inf"]
+        return {
+            "name": self.name,
+            "pool_class": type(pool).__bases__[0].__name__ if type(pool).__name__.startswith("Monitored") else type(pool).__name__,
+            # Sizes are only reported by queue pools
+            "size": getattr(pool, "size", lambda: None)(),
+            "checked_out": getattr(pool, "checkedout", lambda: None)(),
+            "checked_in": getattr(pool, "checkedin", lambda: None)(),
+            "overflow": getattr(pool, "overflow", lambda: None)(),
+            "max_overflow": getattr(pool, "_max_overflow", None),
+            "timeout_seconds": getattr(pool, "_timeout", None),
+            **stats,
+            "wait_time": self.wait_times.snapshot(),
+            "wait_histogram_ms": dict(zip(labels, histogram))
+        }
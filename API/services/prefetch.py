@@ -0,0 +1,104 @@
+"""
+Cache-warming prefetch: during off-peak hours, pre-generate the most requested trips
+at prefetch priority so first-time requests for popular routes are cache hits.
+Runs inside the API process (AI_PREFETCH_ENABLED=true) or once from cron:
+    python -m services.prefetch
+"""
+from fastapi.concurrency import run_in_threadpool
+from database import sessionLocal
+from repositories import ai_recommendation_repo
+from services.gemini_service import gemini_service, PRIORITY_PREFETCH
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+AI_PREFETCH_ENABLED = os.getenv("AI_PREFETCH_ENABLED", "false").lower() == "true"
+AI_PREFETCH_TOP_N = int(os.getenv("AI_PREFETCH_TOP_N", "20"))
+AI_PREFETCH_LOOKBACK_DAYS = int(os.getenv("AI_PREFETCH_LOOKBACK_DAYS", "30"))
+# Giờ thấp điểm (giờ server), dạng "start-end", ví dụ "1-5" = 01:00 đến 05:59
+AI_PREFETCH_HOURS = os.getenv("AI_PREFETCH_HOURS", "1-5")
+AI_PREFETCH_CHECK_SECONDS = float(os.getenv("AI_PREFETCH_CHECK_SECONDS", "600"))
+
+def _in_window(hour: int, window: str) -> bool:
+    start, _, end = window.partition("-")
+    start, end = int(start), int(end or start)
+    # A window like "22-4" wraps around midnight
+    return start <= hour <= end if start <= end else hour >= start or hour <= end
+
+def _with_session(fn, *args):
+    db = sessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+class PrefetchScheduler:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._task: asyncio.Task | None = None
+        self._last_run_date = None
+        self._stats = {"runs": 0, "generated": 0, "already_cached": 0, "failed": 0, "last_run": None}
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Prefetch scheduler started (top {AI_PREFETCH_TOP_N}, hours {AI_PREFETCH_HOURS})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            now = datetime.now()
+            # At most one run per day, inside the off-peak window
+            if _in_window(now.hour, AI_PREFETCH_HOURS) and self._last_run_date != now.date():
+                self._last_run_date = now.date()
+                try:
+                    await self.run_once()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Prefetch run failed: {e}")
+            await asyncio.sleep(AI_PREFETCH_CHECK_SECONDS)
+
+    async def run_once(self) -> dict:
+        """Pre-generate the current top trips one by one; already cached trips cost nothing"""
+        since = datetime.utcnow() - timedelta(days=AI_PREFETCH_LOOKBACK_DAYS)
+        trip_requests = await run_in_threadpool(_with_session, ai_recommendation_repo.get_popular_trip_requests, AI_PREFETCH_TOP_N, since)
+        
+        run = {"candidates": len(trip_requests), "generated": 0, "already_cached": 0, "failed": 0}
+        for trip_request in trip_requests:
+            # Sequential on purpose: prefetch should trickle through the quota, not burst
+            result = await gemini_service.generate_async(trip_request, priority=PRIORITY_PREFETCH)
+            if result.source == "gemini":
+                await run_in_threadpool(_with_session, ai_recommendation_repo.save_prefetched_recommendation, trip_request, result)
+                run["generated"] += 1
+            elif result.source in ("cache", "coalesced"):
+                run["already_cached"] += 1
+            else:
+                run["failed"] += 1
+        
+        self._stats["runs"] += 1
+        for key in ("generated", "already_cached", "failed"):
+            self._stats[key] += run[key]
+        self._stats["last_run"] = datetime.now().isoformat()
+        logger.info(f"Prefetch run finished: {run}")
+        return run
+
+    def stats(self) -> dict:
+        return {**self._stats, "enabled": self.enabled, "top_n": AI_PREFETCH_TOP_N, "hours": AI_PREFETCH_HOURS}
+
+# Create singleton instance
+prefetch_scheduler = PrefetchScheduler(AI_PREFETCH_ENABLED)
+
+if __name__ == "__main__":
+    # Register every model so relationship() targets resolve outside the API process
+    import main  # noqa: F401
+
+    print(asyncio.run(PrefetchScheduler(True).run_once()))
@@ -0,0 +1,122 @@
+"""
+Response cache for trip recommendations: an in-process LRU with TTL in front of
+a durable tier read from the AIRecommendations table
+"""
+from cachetools import TTLCache
+from datetime import datetime, timedelta
+from database import sessionLocal
+from models.ai_recommendation import AIRecommendation, decompress_output
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+AI_REC_CACHE_SIZE = int(os.getenv("AI_REC_CACHE_SIZE", "512"))
+AI_REC_CACHE_TTL_SECONDS = int(os.getenv("AI_REC_CACHE_TTL_SECONDS", "3600"))
+AI_REC_CACHE_DB_TTL_DAYS = int(os.getenv("AI_REC_CACHE_DB_TTL_DAYS", "30"))
+
+def _normalize(value) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+def _budget_band(money: str) -> str:
+    """Collapse free-form budget text ("5-10 triệu VND", "5 - 10 triệu") into a band"""
+    text = _normalize(money)
+    numbers = re.findall(r"\d+(?:[.,]\d+)?", text)
+    if not numbers:
+        return text
+    prefix = "<" if "dưới" in text else ">" if "trên" in text else ""
+    return prefix + "-".join(numbers)
+
+def canonical_trip_key(trip_request: dict) -> str:
+    """Hash the fields that shape the itinerary, after trimming, lowercasing and sorting"""
+    canonical = {
+        "departure": _normalize(trip_request.get("departure")),
+        "destination": _normalize(trip_request.get("destination")),
+        "days": int(trip_request.get("days") or 1),
+        "people": int(trip_request.get("people") or 1),
+        "budget": _budget_band(trip_request.get("money")),
+        "style": _normalize(trip_request.get("travelStyle")),
+        "interests": sorted({_normalize(i) for i in trip_request.get("interests") or [] if _normalize(i)}),
+        "transportation": _normalize(trip_request.get("transportation")),
+        "accommodation": _normalize(trip_request.get("accommodation")),
+        "format": trip_request.get("outputFormat") or "text",
+    }
+    payload = json.dumps(canonical, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class RecommendationCache:
+    def __init__(self, maxsize: int, ttl: int, db_ttl_days: int):
+        self._memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._db_ttl = timedelta(days=db_ttl_days)
+        self._stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    def get_memory(self, key: str) -> str | None:
+        with self._lock:
+            output = self._memory.get(key)
+            if output is not None:
+                self._stats["memory_hits"] += 1
+            return output
+
+    def get_durable(self, key: str) -> str | None:
+        """Look up the newest stored Gemini output for this key (blocking: opens its own short session)"""
+        if self._db_ttl.total_seconds() <= 0:
+            self._count_miss()
+            return None
+
+        db = sessionLocal()
+        try:
+            row = db.query(AIRecommendation.outputText, AIRecommendation.outputData, AIRecommendation.outputCodec, AIRecommendation.outputJson).filter(
+                AIRecommendation.cacheKey == key,
+                AIRecommendation.hasOutput,
+                AIRecommendation.createdAt >= datetime.utcnow() - self._db_ttl
+            ).order_by(AIRecommendation.createdAt.desc()).first()
+        except Exception as e:
+            logger.error(f"Recommendation cache DB lookup failed: {e}")
+            row = None
+        finally:
+            db.close()
+
+        if row is None:
+            self._count_miss()
+            return None
+
+        # Structured rows keep the itinerary in outputJson and its rendered text in output
+        output = json.dumps(row.outputJson, ensure_ascii=False) if row.outputJson is not None else decompress_output(row.outputCodec, row.outputText, row.outputData)
+        with self._lock:
+            self._stats["db_hits"] += 1
+            self._memory[key] = output
+        return output
+
+    def get(self, key: str) -> str | None:
+        output = self.get_memory(key)
+        if output is None:
+            output = self.get_durable(key)
+        return output
+
+    def put(self, key: str, output: str):
+        with self._lock:
+            self._memory[key] = output
+
+    def _count_miss(self):
+        with self._lock:
+            self._stats["misses"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["db_hits"]
+            total = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "size": len(self._memory),
+                "maxsize": self._memory.maxsize,
+                "ttl_seconds": self._memory.ttl,
+            }
+
+# Create singleton instance
+recommendation_cache = RecommendationCache(AI_REC_CACHE_SIZE, AI_REC_CACHE_TTL_SECONDS, AI_REC_CACHE_DB_TTL_DAYS)
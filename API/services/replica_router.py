@@ -0,0 +1,180 @@
+"""
+Read-replica selection: round-robin over the replicas that pass health checks (reachable
+and not lagging too far behind), with a read-your-writes window per user during which
+their reads stay on the primary
+"""
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, text
+from jose import jwt
+from datetime import datetime
+import asyncio
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds since the last replayed transaction, 0 when the replica has replayed everything it received
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+# Methods that do not write; any other successful request starts the user's read-your-writes window
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def request_user(request) -> str | None:
+    """Username of the bearer token, only to route reads: authentication still verifies the token"""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.get_unverified_claims(token).get("sub")
+    except Exception:
+        return None
+
+class Replica:
+    def __init__(self, name: str, engine, async_engine=None):
+        self.name = name
+        self.engine = engine
+        self.async_engine = async_engine
+        self.healthy = True
+        self.lag_seconds = None
+        self.last_error = None
+        self.checked_at = None
+        self.selected = 0
+        self.failures = 0
+
+class ReplicaRouter:
+    def __init__(self, replicas: list[Replica], max_lag_seconds: float, read_your_writes_seconds: float, check_interval: float):
+        self.replicas = replicas
+        self.max_lag_seconds = max_lag_seconds
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.check_interval = check_interval
+        self._task: asyncio.Task | None = None
+        self._lock = threading.Lock()
+        self._round_robin = itertools.count()
+        self._recent_writes = {}  # username -> monotonic time until which their reads use the primary
+        self._stats = {"replica_reads": 0, "primary_reads_after_write": 0, "primary_reads_no_replica": 0, "writes_noted": 0}
+        for replica in replicas:
+            self._watch_errors(replica)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def _watch_errors(self, replica: Replica):
+        # A dropped or refused connection takes the replica out of rotation until the next passing check
+        def _on_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.mark_down(replica, f"{type(context.original_exception).__name__}: {context.original_exception}")
+
+        for engine in (replica.engine, replica.async_engine.sync_engine if replica.async_engine is not None else None):
+            if engine is not None:
+                event.listen(engine, "handle_error", _on_error)
+
+    def mark_down(self, replica: Replica, error: str):
+        with self._lock:
+            replica.failures += 1
+            replica.last_error = error
+            if replica.healthy:
+                replica.healthy = False
+                logger.warning(f"Read replica {replica.name} is out of rotation: {error}")
+
+    def pick(self, user: str | None, async_session: bool = False) -> Replica | None:
+        """Replica for this request's reads, or None to read from the primary"""
+        now = time.monotonic()
+        with self._lock:
+            if user is not None and self._recent_writes.get(user, 0) > now:
+                self._stats["primary_reads_after_write"] += 1
+                return None
+
+            candidates = [replica for replica in self.replicas if replica.healthy and (not async_session or replica.async_engine is not None)]
+            if not candidates:
+                self._stats["primary_reads_no_replica"] += 1
+                return None
+
+            replica = candidates[next(self._round_robin) % len(candidates)]
+            replica.selected += 1
+            self._stats["replica_reads"] += 1
+            return replica
+
+    def note_write(self, user: str | None):
+        """Keep the user's reads on the primary until the replicas have caught up with this write"""
+        if user is None or not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            lags = [replica.lag_seconds for replica in self.replicas if replica.healthy and replica.lag_seconds is not None]
+            self._recent_writes[user] = now + max([self.read_your_writes_seconds, *lags])
+            self._stats["writes_noted"] += 1
+            # Drop expired windows so the map only holds users who wrote recently
+            if len(self._recent_writes) > 1000:
+                self._recent_writes = {key: until for key, until in self._recent_writes.items() if until > now}
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Read replica checks started for {len(self.replicas)} replica(s) (every {self.check_interval}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Read replica check failed unexpectedly: {e}")
+            await asyncio.sleep(self.check_interval)
+
+    async def check_once(self):
+        for replica in self.replicas:
+            await run_in_threadpool(self._check, replica)
+
+    def _check(self, replica: Replica):
+        try:
+            with replica.engine.connect() as connection:
+                lag = float(connection.execute(REPLICA_LAG_SQL).scalar()) if replica.engine.dialect.name == "postgresql" else 0.0
+        except Exception as e:
+            self.mark_down(replica, f"{type(e).__name__}: {e}")
+            return
+
+        with self._lock:
+            replica.checked_at = datetime.now()
+            replica.lag_seconds = round(lag, 3)
+            if lag > self.max_lag_seconds:
+                replica.last_error = f"Replication lag {lag:.1f}s exceeds {self.max_lag_seconds}s"
+                if replica.healthy:
+                    replica.healthy = False
+                    logger.warning(f"Read replica {replica.name} is out of rotation: {replica.last_error}")
+            elif not replica.healthy:
+                replica.healthy = True
+                logger.info(f"Read replica {replica.name} is back in rotation")
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                **self._stats,
+                "max_lag_seconds": self.max_lag_seconds,
+                "read_your_writes_seconds": self.read_your_writes_seconds,
+                "users_reading_primary": sum(1 for until in self._recent_writes.values() if until > now),
+                "replicas": [{
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "async": replica.async_engine is not None,
+                    "lag_seconds": replica.lag_seconds,
+                    "selected": replica.selected,
+                    "failures": replica.failures,
+                    "last_error": replica.last_error,
+                    "checked_at": replica.checked_at.isoformat() if replica.checked_at else None
+                } for replica in self.replicas]
+            }
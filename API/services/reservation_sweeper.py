@@ -0,0 +1,63 @@
+"""
+Periodic cleanup of AI recommendation rows reserved by generations that never finished
+(the process crashed or was killed between the reserve and complete transactions)
+"""
+from fastapi.concurrency import run_in_threadpool
+from database import sessionLocal
+from repositories import ai_recommendation_repo
+from services.gemini_service import GEMINI_DEADLINE_SECONDS
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+AI_REC_SWEEP_ENABLED = os.getenv("AI_REC_SWEEP_ENABLED", "true").lower() == "true"
+AI_REC_SWEEP_INTERVAL_SECONDS = float(os.getenv("AI_REC_SWEEP_INTERVAL_SECONDS", "300"))
+# A reservation older than the generation deadline plus this margin can no longer be completed
+AI_REC_SWEEP_GRACE_SECONDS = float(os.getenv("AI_REC_SWEEP_GRACE_SECONDS", "60"))
+
+def _sweep(older_than: datetime) -> int:
+    db = sessionLocal()
+    try:
+        return ai_recommendation_repo.sweep_abandoned_aiRecs(db, older_than)
+    finally:
+        db.close()
+
+class ReservationSweeper:
+    def __init__(self, enabled: bool, interval: float):
+        self.enabled = enabled
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"AI recommendation reservation sweeper started (every {self.interval}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"AI recommendation reservation sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sweep_once(self) -> int:
+        older_than = datetime.utcnow() - timedelta(seconds=GEMINI_DEADLINE_SECONDS + AI_REC_SWEEP_GRACE_SECONDS)
+        deleted = await run_in_threadpool(_sweep, older_than)
+        if deleted:
+            logger.info(f"Deleted {deleted} abandoned AI recommendation reservation(s)")
+        return deleted
+
+# Create singleton instance
+reservation_sweeper = ReservationSweeper(AI_REC_SWEEP_ENABLED, AI_REC_SWEEP_INTERVAL_SECONDS)
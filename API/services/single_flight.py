@@ -0,0 +1,79 @@
+"""
+Single-flight coalescing: concurrent calls for the same key share one execution.
+Works across threads (sync endpoints, threadpool) and asyncio tasks in one worker.
+"""
+from concurrent.futures import Future
+import asyncio
+import threading
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        self._waiters: dict[str, int] = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+
+    def _join(self, key: str) -> tuple[Future, bool]:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                self._waiters[key] = self._waiters.get(key, 0) + 1
+                return future, False
+
+            future = Future()
+            self._inflight[key] = future
+            self._waiters[key] = 0
+            self._stats["leaders"] += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, result=None, error: BaseException | None = None):
+        # Drop the key before resolving so a caller arriving afterwards starts a fresh flight
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._waiters.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn) -> tuple[object, bool]:
+        """Run fn() once per key; returns (result, shared) where shared is True for coalesced callers"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result, False
+
+    async def do_async(self, key: str, coro_fn) -> tuple[object, bool]:
+        """Async variant of do(); coro_fn() runs as its own task so a disconnecting leader does not cancel waiters"""
+        future, leader = self._join(key)
+        if leader:
+            task = asyncio.ensure_future(coro_fn())
+
+            def _on_done(t: asyncio.Task):
+                if t.cancelled():
+                    self._finish(key, future, error=asyncio.CancelledError())
+                elif t.exception() is not None:
+                    self._finish(key, future, error=t.exception())
+                else:
+                    self._finish(key, future, t.result())
+
+            task.add_done_callback(_on_done)
+
+        # shield() keeps a cancelled waiter from cancelling the shared future
+        return await asyncio.shield(asyncio.wrap_future(future)), not leader
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "in_flight": len(self._inflight),
+                "waiting": sum(self._waiters.values()),
+            }
@@ -0,0 +1,107 @@
+"""
+Per-user daily AI quotas enforced from in-memory counters; each counter is seeded once
+per user and day from the AIRecommendations table, so a restart does not reset it
+"""
+from datetime import datetime, date
+from fastapi import HTTPException
+from sqlalchemy import func
+from database import sessionLocal
+from models.ai_recommendation import AIRecommendation
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 0 = không giới hạn
+AI_USER_DAILY_REQUESTS = int(os.getenv("AI_USER_DAILY_REQUESTS", "0"))
+AI_USER_DAILY_TOKENS = int(os.getenv("AI_USER_DAILY_TOKENS", "0"))
+
+class UsageQuota:
+    def __init__(self, daily_requests: int, daily_tokens: int):
+        self.daily_requests = daily_requests
+        self.daily_tokens = daily_tokens
+        self._lock = threading.Lock()
+        self._day: date | None = None
+        self._counters: dict[str, dict] = {}
+        self._rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.daily_requests > 0 or self.daily_tokens > 0
+
+    def _today(self) -> date:
+        # Days follow createdAt, which is stored in UTC
+        today = datetime.utcnow().date()
+        if self._day != today:
+            self._day = today
+            self._counters.clear()
+        return today
+
+    def _counter(self, idUser: str) -> dict:
+        """Today's counter for a user (blocking: the first access of the day reads the DB)"""
+        with self._lock:
+            today = self._today()
+            counter = self._counters.get(idUser)
+        if counter is not None:
+            return counter
+        
+        db = sessionLocal()
+        try:
+            requests, tokens = db.query(
+                func.count(AIRecommendation.idAIRec),
+                func.coalesce(func.sum(func.coalesce(AIRecommendation.promptTokens, 0) + func.coalesce(AIRecommendation.responseTokens, 0)), 0)
+            ).filter(
+                AIRecommendation.idUser == idUser,
+                # Rows reserved by generations still in flight are counted when they complete
+                AIRecommendation.hasOutput,
+                AIRecommendation.createdAt >= datetime.combine(today, datetime.min.time())
+            ).one()
+        except Exception as e:
+            logger.error(f"Could not seed AI usage counter for {idUser}: {e}")
+            requests, tokens = 0, 0
+        finally:
+            db.close()
+        
+        with self._lock:
+            return self._counters.setdefault(idUser, {"requests": int(requests), "tokens": int(tokens)})
+
+    def check(self, idUser: str, requests: int = 1):
+        """Raise 429 when the user cannot start `requests` more generations today"""
+        if not self.enabled:
+            return
+        
+        counter = self._counter(idUser)
+        with self._lock:
+            over_requests = self.daily_requests > 0 and counter["requests"] + requests > self.daily_requests
+            over_tokens = self.daily_tokens > 0 and counter["tokens"] >= self.daily_tokens
+            if over_requests or over_tokens:
+                self._rejected += 1
+        if over_requests or over_tokens:
+            raise HTTPException(429, "Daily AI quota exceeded, please try again tomorrow")
+
+    def record(self, idUser: str | None, tokens: int, requests: int = 1):
+        # Counted even without limits so the current usage can always be reported
+        if not idUser:
+            return
+        
+        counter = self._counter(idUser)
+        with self._lock:
+            counter["requests"] += requests
+            counter["tokens"] += tokens
+
+    def usage(self, idUser: str) -> dict:
+        counter = self._counter(idUser)
+        return {
+            "requests": counter["requests"],
+            "tokens": counter["tokens"],
+            "daily_requests": self.daily_requests or None,
+            "daily_tokens": self.daily_tokens or None
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": self.enabled, "users_today": len(self._counters), "rejected": self._rejected}
+
+# Create singleton instance
+usage_quota = UsageQuota(AI_USER_DAILY_REQUESTS, AI_USER_DAILY_TOKENS)